@@ -1,86 +1,78 @@
-import subprocess
-import sys
-import os
+"""
+Orchestre l'ensemble du pipeline de données dans le processus courant.
 
-try:
-    from database import database
-except ImportError:
-    print("❌ ERREUR: Le fichier 'database.py' est introuvable.")
-    sys.exit(1)
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor pipeline
+    python -m car_price_predictor.app
+    python car_price_predictor/app.py
+"""
+import argparse
+import os
+import sys
 
-# --- Configuration des chemins vers les scripts ---
-CONVERTER_SCRIPT = os.path.join("converter", "JsonToCsv.py")
-MODEL_SCRIPT = os.path.join("models", "model.py")
+if __package__:
+    from . import metriques
+    from .orchestrator.cache import CacheEtapes, TAILLE_MAX_MO
+    from .orchestrator.dag import SUCCES, afficher_resume, enregistrer_execution
+    from .orchestrator.stages import MYSQL_BASE, NOMS_ETAPES, construire_pipeline
+else:  # lancé comme script : python3 app.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+    from car_price_predictor import metriques
+    from car_price_predictor.orchestrator.cache import CacheEtapes, TAILLE_MAX_MO
+    from car_price_predictor.orchestrator.dag import SUCCES, afficher_resume, enregistrer_execution
+    from car_price_predictor.orchestrator.stages import MYSQL_BASE, NOMS_ETAPES, construire_pipeline
 
+# Historique des temps/mémoire par étape, une ligne JSON par exécution
+HISTORIQUE_EXECUTIONS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'pipeline_runs.jsonl')
 
-def run_external_script(script_path):
-    """
-    Exécute un script Python externe en tant que sous-processus.
-    Cela garantit qu'il s'exécute avec son propre contexte.
-    """
-    # Utilise l'exécutable Python actuel pour lancer le script
-    python_executable = sys.executable 
-    
-    print(f"--- Exécution de '{script_path}' ---")
-    
-    try:
-        # check=True lève une erreur si le script échoue (code de sortie non nul)
-        # capture_output=True capture stdout/stderr
-        # text=True décode stdout/stderr en texte (utf-8)
-        result = subprocess.run(
-            [python_executable, script_path], 
-            check=True, 
-            capture_output=True, 
-            text=True,
-            encoding='utf-8' # Forcer l'encodage
-        )
-        
-        if result.stdout:
-            print(result.stdout)
-            
-        print(f"--- '{script_path}' terminé avec succès ---")
-        return True
-        
-    except FileNotFoundError:
-        print(f"❌ ERREUR: Script introuvable à '{script_path}'")
-        return False
-    except subprocess.CalledProcessError as e:
-        print(f"❌ ERREUR lors de l'exécution de '{script_path}':")
-        print(e.stderr) 
-        return False
-    except Exception as e:
-        print(f"❌ ERREUR inattendue avec '{script_path}': {e}")
-        return False
 
-def main_pipeline():
+def main_pipeline(max_paralleles=None, cache=None, forcer=(), profil_dossier=None, stockage=MYSQL_BASE):
     """
     Orchestre l'ensemble du pipeline de données.
+    Retourne True si toutes les étapes ont réussi (ou ont été restaurées depuis le cache).
     """
     print("🚀 Démarrage du pipeline de données complet...")
-    
-    # ÉTAPE 1: Conversion JSON vers CSV
-    print("\n[ÉTAPE 1/3] Conversion JSON vers CSV...")
-    if not run_external_script(CONVERTER_SCRIPT):
-        print("🛑 Échec de l'étape 1. Arrêt du pipeline.")
-        return
 
-    # ÉTAPE 2: Chargement du JSON dans la BDD MySQL
-    print("\n[ÉTAPE 2/3] Chargement des données JSON dans MySQL...")
-    try:
-        database.run_database_pipeline()
-        print("--- Étape 2 terminée avec succès ---")
-    except Exception as e:
-        print(f"❌ ERREUR lors du chargement dans la base de données: {e}")
-        print("🛑 Échec de l'étape 2. Arrêt du pipeline.")
-        return
+    resultats = construire_pipeline(stockage).executer(max_paralleles, cache, forcer, profil_dossier)
+
+    afficher_resume(resultats)
+    enregistrer_execution(resultats, HISTORIQUE_EXECUTIONS)
+    for r in resultats:
+        metriques.definir('etape_duree_secondes', r.duree_s, etape=r.nom, statut=r.statut)
+
+    if all(r.statut in SUCCES for r in resultats):
+        print("\n🎉 Pipeline complet terminé avec succès ! 🎉")
+        return True
+
+    print("🛑 Le pipeline est terminé avec des erreurs.")
+    return False
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Pipeline complet : conversion, chargement BDD et entraînement.")
+    parser.add_argument('--sequentiel', action='store_true', help="Exécute une seule étape à la fois.")
+    parser.add_argument('--force', action='append', default=[], choices=NOMS_ETAPES,
+                        help="Réexécute l'étape même si le cache la connaît (répétable).")
+    parser.add_argument('--sans-cache', action='store_true', help="Désactive le cache des étapes.")
+    parser.add_argument('--cache-max-mo', type=int, default=TAILLE_MAX_MO,
+                        help=f"Taille maximale du cache avant éviction (défaut: {TAILLE_MAX_MO} Mo).")
+    parser.add_argument('--stockage', default=MYSQL_BASE,
+                        help=f"Stockage chargé par l'étape 'chargement' : {MYSQL_BASE} (défaut) ou sqlite:///chemin.db (sans serveur).")
+    parser.add_argument('--profile', nargs='?', const='profils', metavar='DOSSIER',
+                        help="Profile chaque étape exécutée (pstats, piles pour flamegraph, tracemalloc) "
+                             "dans DOSSIER (défaut: profils/). Combiner avec --force pour profiler une étape en cache.")
+    parser.add_argument('--metriques', metavar='FICHIER',
+                        help="Active l'instrumentation et l'écrit dans FICHIER (.json, sinon texte Prometheus).")
+    args = parser.parse_args(argv)
 
-    # ÉTAPE 3: Entraînement du modèle
-    print("\n[ÉTAPE 3/3] Entraînement du modèle de prédiction...")
-    if not run_external_script(MODEL_SCRIPT):
-        print("🛑 Échec de l'étape 3. Le pipeline est terminé avec des erreurs.")
-        return
+    if args.metriques:
+        metriques.activer()
+    cache = None if args.sans_cache else CacheEtapes(taille_max_mo=args.cache_max_mo)
+    succes = main_pipeline(1 if args.sequentiel else None, cache, args.force, args.profile, args.stockage)
+    if args.metriques:
+        metriques.ecrire(args.metriques)
+    return 0 if succes else 1
 
-    print("\n🎉 Pipeline complet terminé avec succès ! 🎉")
 
 if __name__ == "__main__":
-    main_pipeline()
+    sys.exit(main())
@@ -0,0 +1,148 @@
+"""
+Archive des pages rendues par Playwright, pour rejouer un crawl sans navigateur.
+
+Dans le dossier d'archive :
+  - objets/ab/<sha256>.html.gz : HTML final d'une page (résultat de page.content()),
+    compressé en gzip et nommé d'après l'empreinte de son contenu : une page
+    identique d'un crawl à l'autre n'est stockée qu'une fois,
+  - index.jsonl : une ligne {url, empreinte, type_page, date} par page enregistrée ;
+    la dernière ligne d'une URL l'emporte.
+
+Enregistrement : scrapy crawl autosphere -a archive=archives/crawl
+Rejeu (sans Playwright) : scrapy crawl autosphere -a rejeu=archives/crawl
+
+Re-parsing direct de toutes les fiches (benchmark et corpus de non-régression) :
+    python -m car_price_predictor.archive archives/crawl --sortie fiches.json
+    python -m car_price_predictor.archive archives/crawl --comparer fiches.json
+"""
+import argparse
+import gzip
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+
+TYPE_RECHERCHE = 'recherche'
+TYPE_FICHE = 'fiche'
+
+
+class ArchivePages:
+    def __init__(self, dossier):
+        self.dossier = dossier
+        self.chemin_index = os.path.join(dossier, 'index.jsonl')
+        # url -> (empreinte, type_page)
+        self.index = {}
+        if os.path.exists(self.chemin_index):
+            with open(self.chemin_index, 'r', encoding='utf-8') as f:
+                for ligne in f:
+                    entree = json.loads(ligne)
+                    self.index[entree['url']] = (entree['empreinte'], entree['type_page'])
+        self._fichier_index = None
+
+    def _chemin_objet(self, empreinte):
+        return os.path.join(self.dossier, 'objets', empreinte[:2], f'{empreinte}.html.gz')
+
+    def enregistrer(self, url, contenu, type_page):
+        """Archive le HTML `contenu` (str) de `url`. Retourne son empreinte."""
+        donnees = contenu.encode('utf-8')
+        empreinte = hashlib.sha256(donnees).hexdigest()
+        chemin = self._chemin_objet(empreinte)
+        if not os.path.exists(chemin):
+            os.makedirs(os.path.dirname(chemin), exist_ok=True)
+            # Écrit à côté puis renommé : un objet présent est toujours complet
+            temporaire = f'{chemin}.{os.getpid()}.tmp'
+            with open(temporaire, 'wb') as f:
+                f.write(gzip.compress(donnees, compresslevel=6, mtime=0))
+            os.replace(temporaire, chemin)
+
+        if self._fichier_index is None:
+            os.makedirs(self.dossier, exist_ok=True)
+            self._fichier_index = open(self.chemin_index, 'a', encoding='utf-8')
+        self._fichier_index.write(json.dumps({
+            'url': url, 'empreinte': empreinte, 'type_page': type_page,
+            'date': datetime.now().isoformat(timespec='seconds'),
+        }, ensure_ascii=False) + '\n')
+        self._fichier_index.flush()
+        self.index[url] = (empreinte, type_page)
+        return empreinte
+
+    def lire(self, url):
+        """HTML archivé de `url` (str), ou None s'il n'a pas été enregistré."""
+        entree = self.index.get(url)
+        if entree is None:
+            return None
+        with gzip.open(self._chemin_objet(entree[0]), 'rb') as f:
+            return f.read().decode('utf-8')
+
+    def urls(self, type_page=None):
+        return [url for url, (_, type_) in self.index.items() if type_page is None or type_ == type_page]
+
+    def fermer(self):
+        if self._fichier_index is not None:
+            self._fichier_index.close()
+            self._fichier_index = None
+
+
+def reparser(archive):
+    """Extrait toutes les fiches archivées avec AutosphereSpider.extraire_fiche. Retourne (fiches, durée en s)."""
+    import tempfile
+    from scrapy.http import HtmlResponse
+    from .spiders.quotes_spider import AutosphereSpider
+
+    spider = AutosphereSpider(output_file=os.path.join(tempfile.gettempdir(), 'autosphere_rejeu.json'))
+    urls = sorted(archive.urls(TYPE_FICHE))
+    debut = time.perf_counter()
+    fiches = [
+        spider.extraire_fiche(HtmlResponse(url=url, body=archive.lire(url), encoding='utf-8')).en_dict()
+        for url in urls
+    ]
+    return fiches, time.perf_counter() - debut
+
+
+def comparer(fiches, reference):
+    """Différences champ par champ entre deux extractions (listes de dicts), indexées par URL."""
+    attendues = {fiche['url']: fiche for fiche in reference}
+    differences = []
+    for fiche in fiches:
+        attendue = attendues.pop(fiche['url'], None)
+        if attendue is None:
+            differences.append((fiche['url'], 'nouvelle fiche', None, None))
+            continue
+        for champ in sorted(set(fiche) | set(attendue)):
+            if fiche.get(champ) != attendue.get(champ):
+                differences.append((fiche['url'], champ, attendue.get(champ), fiche.get(champ)))
+    differences.extend((url, 'fiche absente', None, None) for url in attendues)
+    return differences
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-parse les fiches d'une archive de crawl, sans navigateur.")
+    parser.add_argument('dossier', help="Dossier d'archive (scrapy crawl autosphere -a archive=DOSSIER).")
+    parser.add_argument('--sortie', help="Écrit les fiches extraites dans ce fichier JSON (référence).")
+    parser.add_argument('--comparer', metavar='REFERENCE',
+                        help="Compare l'extraction à un fichier JSON de référence ; code de retour 1 si elle diffère.")
+    args = parser.parse_args(argv)
+
+    archive = ArchivePages(args.dossier)
+    fiches, duree = reparser(archive)
+    print(f"📦 {len(fiches)} fiches re-parsées en {duree:.2f}s "
+          f"({len(fiches) / duree if duree else 0:,.0f} fiches/s, {len(archive.urls(TYPE_RECHERCHE))} pages de recherche archivées)")
+
+    if args.sortie:
+        with open(args.sortie, 'w', encoding='utf-8') as f:
+            json.dump(fiches, f, ensure_ascii=False, indent=2)
+        print(f"💾 Extraction écrite dans {args.sortie}")
+
+    if args.comparer:
+        with open(args.comparer, 'r', encoding='utf-8') as f:
+            differences = comparer(fiches, json.load(f))
+        for url, champ, avant, apres in differences[:50]:
+            print(f"≠ {url} [{champ}] {avant!r} -> {apres!r}")
+        print(f"{'❌' if differences else '✅'} {len(differences)} différence(s) avec {args.comparer}")
+        if differences:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
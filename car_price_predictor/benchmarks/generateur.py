@@ -0,0 +1,208 @@
+"""
+Générateur déterministe de fiches Autosphere synthétiques.
+
+Les fiches ont la forme des FicheVehicule écrites par AutosphereSpider
+(champs canoniques de items.py, résolus depuis les libellés des sections
+`Menu`, `Bonnes affaires`, `Acheter`), nombres au format français avec
+espaces ("45 000 km"), dates en JJ/MM/AAAA. La même graine donne toujours
+les mêmes fiches.
+
+Le générateur produit aussi le HTML rendu des pages de fiche et de recherche,
+au format attendu par AutosphereSpider.extraire_fiche / extraire_liens.
+"""
+import html
+import json
+import os
+import random
+import re
+from datetime import date, timedelta
+
+from ..items import FicheVehicule
+
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'fixtures')
+
+# Le site sépare les milliers par une espace fine insécable, que le spider remplace par une espace
+ESPACE_FINE = '\u202f'
+
+ECHELLES = {'10k': 10_000, '100k': 100_000, '1M': 1_000_000}
+
+# Marque -> [(modèle, prix neuf de référence, catégorie)]
+CATALOGUE = {
+    'RENAULT': [('CLIO', 21000, 'Citadine'), ('CAPTUR', 26000, 'SUV'), ('MEGANE', 29000, 'Berline'), ('ARKANA', 33000, 'SUV')],
+    'PEUGEOT': [('208', 22000, 'Citadine'), ('2008', 28000, 'SUV'), ('308', 30000, 'Berline'), ('3008', 37000, 'SUV')],
+    'DACIA': [('SANDERO', 14000, 'Citadine'), ('DUSTER', 20000, 'SUV'), ('JOGGER', 21000, 'Monospace')],
+    'CITROEN': [('C3', 19000, 'Citadine'), ('C4', 27000, 'Berline'), ('C5 AIRCROSS', 34000, 'SUV')],
+    'TOYOTA': [('YARIS', 22000, 'Citadine'), ('C-HR', 32000, 'SUV'), ('RAV4', 42000, 'SUV')],
+    'VOLKSWAGEN': [('POLO', 22000, 'Citadine'), ('GOLF', 31000, 'Berline'), ('T-ROC', 32000, 'SUV')],
+    'BMW': [('SERIE 1', 35000, 'Berline'), ('X1', 45000, 'SUV'), ('X3', 60000, 'SUV')],
+    'MERCEDES': [('CLASSE A', 37000, 'Berline'), ('GLA', 46000, 'SUV'), ('CLASSE C', 52000, 'Berline')],
+}
+ENERGIES = ['Essence', 'Diesel', 'Hybride', 'Essence micro hybride', 'Electrique']
+BOITES = ['Manuelle', 'Automatique']
+COULEURS = ['Gris', 'Noir', 'Blanc', 'Bleu', 'Rouge']
+PROVENANCES = ['Particulier', 'Loueur', 'Société', 'Import']
+VILLES = [('Chambéry', '73000'), ('Créteil', '94000'), ('Longuenesse', '62219'), ('Nanteuil-les-Meaux', '77100'), ('Dizy', '51530')]
+
+# Date de référence fixe : les âges générés ne dépendent pas du jour d'exécution
+AUJOURD_HUI = date(2025, 10, 31)
+
+
+def format_fr(nombre, unite=''):
+    """Formate un nombre à la française : séparateur de milliers espace, virgule décimale."""
+    if isinstance(nombre, float):
+        texte = f"{nombre:,.2f}".replace(',', ' ').replace('.', ',')
+    else:
+        texte = f"{nombre:,}".replace(',', ' ')
+    return f"{texte} {unite}".strip()
+
+
+def slug(texte):
+    return re.sub(r'[^a-z0-9]+', '-', texte.lower()).strip('-')
+
+
+def generer_fiche(rng, identifiant):
+    """Génère une fiche : (libellés affichés par section, prix, titre, url)."""
+    marque = rng.choice(list(CATALOGUE))
+    modele, prix_neuf, categorie = rng.choice(CATALOGUE[marque])
+    energie = rng.choice(ENERGIES)
+    ville, code_postal = rng.choice(VILLES)
+
+    age_jours = rng.randint(30, 12 * 365)
+    mise_en_circulation = AUJOURD_HUI - timedelta(days=age_jours)
+    kilometrage = int(age_jours / 365 * rng.uniform(5000, 25000))
+    puissance = rng.choice([75, 90, 100, 110, 130, 150, 190])
+
+    # Prix : décote par l'âge et le kilométrage, plus un bruit
+    prix = prix_neuf * 0.85 ** (age_jours / 365) * (1 - min(kilometrage, 250_000) / 600_000)
+    prix = int(round(prix * rng.uniform(0.9, 1.1), -1))
+
+    titre = f"{marque} {modele} {rng.choice(['1.0', '1.2', '1.5', '2.0'])} {puissance}ch {rng.choice(['Life', 'Business', 'Allure', 'GT Line'])}"
+    prefixe = 'fiche-mixte' if rng.random() < 0.1 else 'fiche'
+    url = f"https://www.autosphere.fr/{prefixe}/auto-occasion-{slug(marque)}-{slug(modele)}-{slug(titre)}-{code_postal}-{slug(ville)}-{identifiant:06d}"
+
+    menu = [
+        ('Énergie', energie),
+        ('Boîte de vitesses', rng.choice(BOITES)),
+        ('Couleur', rng.choice(COULEURS)),
+        ('Catégorie', categorie),
+        ('Provenance', rng.choice(PROVENANCES)),
+        ('Première main', rng.choice(['Oui', 'Non'])),
+        ('Kilométrage', format_fr(kilometrage, 'km')),
+        ('Date de mise en circulation', mise_en_circulation.strftime('%d/%m/%Y')),
+        ('Puissance fiscale', format_fr(max(3, puissance // 20), 'CV')),
+        ('Puissance réelle', format_fr(puissance, 'ch')),
+        ('Portes', str(rng.choice([3, 5, 5, 5]))),
+        ('Places', str(rng.choice([4, 5, 5, 7]))),
+        ('Longueur', format_fr(rng.uniform(3.8, 4.8), 'm')),
+        ('Largeur', format_fr(rng.uniform(1.7, 1.95), 'm')),
+        ('Hauteur', format_fr(rng.uniform(1.4, 1.7), 'm')),
+        ('Poids', format_fr(rng.randint(1000, 1900), 'kg')),
+        ('Volume du coffre', format_fr(rng.randint(250, 600), 'L')),
+        ('Ville', ville),
+    ]
+    sections = {'Menu': menu}
+    # Une partie des fiches répète certains champs dans d'autres sections du site
+    if rng.random() < 0.3:
+        sections['Bonnes affaires'] = [l for l in menu if l[0] in ('Énergie', 'Kilométrage', 'Date de mise en circulation')]
+    if rng.random() < 0.3:
+        sections['Acheter'] = [('Prix', format_fr(prix, '€'))]
+    return sections, prix, titre, url
+
+
+def normaliser_cle(texte):
+    """Même normalisation que sites.normaliser_libelle."""
+    texte = texte.lower().replace(':', '').strip()
+    texte = re.sub(r'[\s\u202f\xa0]+', '_', texte)
+    return texte.replace('é', 'e').replace('è', 'e').replace('à', 'a').replace('ô', 'o').replace('î', 'i')
+
+
+def fiche_vers_car_data(sections, prix, titre, url):
+    """Dictionnaire tel qu'écrit par le spider dans autosphere_data.json."""
+    fiche = FicheVehicule(url=url, nom_complet_vehicule=titre, prix_ttc_eur=prix)
+    for titre_section, libelles in sections.items():
+        for label, valeur in libelles:
+            fiche.renseigner(normaliser_cle(titre_section), normaliser_cle(label), valeur)
+    return fiche.en_dict()
+
+
+def generer_car_data(nombre, seed=42):
+    """Itère sur `nombre` fiches synthétiques (dictionnaires car_data)."""
+    rng = random.Random(seed)
+    for identifiant in range(nombre):
+        yield fiche_vers_car_data(*generer_fiche(rng, identifiant))
+
+
+def ecrire_json(nombre, dossier, fiches_par_fichier=10_000, seed=42):
+    """
+    Écrit `nombre` fiches dans `dossier` en fichiers JSON de fiches_par_fichier
+    éléments (même format que scrapped/). Écriture en flux : la mémoire ne
+    dépend pas de l'échelle.
+    """
+    os.makedirs(dossier, exist_ok=True)
+    fichiers = []
+    fichier = None
+    for i, car_data in enumerate(generer_car_data(nombre, seed)):
+        if i % fiches_par_fichier == 0:
+            if fichier:
+                fichier.write("\n]")
+                fichier.close()
+            chemin = os.path.join(dossier, f"fiche_{i // fiches_par_fichier}.json")
+            fichiers.append(chemin)
+            fichier = open(chemin, 'w', encoding='utf-8')
+            fichier.write("[\n")
+        else:
+            fichier.write(",\n")
+        json.dump(car_data, fichier, ensure_ascii=False)
+    if fichier:
+        fichier.write("\n]")
+        fichier.close()
+    return fichiers
+
+
+def html_fiche(sections, prix, titre, url):
+    """Page de fiche rendue, avec la structure lue par AutosphereSpider.extraire_fiche."""
+    blocs = []
+    for titre_section, libelles in sections.items():
+        items = "\n".join(
+            f'      <li><span>{html.escape(label)} :</span> <span class="font-semibold">{html.escape(valeur.replace(" ", ESPACE_FINE))}</span></li>'
+            for label, valeur in libelles
+        )
+        blocs.append(f'  <h2>{html.escape(titre_section)}</h2>\n  <div class="grid grid-cols-2">\n    <ul>\n{items}\n    </ul>\n  </div>')
+    return (
+        '<!DOCTYPE html>\n<html lang="fr">\n<head>\n'
+        f'  <meta charset="utf-8">\n  <meta name="product:price:amount" content="{prix}">\n'
+        f'  <link rel="canonical" href="{html.escape(url)}">\n</head>\n<body>\n'
+        f'  <p data-testid="firstParagraph">Découvrez la <strong>{html.escape(titre)}</strong> au prix de <strong>{format_fr(prix, "€")}</strong></p>\n'
+        + "\n".join(blocs) + '\n</body>\n</html>\n'
+    )
+
+
+def html_recherche(urls):
+    """Page de résultats de recherche rendue, avec les liens lus par AutosphereSpider.extraire_liens."""
+    liens = []
+    for url in urls:
+        chemin = url.replace('https://www.autosphere.fr', '')
+        # Chaque fiche apparaît deux fois (image et titre), comme sur le site
+        liens.append(f'  <div class="card"><a href="{chemin}" tabindex="-1"><img alt=""></a><a href="{chemin}" tabindex="-1">Voir</a></div>')
+    return '<!DOCTYPE html>\n<html lang="fr">\n<body>\n' + "\n".join(liens) + '\n</body>\n</html>\n'
+
+
+def ecrire_fixtures(nombre_fiches=3, seed=7, dossier=FIXTURES_DIR):
+    """(Ré)génère les fixtures HTML versionnées dans benchmarks/fixtures/."""
+    os.makedirs(dossier, exist_ok=True)
+    rng = random.Random(seed)
+    urls = []
+    for i in range(nombre_fiches):
+        fiche = generer_fiche(rng, i)
+        urls.append(fiche[3])
+        with open(os.path.join(dossier, f"fiche_{i}.html"), 'w', encoding='utf-8') as f:
+            f.write(html_fiche(*fiche))
+    with open(os.path.join(dossier, "recherche.html"), 'w', encoding='utf-8') as f:
+        f.write(html_recherche(urls + [generer_fiche(rng, i)[3] for i in range(nombre_fiches, 23)]))
+    with open(os.path.join(dossier, "urls.json"), 'w', encoding='utf-8') as f:
+        json.dump(urls, f, indent=2)
+
+
+if __name__ == "__main__":
+    ecrire_fixtures()
+    print(f"✅ Fixtures HTML écrites dans {FIXTURES_DIR}")
@@ -0,0 +1,285 @@
+"""
+Benchmarks de bout en bout du pipeline.
+
+Mesure, sur des données synthétiques générées par generateur.py :
+  - l'extraction du spider (AutosphereSpider.extraire_fiche/extraire_liens) sur les fixtures HTML,
+  - le nettoyage JsonToCsv.clean_and_normalize_data,
+  - database.integrer_donnees sur le stockage SQLite embarqué, et la relecture des données d'entraînement,
+  - l'entraînement du modèle,
+  - la prédiction unitaire et par lot,
+  - la construction de l'index des annonces comparables et la latence d'une recherche,
+  - le démarrage du CLI (python -m car_price_predictor) : aide des sous-commandes et
+    predict servi par le cache (nécessite un modèle entraîné), avec les modules lourds importés.
+Les résultats sont écrits en JSON dans benchmarks/results/ pour comparer les commits.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor.benchmarks.run --echelle 10k
+    python -m car_price_predictor.benchmarks.run --comparer results/ancien.json results/nouveau.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+from .generateur import ECHELLES, FIXTURES_DIR, ecrire_json
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+
+# Démarrage du CLI : nom de la mesure -> arguments de python -m car_price_predictor
+COMMANDES_DEMARRAGE = {
+    'aide': ['--help'],
+    'predict_aide': ['predict', '--help'],
+    'train_aide': ['train', '--help'],
+    'predict_cache': ['predict'],
+}
+MODULES_LOURDS = {'pandas', 'numpy', 'sklearn', 'xgboost', 'scipy', 'mysql', 'playwright', 'scrapy'}
+
+
+
+def chronometrer(fonction, repetitions=1):
+    """Meilleur temps (s) sur `repetitions` exécutions, et le résultat de la dernière."""
+    temps = []
+    for _ in range(repetitions):
+        debut = time.perf_counter()
+        resultat = fonction()
+        temps.append(time.perf_counter() - debut)
+    return min(temps), resultat
+
+
+def bench_extraction_spider(iterations=200):
+    """Extraction des fiches et des liens depuis les fixtures HTML rendues."""
+    from scrapy.http import HtmlResponse
+    from ..spiders.quotes_spider import AutosphereSpider
+
+    with open(os.path.join(FIXTURES_DIR, 'urls.json'), encoding='utf-8') as f:
+        urls = json.load(f)
+    reponses = []
+    for i, url in enumerate(urls):
+        with open(os.path.join(FIXTURES_DIR, f'fiche_{i}.html'), 'rb') as f:
+            reponses.append(HtmlResponse(url=url, body=f.read(), encoding='utf-8'))
+    with open(os.path.join(FIXTURES_DIR, 'recherche.html'), 'rb') as f:
+        recherche = HtmlResponse(url='https://www.autosphere.fr/recherche?from=0', body=f.read(), encoding='utf-8')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        spider = AutosphereSpider(output_file=os.path.join(tmp, 'autosphere_data.json'))
+        duree_fiches, _ = chronometrer(lambda: [spider.extraire_fiche(r) for _ in range(iterations) for r in reponses])
+        duree_liens, liens = chronometrer(lambda: [spider.extraire_liens(recherche) for _ in range(iterations)])
+
+    nb_fiches = iterations * len(reponses)
+    return {
+        'fiches': nb_fiches,
+        'fiches_par_s': nb_fiches / duree_fiches,
+        'ms_par_fiche': duree_fiches / nb_fiches * 1000,
+        'ms_par_page_recherche': duree_liens / iterations * 1000,
+        'liens_par_page': len(liens[0]),
+    }
+
+
+def bench_nettoyage(fichiers_json):
+    """clean_and_normalize_data sur chaque fichier JSON généré."""
+    from ..converter.JsonToCsv import clean_and_normalize_data
+
+    lignes = 0
+    debut = time.perf_counter()
+    for chemin in fichiers_json:
+        df = clean_and_normalize_data(chemin)
+        lignes += 0 if df is None else len(df)
+    duree = time.perf_counter() - debut
+    return {'fichiers': len(fichiers_json), 'lignes': lignes, 'duree_s': duree, 'lignes_par_s': lignes / duree}
+
+
+def bench_integration_bdd(nombre, dossier):
+    """integrer_donnees sur une base SQLite en fichier, puis relecture des données d'entraînement."""
+    from ..database import database
+
+    fichier_json = ecrire_json(nombre, os.path.join(dossier, 'bdd'), fiches_par_fichier=nombre)[0]
+    stockage = database.ouvrir_base(f"sqlite:///{os.path.join(dossier, 'bench.sqlite')}")
+    duree, _ = chronometrer(lambda: database.integrer_donnees(stockage, fichier_json))
+    duree_relecture, df = chronometrer(stockage.lire_entrainement)
+    nb_vehicules = stockage.compter_vehicules()
+    stockage.fermer()
+    return {
+        'lignes': nombre,
+        'vehicules_inseres': nb_vehicules,
+        'duree_s': duree,
+        'lignes_par_s': nombre / duree,
+        'lecture_entrainement_s': duree_relecture,
+        'lignes_entrainement': len(df),
+    }
+
+
+def lire_dataset(fichiers_json, dossier):
+    """dataset.csv converti depuis les fichiers JSON générés (conversion faite une seule fois), lu comme par model.py."""
+    from ..converter.JsonToCsv import convertir
+    from ..models.model import charger_dataset
+
+    dataset_csv = os.path.join(dossier, 'dataset.csv')
+    if not os.path.exists(dataset_csv):
+        convertir(os.path.dirname(fichiers_json[0]), dataset_csv)
+    return charger_dataset(dataset_csv)
+
+
+def bench_modele(fichiers_json, dossier, arbres=None, taille_lot=10_000, appels_unitaires=200):
+    """Entraînement sur le dataset converti, puis prédiction unitaire et par lot."""
+    from ..models.model import construire_modele, predire_lot, separer_et_imputer
+
+    df = lire_dataset(fichiers_json, dossier)
+    X_train, X_test, y_train, _ = separer_et_imputer(df)
+    model = construire_modele(params={'n_estimators': arbres} if arbres else None)
+    duree_fit, _ = chronometrer(lambda: model.fit(X_train, y_train))
+
+    une_ligne = X_test.iloc[[0]]
+    latences = []
+    for _ in range(appels_unitaires):
+        debut = time.perf_counter()
+        predire_lot(model, une_ligne)
+        latences.append(time.perf_counter() - debut)
+
+    lot = X_test.sample(n=taille_lot, replace=len(X_test) < taille_lot, random_state=42)
+    duree_lot, _ = chronometrer(lambda: predire_lot(model, lot), repetitions=3)
+
+    return {
+        'lignes_entrainement': len(X_train),
+        'arbres': model.named_steps['regressor'].n_estimators,
+        'entrainement_s': duree_fit,
+        'prediction_unitaire_ms_p50': statistics.median(latences) * 1000,
+        'prediction_unitaire_ms_p95': statistics.quantiles(latences, n=20)[-1] * 1000,
+        'prediction_lot_lignes': taille_lot,
+        'prediction_lot_lignes_par_s': taille_lot / duree_lot,
+    }
+
+
+def bench_comparables(fichiers_json, dossier, nb_requetes=1000):
+    """Construction de l'index des annonces comparables, puis latence d'une recherche des 10 plus proches."""
+    from ..models.comparables import construire_index, mesurer_latence
+
+    df = lire_dataset(fichiers_json, dossier)
+    duree, index = chronometrer(lambda: construire_index(df, os.path.join(dossier, 'comparables')))
+    latences = mesurer_latence(index, df, nb_requetes)
+    return {
+        'annonces': len(df),
+        'construction_s': duree,
+        'recherche_ms_p50': statistics.median(latences),
+        'recherche_ms_p95': statistics.quantiles(latences, n=20)[-1],
+        'recherche_ms_max': float(latences.max()),
+    }
+
+
+def bench_demarrage(repetitions=5):
+    """Meilleur temps (ms, processus neuf) de chaque commande de COMMANDES_DEMARRAGE et modules lourds qu'elle importe."""
+    from ..models.prediction import META_JSON
+
+    racine = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    env = {**os.environ, 'PYTHONPATH': os.pathsep.join(filter(None, [racine, os.environ.get('PYTHONPATH')]))}
+
+    def lancer(*arguments):
+        debut = time.perf_counter()
+        processus = subprocess.run([sys.executable, *arguments], capture_output=True, text=True, env=env, cwd=racine)
+        return time.perf_counter() - debut, processus
+
+    resultats = {'python_nu_ms': min(lancer('-c', 'pass')[0] for _ in range(repetitions)) * 1000}
+    for nom, options in COMMANDES_DEMARRAGE.items():
+        if nom == 'predict_cache':
+            if not os.path.exists(META_JSON):
+                print("⚠️ Aucun modèle entraîné : 'predict_cache' ignoré.")
+                continue
+            # Première exécution : remplit le cache de prédiction
+            lancer('-m', 'car_price_predictor', *options)
+        resultats[f'{nom}_ms'] = min(lancer('-m', 'car_price_predictor', *options)[0] for _ in range(repetitions)) * 1000
+
+        # Lignes 'import time: self | cumulé | module' de -X importtime
+        _, processus = lancer('-X', 'importtime', '-m', 'car_price_predictor', *options)
+        importes = {ligne.rsplit('|', 1)[-1].strip().split('.')[0]
+                    for ligne in processus.stderr.splitlines() if ligne.startswith('import time:')}
+        resultats[f'{nom}_modules_lourds'] = sorted(importes & MODULES_LOURDS)
+    return resultats
+
+
+def commit_courant():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'inconnu'
+
+
+def executer(echelle, benchmarks, arbres=None):
+    nombre = ECHELLES[echelle]
+    resultats = {}
+    with tempfile.TemporaryDirectory() as dossier:
+        fichiers_json = []
+        if {'nettoyage', 'modele', 'comparables'} & set(benchmarks):
+            print(f"⚙️ Génération de {nombre:,} fiches synthétiques...")
+            fichiers_json = ecrire_json(nombre, os.path.join(dossier, 'scrapped'))
+
+        for nom in benchmarks:
+            print(f"\n⏱️ Benchmark '{nom}'...")
+            if nom == 'spider':
+                resultats[nom] = bench_extraction_spider()
+            elif nom == 'nettoyage':
+                resultats[nom] = bench_nettoyage(fichiers_json)
+            elif nom == 'bdd':
+                resultats[nom] = bench_integration_bdd(nombre, dossier)
+            elif nom == 'modele':
+                resultats[nom] = bench_modele(fichiers_json, dossier, arbres)
+            elif nom == 'comparables':
+                resultats[nom] = bench_comparables(fichiers_json, dossier)
+            elif nom == 'demarrage':
+                resultats[nom] = bench_demarrage()
+            print(json.dumps(resultats[nom], indent=2))
+
+    return {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'commit': commit_courant(),
+        'echelle': echelle,
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'cpu': os.cpu_count(),
+        'resultats': resultats,
+    }
+
+
+def comparer(ancien, nouveau):
+    """Affiche le ratio nouveau/ancien de chaque métrique commune aux deux fichiers de résultats."""
+    with open(ancien, encoding='utf-8') as f:
+        a = json.load(f)
+    with open(nouveau, encoding='utf-8') as f:
+        b = json.load(f)
+    print(f"--- {a['commit']} ({a['echelle']}) -> {b['commit']} ({b['echelle']}) ---")
+    for bench, metriques in b['resultats'].items():
+        for nom, valeur in metriques.items():
+            reference = a['resultats'].get(bench, {}).get(nom)
+            if isinstance(valeur, (int, float)) and reference:
+                print(f"{bench + '.' + nom:<45} {reference:>14,.2f} -> {valeur:>14,.2f}  (x{valeur / reference:.2f})")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks du pipeline sur données synthétiques.")
+    parser.add_argument('--echelle', choices=list(ECHELLES), default='10k')
+    parser.add_argument('--bench', action='append', choices=['spider', 'nettoyage', 'bdd', 'modele', 'comparables', 'demarrage'],
+                        help="Benchmark à lancer (répétable, défaut: tous).")
+    parser.add_argument('--arbres', type=int, default=None, help="Nombre d'arbres du modèle (défaut: celui de model.py).")
+    parser.add_argument('--comparer', nargs=2, metavar=('ANCIEN', 'NOUVEAU'), help="Compare deux fichiers de résultats.")
+    args = parser.parse_args(argv)
+
+    if args.comparer:
+        comparer(*args.comparer)
+        return
+
+    rapport = executer(args.echelle, args.bench or ['spider', 'nettoyage', 'bdd', 'modele', 'comparables', 'demarrage'], args.arbres)
+
+    os.makedirs(RESULTS_DIR, exist_ok=True)
+    chemin = os.path.join(RESULTS_DIR, f"{datetime.now():%Y%m%d-%H%M%S}_{rapport['commit']}_{args.echelle}.json")
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump(rapport, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Résultats écrits dans {chemin}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,67 @@
+"""
+Point d'entrée unique du projet.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor crawl [-a sites=autosphere,...] [-a archive=DOSSIER] [-s STOCKAGE_BDD=...]
+    python -m car_price_predictor convert [--source scrapped/] [--sortie dataset.csv]
+    python -m car_price_predictor load [--stockage sqlite:///annonces.db]
+    python -m car_price_predictor train [--mode native] [--source sqlite:///annonces.db]
+    python -m car_price_predictor refresh [--source sqlite:///annonces.db] [--complet]
+    python -m car_price_predictor predict [--config car_config.json] [--comparables]
+    python -m car_price_predictor pipeline [--sequentiel] [--force entrainement]
+
+Chaque sous-commande n'importe son module qu'au moment où elle est lancée :
+pandas, scikit-learn, XGBoost, mysql et Playwright ne sont chargés que par les
+commandes qui s'en servent, et `predict` répond depuis son cache sans charger
+le modèle (voir models/prediction.py). Les options après la sous-commande sont
+celles du module correspondant (`<commande> --help`).
+"""
+import argparse
+import importlib
+import os
+import sys
+
+# Sous-commande -> (module exposant main(argv), description) ; crawl passe par main_crawl
+COMMANDES = {
+    'crawl': (None, "Crawle les sites de sites.py (options -a/-s transmises à Scrapy)."),
+    'convert': ('car_price_predictor.converter.JsonToCsv', "Nettoie les JSON de scrapped/ en dataset.csv."),
+    'load': ('car_price_predictor.database.database', "Charge autosphere_data.json dans le stockage."),
+    'train': ('car_price_predictor.models.model', "Entraîne le modèle et construit l'index des comparables."),
+    'refresh': ('car_price_predictor.models.refresh', "Prolonge le modèle sauvegardé sur les nouvelles annonces."),
+    'predict': ('car_price_predictor.models.prediction', "Prédit le prix de car_config.json."),
+    'pipeline': ('car_price_predictor.app', "Conversion, chargement et entraînement orchestrés (avec cache)."),
+}
+
+SPIDER = 'sites'
+
+
+def main_crawl(argv=None):
+    """`scrapy crawl sites` avec les réglages du projet, quel que soit le répertoire courant."""
+    from scrapy.cmdline import execute
+
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'car_price_predictor.settings')
+    execute(['scrapy', 'crawl', SPIDER, *(argv or [])])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        prog='car_price_predictor',
+        description="Collecte, préparation et prédiction du prix des voitures d'occasion.",
+        formatter_class=argparse.RawDescriptionHelpFormatter,
+        epilog="\n".join(f"  {nom:<9} {description}" for nom, (_, description) in COMMANDES.items()),
+    )
+    parser.add_argument('commande', choices=list(COMMANDES), metavar='commande',
+                        help=f"Sous-commande : {', '.join(COMMANDES)}.")
+    parser.add_argument('options', nargs=argparse.REMAINDER, help="Options de la sous-commande (voir <commande> --help).")
+    args = parser.parse_args(argv)
+
+    # Nom affiché par l'aide et les erreurs du parser de la sous-commande
+    sys.argv[0] = f"car_price_predictor {args.commande}"
+    if args.commande == 'crawl':
+        return main_crawl(args.options)
+    module = importlib.import_module(COMMANDES[args.commande][0])
+    return module.main(args.options)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
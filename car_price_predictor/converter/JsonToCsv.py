@@ -1,15 +1,44 @@
 import pandas as pd
+import argparse
 import json
 import os
 import re
+import sys
+import time
+from contextlib import nullcontext
 from datetime import datetime
 
+if __package__:
+    from .. import metriques, profilage
+    from ..items import PORTES_PLACES_DEFAUT, FicheVehicule
+else:  # lancé comme script : python3 JsonToCsv.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from car_price_predictor import metriques, profilage
+    from car_price_predictor.items import PORTES_PLACES_DEFAUT, FicheVehicule
+
 json_dir = "scrapped/"
-outputCsv = "database/dataset.csv"
+
+# Champs de FicheVehicule repris dans le dataset (reference et les doublons de sections ne sont pas conservés)
+COLONNES_FICHE = [
+    # Cible (Y)
+    'prix_ttc_eur',
+    # Identifiant de l'annonce : ignoré par le modèle, affiché avec les annonces comparables
+    'url',
+    # Caractéristiques principales (X)
+    'nom_complet_vehicule', 'energie', 'boite_de_vitesses', 'couleur',
+    'type_vehicule',  # Ex: SUV, Berline
+    'provenance', 'premiere_main',
+    # Champs Numériques à nettoyer
+    'kilometrage', 'date_mise_en_circulation', 'puissance_fiscale', 'puissance_reelle', 'portes', 'places',
+    # Champs à considérer (à vous de voir si vous les gardez ou non)
+    'longueur', 'largeur', 'hauteur', 'poids', 'volume_coffre', 'air_quality_icon', 'ville',
+]
+outputCsv = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'database', 'dataset.csv')
 
 # --- 1. SÉLECTION ET NETTOYAGE DES CHAMPS ---
 def clean_and_normalize_data(json_file_path):
     """Charge un fichier JSON, sélectionne les champs pertinents et les nettoie."""
+    debut = time.perf_counter()
     try:
         with open(json_file_path, 'r', encoding='utf-8') as f:
             data = json.load(f)
@@ -17,51 +46,14 @@ def clean_and_normalize_data(json_file_path):
         print(f"Erreur lors du chargement de {json_file_path}: {e}")
         return None
 
-    # Sélection des champs non redondants et pertinents
-    cleaned_data = []
-    for item in data:
-        # Si le prix est manquant, on ignore la ligne
-        if 'prix_ttc_eur' not in item:
-            continue
-
-        new_item = {
-            # Cible (Y)
-            'prix_ttc_eur': item.get('prix_ttc_eur'),
-            
-            # Caractéristiques principales (X)
-            'nom_complet_vehicule': item.get('nom_complet_vehicule', ''),
-            'energie': item.get('menu_energie', ''),
-            'boite_de_vitesses': item.get('menu_boite_de_vitesses', ''),
-            'couleur': item.get('menu_couleur', ''),
-            'type_vehicule': item.get('menu_categorie', ''), # Ex: SUV, Berline
-            'provenance': item.get('menu_provenance', ''),
-            'premiere_main': item.get('menu_premiere_main', ''),
-
-            # Champs Numériques à nettoyer
-            'kilometrage': item.get('menu_kilometrage', ''),
-            'date_mise_en_circulation': item.get('menu_date_de_mise_en_circulation', ''),
-            'puissance_fiscale': item.get('menu_puissance_fiscale', ''),
-            'puissance_reelle': item.get('menu_puissance_reelle', ''),
-            'portes': item.get('menu_portes', ''),
-            'places': item.get('menu_places', ''),
-            
-            # Champs à considérer (à vous de voir si vous les gardez ou non)
-            'longueur': item.get('menu_longueur', ''),
-            'largeur': item.get('menu_largeur', ''),
-            'hauteur': item.get('menu_hauteur', ''),
-            'poids': item.get('menu_poids', ''),
-            'volume_coffre': item.get('menu_volume_du_coffre', ''),
-            'air_quality_icon': item.get('menu_air_quality_icon', ''),
-            'ville': item.get('menu_ville', ''),
-            
-            # Champs ignorés: url, reference, et les doublons (acheter_, entretenir_, etc.)
-        }
-        cleaned_data.append(new_item)
-    
-    if not cleaned_data:
+    # Si le prix est manquant, on ignore la ligne
+    fiches = [fiche for fiche in map(FicheVehicule.depuis_dict, data) if fiche.prix_ttc_eur is not None]
+    if not fiches:
         return None
-        
-    df = pd.DataFrame(cleaned_data)
+
+    # Construction colonne par colonne depuis les champs canoniques de la fiche (COLONNES_FICHE)
+    df = pd.DataFrame({col: [getattr(fiche, col) for fiche in fiches] for col in COLONNES_FICHE})
+    df.fillna('', inplace=True)
     
     # --- 2. FONCTIONS DE NETTOYAGE ET CONVERSION ---
     
@@ -77,36 +69,13 @@ def clean_and_normalize_data(json_file_path):
         except ValueError:
             return None
 
-    # Extraction Marque et Modèle du nom complet
-    def extract_brand_model(name):
-        parts = str(name).split(' ')
-        # Logique simplifiée: La marque est souvent le premier mot
-        marque = parts[0] if parts else ''
-        # Le modèle est souvent le deuxième mot
-        modele = parts[1] if len(parts) > 1 else ''
-        return marque, modele
-
-    # Calcul de l'âge du véhicule (Feature Engineering)
-    def calculate_car_age(date_str):
-        if pd.isna(date_str) or date_str == '':
-            return None
-        try:
-            # Assurez-vous que le format de la date (JJ/MM/AAAA) est correct
-            date_immat = datetime.strptime(date_str, '%d/%m/%Y')
-            # Utilisez la date d'aujourd'hui pour calculer l'âge
-            age_jours = (datetime.now() - date_immat).days
-            # On retourne l'âge en jours ou en années (les jours sont plus précis)
-            return age_jours / 365.25
-        except ValueError:
-            return None
-
     # --- 3. APPLICATION DES TRANSFORMATIONS ---
     
     # Appliquer le nettoyage aux colonnes numériques/quantitatives
     df['kilometrage'] = df['kilometrage'].apply(clean_numeric_string)
     df['puissance_reelle'] = df['puissance_reelle'].apply(clean_numeric_string)
-    df['portes'] = df['portes'].apply(clean_numeric_string).fillna(5).astype(int) # 5 est une valeur par défaut raisonnable si manquant
-    df['places'] = df['places'].apply(clean_numeric_string).fillna(5).astype(int) # 5 est une valeur par défaut raisonnable si manquant
+    df['portes'] = df['portes'].apply(clean_numeric_string).fillna(PORTES_PLACES_DEFAUT).astype(int) # valeur par défaut raisonnable si manquant
+    df['places'] = df['places'].apply(clean_numeric_string).fillna(PORTES_PLACES_DEFAUT).astype(int) # valeur par défaut raisonnable si manquant
     df['puissance_fiscale'] = df['puissance_fiscale'].apply(clean_numeric_string)
     
 # Nettoyage des champs de taille (souvent moins critiques)
@@ -116,16 +85,17 @@ def clean_and_normalize_data(json_file_path):
     df['poids'] = df['poids'].apply(clean_numeric_string)
     df['volume_coffre'] = df['volume_coffre'].apply(clean_numeric_string)
 
-    # Feature Engineering (Age du véhicule)
-    df['age_ans'] = df['date_mise_en_circulation'].apply(calculate_car_age)
+    # Feature Engineering (Age du véhicule) et Marque/Modèle : dérivés par FicheVehicule,
+    # comme pour le chargement en base (database.preparer_vehicule)
+    maintenant = datetime.now()
+    df['age_ans'] = [fiche.age_ans(maintenant) for fiche in fiches]
     df.drop(columns=['date_mise_en_circulation'], inplace=True)
 
-    # Extraction Marque/Modèle
-    df[['marque', 'modele']] = df['nom_complet_vehicule'].apply(lambda x: pd.Series(extract_brand_model(x)))
+    df['marque'], df['modele'] = zip(*(fiche.marque_modele() for fiche in fiches))
     df.drop(columns=['nom_complet_vehicule'], inplace=True)
     
     # Conversion de toutes les chaînes restantes en minuscules pour l'uniformité
-    for col in df.select_dtypes(include=['object']).columns:
+    for col in df.select_dtypes(include=['object']).columns.drop('url'):
         df[col] = df[col].astype(str).str.lower().str.strip().replace('nan', '') # Remplacer 'nan' textuel par vide
 
     # --- 4. GESTION DES VALEURS MANQUANTES ET NETTOYAGE FINAL ---
@@ -135,32 +105,66 @@ def clean_and_normalize_data(json_file_path):
     
     # Suppression des lignes où le kilométrage, l'âge ou la puissance sont manquants (critiques pour le prix)
     df.dropna(subset=['kilometrage', 'age_ans', 'puissance_reelle', 'puissance_fiscale'], inplace=True)
-    
+
+    duree = time.perf_counter() - debut
+    fichier = os.path.basename(json_file_path)
+    metriques.observer('etl_duree_fichier_secondes', duree)
+    metriques.incrementer('etl_lignes_lues_total', len(data))
+    metriques.incrementer('etl_lignes_conservees_total', len(df))
+    metriques.definir('etl_lignes_par_seconde', len(data) / duree, fichier=fichier)
+
     return df
 
 # --- 5. LOGIQUE PRINCIPALE ---
-all_data = []
-json_files = [f for f in os.listdir(json_dir) if f.endswith('.json')]
+def convertir(json_dir=json_dir, outputCsv=outputCsv):
+    """
+    Nettoie tous les fichiers JSON de json_dir et les consolide dans outputCsv.
+    Retourne le nombre de lignes sauvegardées, ou None si aucune donnée n'a été conservée.
+    """
+    all_data = []
+    json_files = [f for f in os.listdir(json_dir) if f.endswith('.json')]
 
-print(f"Début du traitement de {len(json_files)} fichiers JSON...")
+    print(f"Début du traitement de {len(json_files)} fichiers JSON...")
 
-for i, json_file in enumerate(json_files):
-    if(i<10000000): 
+    for i, json_file in enumerate(json_files):
         df_cleaned = clean_and_normalize_data(os.path.join(json_dir, json_file))
         if df_cleaned is not None:
             all_data.append(df_cleaned)
         print(f"✅ Traité {i+1}/{len(json_files)}: {json_file}. {len(df_cleaned) if df_cleaned is not None else 0} lignes conservées.")
-    else: 
-        pass
 
-if all_data:
+    if not all_data:
+        print("\n❌ Aucun fichier JSON valide trouvé ou aucune donnée n'a été conservée après nettoyage.")
+        return None
+
     final_df = pd.concat(all_data, ignore_index=True)
-    
+
     # Suppression des lignes avec prix manquant ou égal à zéro (non entraînable)
-    final_df = final_df[final_df['prix_ttc_eur'] > 0] 
-    
+    final_df = final_df[final_df['prix_ttc_eur'] > 0]
+
     # Sauvegarde finale
     final_df.to_csv(outputCsv, index=False, encoding='utf-8')
     print(f"\n✨ FIN DU TRAITEMENT. {len(final_df)} lignes sauvegardées dans {outputCsv} avec succès.")
-else:
-    print("\n❌ Aucun fichier JSON valide trouvé ou aucune donnée n'a été conservée après nettoyage.")
\ No newline at end of file
+    return len(final_df)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Nettoie les JSON de scrapped/ et les consolide dans dataset.csv.")
+    parser.add_argument('--source', default=json_dir, help=f"Dossier des JSON du spider (défaut: {json_dir}).")
+    parser.add_argument('--sortie', default=outputCsv, help="CSV produit (défaut: database/dataset.csv).")
+    parser.add_argument('--metriques', metavar='FICHIER',
+                        help="Active l'instrumentation et l'écrit dans FICHIER (.json, sinon texte Prometheus).")
+    parser.add_argument('--profile', nargs='?', const='profils', metavar='DOSSIER',
+                        help="Profile la conversion (pstats, piles pour flamegraph, tracemalloc) dans DOSSIER (défaut: profils/).")
+    args = parser.parse_args(argv)
+
+    if args.metriques:
+        metriques.activer()
+    with profilage.profiler('conversion', args.profile) if args.profile else nullcontext():
+        lignes = convertir(args.source, args.sortie)
+    if args.metriques:
+        metriques.ecrire(args.metriques)
+    return 0 if lignes else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
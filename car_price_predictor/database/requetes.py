@@ -0,0 +1,267 @@
+"""
+Couche de requêtes analytiques sur le schéma en étoile (voir stockage.py).
+
+- preparer() crée les index composites utilisés par les requêtes et la table
+  d'agrégats StatsPrix.
+- rafraichir_agregats() tient à jour StatsPrix : nombre d'annonces et prix
+  (moyen, médian, quartiles, min, max) par modèle, tranche d'âge et tranche de
+  kilométrage. Seuls les modèles dont une annonce a été chargée depuis le
+  dernier rafraîchissement (colonne num_chargement) sont recalculés.
+- comparables(stockage, config, k) retourne les k annonces du même modèle les
+  plus proches en âge et kilométrage, via l'index (id_modele, age_ans, kilometrage).
+  Sans âge ou kilométrage dans la configuration, il n'y a ni tranche ni
+  distance : comparables() et statistiques() ne retournent rien.
+
+`predict --stockage` affiche ces statistiques et comparables sous le prix prédit
+en lecture seule : il lit StatsPrix tel que le dernier chargement l'a laissé,
+sans créer d'index ni rafraîchir les agrégats, et s'en passe si la table manque.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor.database.requetes --stockage sqlite:///annonces.db -k 10
+"""
+import argparse
+import json
+import os
+import warnings
+
+import pandas as pd
+
+TRANCHE_AGE_ANS = 2
+TRANCHE_KM = 20_000
+# Au-delà, on cherche des comparables sur toute la plage d'âges du modèle
+FENETRE_AGE_MAX_ANS = 32
+# Modèles recalculés par requête lors du rafraîchissement (taille des listes IN)
+MODELES_PAR_REQUETE = 500
+
+INDEX = {
+    # Comparables et agrégats d'un modèle : égalité sur id_modele, plage sur age_ans
+    'idx_vehicule_modele_age_km': ('Vehicule', ['id_modele', 'age_ans', 'kilometrage']),
+    # Annonces chargées depuis le dernier rafraîchissement
+    'idx_vehicule_num_chargement': ('Vehicule', ['num_chargement']),
+}
+
+DDL_AGREGATS = [
+    """
+    CREATE TABLE IF NOT EXISTS StatsPrix (
+        id_modele INT NOT NULL,
+        tranche_age INT NOT NULL,
+        tranche_km INT NOT NULL,
+        nb INT NOT NULL,
+        prix_moyen DOUBLE,
+        prix_median DOUBLE,
+        prix_q25 DOUBLE,
+        prix_q75 DOUBLE,
+        prix_min INT,
+        prix_max INT,
+        PRIMARY KEY (id_modele, tranche_age, tranche_km)
+    )
+    """,
+    # Dernier num_chargement pris en compte par chaque table d'agrégats
+    "CREATE TABLE IF NOT EXISTS EtatAgregats (nom VARCHAR(50) PRIMARY KEY, num_chargement INT)",
+]
+
+CONDITIONS_ANNONCE_VALIDE = "prix_ttc_eur > 0 AND age_ans IS NOT NULL AND kilometrage IS NOT NULL"
+
+
+def _lire(stockage, requete, params=()):
+    with warnings.catch_warnings():
+        # pandas préfère SQLAlchemy mais accepte une connexion DB-API
+        warnings.simplefilter('ignore', UserWarning)
+        return pd.read_sql_query(requete, stockage.conn, params=list(params))
+
+
+def _liste(stockage, n):
+    return ', '.join([stockage.marqueur] * n)
+
+
+def preparer(stockage):
+    """Crée (si besoin) les index composites et les tables d'agrégats."""
+    for nom, (table, colonnes) in INDEX.items():
+        stockage.creer_index(nom, table, colonnes)
+    cursor = stockage.curseur()
+    for requete in DDL_AGREGATS:
+        cursor.execute(requete)
+    cursor.close()
+    stockage.commit()
+
+
+def age_et_kilometrage(config):
+    """(âge, kilométrage) de `config` en nombres, ou None si l'un manque, est vide ou n'est pas numérique."""
+    try:
+        age, km = float(config['age_ans']), float(config['kilometrage'])
+    except (KeyError, TypeError, ValueError):
+        return None
+    return None if pd.isna(age) or pd.isna(km) else (age, km)
+
+
+def tranches(age_ans, kilometrage):
+    return age_ans // TRANCHE_AGE_ANS, kilometrage // TRANCHE_KM
+
+
+def rafraichir_agregats(stockage, complet=False):
+    """
+    Recalcule les statistiques de prix des modèles dont une annonce a été
+    chargée depuis le dernier rafraîchissement (tous les modèles si `complet`).
+    Retourne le nombre de modèles recalculés.
+    """
+    cursor = stockage.curseur()
+    cursor.execute("SELECT num_chargement FROM EtatAgregats WHERE nom = 'StatsPrix'")
+    ligne = cursor.fetchone()
+    depuis = 0 if complet or ligne is None else ligne[0]
+
+    # Lu avant le calcul : un chargement concurrent sera repris au rafraîchissement suivant
+    cursor.execute("SELECT COALESCE(MAX(num_chargement), 0) FROM Vehicule")
+    jusqu_a = cursor.fetchone()[0]
+
+    cursor.execute(f"""
+        SELECT DISTINCT id_modele FROM Vehicule
+        WHERE id_modele IS NOT NULL AND num_chargement > {stockage.marqueur} AND num_chargement <= {stockage.marqueur}
+    """, (depuis, jusqu_a))
+    modeles = [ligne[0] for ligne in cursor.fetchall()]
+
+    for debut in range(0, len(modeles), MODELES_PAR_REQUETE):
+        lot = modeles[debut:debut + MODELES_PAR_REQUETE]
+        annonces = _lire(stockage, f"""
+            SELECT id_modele, age_ans, kilometrage, prix_ttc_eur FROM Vehicule
+            WHERE id_modele IN ({_liste(stockage, len(lot))}) AND {CONDITIONS_ANNONCE_VALIDE}
+        """, lot)
+        cursor.execute(f"DELETE FROM StatsPrix WHERE id_modele IN ({_liste(stockage, len(lot))})", lot)
+        if annonces.empty:
+            # Aucune annonce exploitable (âge ou kilométrage manquant) pour ces modèles
+            continue
+        tranche_age, tranche_km = tranches(annonces['age_ans'], annonces['kilometrage'])
+        annonces['tranche_age'], annonces['tranche_km'] = tranche_age.astype(int), tranche_km.astype(int)
+        prix = annonces.groupby(['id_modele', 'tranche_age', 'tranche_km'])['prix_ttc_eur']
+        stats = pd.DataFrame({
+            'nb': prix.size(),
+            'prix_moyen': prix.mean(),
+            'prix_median': prix.median(),
+            'prix_q25': prix.quantile(0.25),
+            'prix_q75': prix.quantile(0.75),
+            'prix_min': prix.min(),
+            'prix_max': prix.max(),
+        }).reset_index()
+
+        cursor.executemany(
+            f"INSERT INTO StatsPrix ({', '.join(stats.columns)}) VALUES ({_liste(stockage, len(stats.columns))})",
+            list(stats.astype(object).itertuples(index=False, name=None)),
+        )
+
+    cursor.execute("DELETE FROM EtatAgregats WHERE nom = 'StatsPrix'")
+    cursor.execute(f"INSERT INTO EtatAgregats (nom, num_chargement) VALUES ('StatsPrix', {stockage.marqueur})", (jusqu_a,))
+    cursor.close()
+    stockage.commit()
+    print(f"📊 Statistiques de prix recalculées pour {len(modeles)} modèle(s).")
+    return len(modeles)
+
+
+def id_modele(stockage, marque, modele):
+    """Identifiant du modèle (noms comparés sans tenir compte de la casse), ou None."""
+    cursor = stockage.curseur()
+    cursor.execute(f"""
+        SELECT mo.id FROM Modele mo JOIN Marque ma ON ma.id = mo.id_marque
+        WHERE LOWER(ma.nom_marque) = {stockage.marqueur} AND LOWER(mo.nom_modele) = {stockage.marqueur}
+    """, (str(marque).lower(), str(modele).lower()))
+    ligne = cursor.fetchone()
+    cursor.close()
+    return ligne[0] if ligne else None
+
+
+def comparables(stockage, config, k=10):
+    """
+    Les k annonces du même marque/modèle que `config` les plus proches en âge et
+    kilométrage (distance en nombre de tranches). La fenêtre d'âge est élargie
+    tant qu'elle contient moins de k annonces. Retourne un DataFrame
+    (url, prix_ttc_eur, age_ans, kilometrage, distance), vide si le modèle est
+    inconnu ou si l'âge ou le kilométrage manque.
+    """
+    colonnes = ['url', 'prix_ttc_eur', 'age_ans', 'kilometrage', 'distance']
+    age_km = age_et_kilometrage(config)
+    identifiant = id_modele(stockage, config.get('marque'), config.get('modele')) if age_km else None
+    if identifiant is None:
+        return pd.DataFrame(columns=colonnes)
+
+    age, km = age_km
+    fenetre = TRANCHE_AGE_ANS
+    cursor = stockage.curseur()
+    while True:
+        # Curseur plutôt que read_sql : sur une requête aussi courte, la surcharge de pandas dominerait
+        cursor.execute(f"""
+            SELECT url, prix_ttc_eur, age_ans, kilometrage FROM Vehicule
+            WHERE id_modele = {stockage.marqueur} AND age_ans BETWEEN {stockage.marqueur} AND {stockage.marqueur}
+              AND {CONDITIONS_ANNONCE_VALIDE}
+        """, (identifiant, age - fenetre, age + fenetre))
+        lignes = cursor.fetchall()
+        if len(lignes) >= k or fenetre >= FENETRE_AGE_MAX_ANS:
+            break
+        fenetre *= 2
+    cursor.close()
+
+    annonces = pd.DataFrame(lignes, columns=colonnes[:-1])
+    annonces['distance'] = (annonces['age_ans'] - age).abs() / TRANCHE_AGE_ANS + (annonces['kilometrage'] - km).abs() / TRANCHE_KM
+    return annonces.nsmallest(k, 'distance')[colonnes].reset_index(drop=True)
+
+
+def statistiques(stockage, config):
+    """
+    Statistiques de prix précalculées de la tranche de `config` (dict), ou None
+    (âge ou kilométrage manquant, modèle inconnu, ou StatsPrix jamais créée).
+    """
+    age_km = age_et_kilometrage(config)
+    identifiant = id_modele(stockage, config.get('marque'), config.get('modele')) if age_km else None
+    if identifiant is None or not stockage.table_existe('StatsPrix'):
+        return None
+    tranche_age, tranche_km = tranches(int(age_km[0]), int(age_km[1]))
+    stats = _lire(stockage, f"""
+        SELECT * FROM StatsPrix
+        WHERE id_modele = {stockage.marqueur} AND tranche_age = {stockage.marqueur} AND tranche_km = {stockage.marqueur}
+    """, (identifiant, tranche_age, tranche_km))
+    return None if stats.empty else stats.iloc[0].to_dict()
+
+
+def afficher_comparables(stockage, config, k=10):
+    """Affiche les statistiques de la tranche et les k comparables de `config`."""
+    if age_et_kilometrage(config) is None:
+        print("⚠️ 'age_ans' et 'kilometrage' sont nécessaires pour les statistiques et les annonces comparables du stockage.")
+        return pd.DataFrame(columns=['url', 'prix_ttc_eur', 'age_ans', 'kilometrage', 'distance'])
+    stats = statistiques(stockage, config)
+    if stats:
+        print(f"Tranche {int(stats['tranche_age']) * TRANCHE_AGE_ANS}-{(int(stats['tranche_age']) + 1) * TRANCHE_AGE_ANS} ans, "
+              f"{int(stats['tranche_km']) * TRANCHE_KM:,}-{(int(stats['tranche_km']) + 1) * TRANCHE_KM:,} km : "
+              f"{int(stats['nb'])} annonce(s), prix médian {stats['prix_median']:,.0f}€ "
+              f"(Q1 {stats['prix_q25']:,.0f}€ - Q3 {stats['prix_q75']:,.0f}€)")
+    resultats = comparables(stockage, config, k)
+    if resultats.empty:
+        print(f"Aucune annonce comparable pour {config.get('marque')} {config.get('modele')}.")
+        return resultats
+    print(f"--- {len(resultats)} annonce(s) comparable(s) ---")
+    for r in resultats.itertuples():
+        print(f"{r.prix_ttc_eur:>8,}€  {r.age_ans:>4.1f} ans  {r.kilometrage:>8,} km  {r.url}")
+    return resultats
+
+
+def main(argv=None):
+    from .database import ouvrir_base, STOCKAGE_DEFAUT
+
+    chemin_config = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', 'to_predict', 'car_config.json')
+    parser = argparse.ArgumentParser(description="Statistiques de prix et annonces comparables depuis le stockage.")
+    parser.add_argument('--stockage', default=STOCKAGE_DEFAUT, help="sqlite:///chemin.db ou mysql://base.")
+    parser.add_argument('--config', default=chemin_config, help="Configuration du véhicule (défaut: car_config.json).")
+    parser.add_argument('-k', type=int, default=10, help="Nombre d'annonces comparables.")
+    parser.add_argument('--complet', action='store_true', help="Recalcule les agrégats de tous les modèles.")
+    args = parser.parse_args(argv)
+
+    with open(args.config, encoding='utf-8') as f:
+        config = json.load(f)
+
+    stockage = ouvrir_base(args.stockage)
+    try:
+        preparer(stockage)
+        rafraichir_agregats(stockage, args.complet)
+        afficher_comparables(stockage, config, args.k)
+    finally:
+        stockage.fermer()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,477 @@
+"""
+Backends de stockage du schéma en étoile des annonces.
+
+Vehicule (table de faits) référence Modele -> Marque et les dimensions
+Energie, BoiteDeVitesses, Couleur, Provenance et TypeVehicule. Deux backends
+partagent le même schéma et la même interface :
+  - StockageMySQL  : le serveur MySQL historique (mysql://base),
+  - StockageSQLite : un fichier SQLite embarqué (sqlite:///chemin.db), en
+                     mode WAL, sans serveur.
+
+Les véhicules sont chargés par lots : les identifiants des dimensions sont
+résolus en mémoire (une lecture par table puis un INSERT groupé des valeurs
+nouvelles), puis un upsert groupé (executemany) par lot, dans une seule
+transaction par lot.
+"""
+import time
+
+from .. import metriques
+
+TAILLE_LOT = 1000
+
+# Clé du véhicule préparé -> (table de dimension, colonne du libellé, clé étrangère dans Vehicule)
+DIMENSIONS = {
+    'energie': ('Energie', 'nom_energie', 'id_energie'),
+    'boite_de_vitesses': ('BoiteDeVitesses', 'nom_boite', 'id_boite'),
+    'couleur': ('Couleur', 'nom_couleur', 'id_couleur'),
+    'provenance': ('Provenance', 'nom_provenance', 'id_provenance'),
+    'type_vehicule': ('TypeVehicule', 'nom_type', 'id_type'),
+}
+
+# Valeurs recopiées telles quelles du véhicule préparé
+COLONNES_VALEURS = [
+    'url', 'nom_complet', 'prix_ttc_eur', 'age_ans', 'kilometrage', 'places', 'portes',
+    'puissance_fiscale', 'puissance_reelle', 'premiere_main',
+]
+COLONNES_VEHICULE = COLONNES_VALEURS + ['id_modele'] + [fk for _, _, fk in DIMENSIONS.values()] + ['num_chargement']
+
+# Colonnes mises à jour quand une annonce déjà connue est rechargée.
+# num_chargement (numéro croissant du dernier chargement de l'annonce) sert au
+# rafraîchissement incrémental des agrégats (requetes.py)
+COLONNES_MISES_A_JOUR = ['prix_ttc_eur', 'kilometrage', 'age_ans', 'num_chargement']
+
+# Colonnes de Vehicule mal nommées dans la première version du schéma MySQL : ancien nom -> nom actuel
+COLONNES_RENOMMEES = {'prix_tt_eur': 'prix_ttc_eur'}
+
+# Données d'entraînement : mêmes colonnes et mêmes conventions (minuscules, 'oui'/'non') que dataset.csv
+REQUETE_ENTRAINEMENT = """
+    SELECT v.prix_ttc_eur,
+           LOWER(en.nom_energie) AS energie,
+           LOWER(bo.nom_boite) AS boite_de_vitesses,
+           LOWER(co.nom_couleur) AS couleur,
+           LOWER(ty.nom_type) AS type_vehicule,
+           LOWER(pr.nom_provenance) AS provenance,
+           CASE WHEN v.premiere_main THEN 'oui' ELSE 'non' END AS premiere_main,
+           v.kilometrage, v.puissance_fiscale, v.puissance_reelle, v.portes, v.places, v.age_ans,
+           LOWER(ma.nom_marque) AS marque,
+           NULLIF(LOWER(mo.nom_modele), '') AS modele,
+           v.url
+    FROM Vehicule v
+    LEFT JOIN Modele mo ON mo.id = v.id_modele
+    LEFT JOIN Marque ma ON ma.id = mo.id_marque
+    LEFT JOIN Energie en ON en.id = v.id_energie
+    LEFT JOIN BoiteDeVitesses bo ON bo.id = v.id_boite
+    LEFT JOIN Couleur co ON co.id = v.id_couleur
+    LEFT JOIN Provenance pr ON pr.id = v.id_provenance
+    LEFT JOIN TypeVehicule ty ON ty.id = v.id_type
+    WHERE v.prix_ttc_eur > 0
+      AND v.kilometrage IS NOT NULL AND v.age_ans IS NOT NULL
+      AND v.puissance_reelle IS NOT NULL AND v.puissance_fiscale IS NOT NULL
+"""
+
+
+class CurseurInstrumente:
+    """Curseur qui compte les allers-retours vers la BDD et mesure leur latence."""
+
+    def __init__(self, cursor):
+        self._cursor = cursor
+
+    def _mesurer(self, methode, *args):
+        debut = time.perf_counter()
+        try:
+            return methode(*args)
+        finally:
+            metriques.observer('bdd_requete_secondes', time.perf_counter() - debut)
+            metriques.incrementer('bdd_allers_retours_total')
+
+    def execute(self, query, *args):
+        return self._mesurer(self._cursor.execute, query, *args)
+
+    def executemany(self, query, *args):
+        return self._mesurer(self._cursor.executemany, query, *args)
+
+    def __getattr__(self, nom):
+        return getattr(self._cursor, nom)
+
+
+class Stockage:
+    """Interface commune des backends. Les sous-classes fournissent le dialecte SQL."""
+
+    # Paramètre positionnel du driver DB-API
+    marqueur = '%s'
+
+    def __init__(self, conn):
+        self.conn = conn
+        # Caches libellé -> id des dimensions, remplis à la première utilisation de chaque table
+        self._ids = {}
+
+    def curseur(self):
+        cursor = self.conn.cursor()
+        return CurseurInstrumente(cursor) if metriques.est_actif() else cursor
+
+    def commit(self):
+        with metriques.chronometre('bdd_commit_secondes'):
+            self.conn.commit()
+        metriques.incrementer('bdd_allers_retours_total')
+
+    def fermer(self):
+        self.conn.close()
+
+    # --- Dialecte ---
+
+    def requetes_schema(self):
+        raise NotImplementedError
+
+    def requete_insertion_ignoree(self, table, colonnes):
+        raise NotImplementedError
+
+    def requete_upsert_vehicule(self):
+        raise NotImplementedError
+
+    def colonnes_ajoutees(self):
+        """Colonnes de Vehicule apparues après la première version du schéma : {colonne: définition pour ALTER TABLE}."""
+        raise NotImplementedError
+
+    def creer_index(self, nom, table, colonnes):
+        raise NotImplementedError
+
+    def retyper_colonnes(self, cursor):
+        """Aligne le type des colonnes de Vehicule créées avec un type antérieur (par défaut : rien à faire)."""
+
+    def verrouiller_urls(self, cursor, urls):
+        """
+        URLs de `urls` déjà présentes dans Vehicule, lues dans la transaction du lot et
+        protégées jusqu'à son commit : un autre écrivain ne peut pas les insérer entre-temps.
+        """
+        raise NotImplementedError
+
+    # --- Schéma ---
+
+    def _colonne_existe(self, cursor, colonne, table='Vehicule'):
+        try:
+            cursor.execute(f"SELECT {colonne} FROM {table} LIMIT 0")
+            cursor.fetchall()
+            return True
+        except Exception:
+            return False
+
+    def table_existe(self, table):
+        """Vrai si `table` existe (sans rien créer : utilisable par les lecteurs seuls)."""
+        cursor = self.curseur()
+        try:
+            return self._colonne_existe(cursor, '*', table)
+        finally:
+            cursor.close()
+
+    def creer_schema(self):
+        print("Vérification/Création du schéma de base de données...")
+        cursor = self.curseur()
+        for requete in self.requetes_schema():
+            cursor.execute(requete)
+        self.commit()
+
+        # Bases créées avec une version antérieure du schéma
+        for ancien, nouveau in COLONNES_RENOMMEES.items():
+            if self._colonne_existe(cursor, ancien) and not self._colonne_existe(cursor, nouveau):
+                print(f"Colonne Vehicule.{ancien} renommée en {nouveau}.")
+                cursor.execute(f"ALTER TABLE Vehicule RENAME COLUMN {ancien} TO {nouveau}")
+                self.commit()
+        for colonne, definition in self.colonnes_ajoutees().items():
+            if not self._colonne_existe(cursor, colonne):
+                cursor.execute(f"ALTER TABLE Vehicule ADD COLUMN {definition}")
+                self.commit()
+        self.retyper_colonnes(cursor)
+        cursor.close()
+        print("Schéma prêt.")
+
+    # --- Chargement ---
+
+    def _resoudre(self, cursor, table, colonnes, valeurs):
+        """
+        Identifiants des `valeurs` (tuples sur `colonnes`) de `table`, en insérant
+        d'un coup celles qui manquent. Retourne le cache valeur -> id de la table.
+        """
+        cache = self._ids.get(table)
+        if cache is None:
+            cursor.execute(f"SELECT {', '.join(colonnes)}, id FROM {table}")
+            cache = self._ids[table] = {tuple(ligne[:-1]): ligne[-1] for ligne in cursor.fetchall()}
+
+        manquantes = [v for v in set(valeurs) if v not in cache]
+        if manquantes:
+            cursor.executemany(self.requete_insertion_ignoree(table, colonnes), manquantes)
+            conditions = ' AND '.join(f"{c} = {self.marqueur}" for c in colonnes)
+            for valeur in manquantes:
+                cursor.execute(f"SELECT id FROM {table} WHERE {conditions}", valeur)
+                cache[valeur] = cursor.fetchone()[0]
+        return cache
+
+    def _ecrire_lot(self, cursor, lot, num_chargement):
+        """Écrit un lot dans la transaction courante et retourne le nombre de véhicules insérés."""
+        urls = {v['url'] for v in lot}
+        existantes = self.verrouiller_urls(cursor, sorted(urls))
+        marques = self._resoudre(cursor, 'Marque', ['nom_marque'], [(v['marque'],) for v in lot if v['marque']])
+        # Modèle inconnu : nom vide, pour que la marque reste rattachée au véhicule
+        paires = [(v['modele'] or '', marques[(v['marque'],)]) for v in lot if v['marque']]
+        modeles = self._resoudre(cursor, 'Modele', ['nom_modele', 'id_marque'], paires)
+        dimensions = {
+            cle: self._resoudre(cursor, table, [colonne], [(v[cle],) for v in lot if v[cle]])
+            for cle, (table, colonne, _) in DIMENSIONS.items()
+        }
+
+        lignes = []
+        for v in lot:
+            id_modele = modeles[(v['modele'] or '', marques[(v['marque'],)])] if v['marque'] else None
+            lignes.append(
+                tuple(v[c] for c in COLONNES_VALEURS) + (id_modele,)
+                + tuple(dimensions[cle][(v[cle],)] if v[cle] else None for cle in DIMENSIONS)
+                + (num_chargement,)
+            )
+        cursor.executemany(self.requete_upsert_vehicule(), lignes)
+        # Une URL répétée dans le lot n'est insérée qu'une fois
+        return len(urls - existantes)
+
+    def filigrane(self):
+        """
+        [nombre de véhicules, dernier num_chargement] : change à chaque chargement (y compris
+        pendant un crawl, voir EcritureBddPipeline) et quand la base est vidée ou recréée.
+        """
+        cursor = self.curseur()
+        cursor.execute("SELECT COUNT(*), COALESCE(MAX(num_chargement), 0) FROM Vehicule")
+        total, dernier = cursor.fetchone()
+        cursor.close()
+        return [int(total), int(dernier)]
+
+    def compter_vehicules(self):
+        cursor = self.curseur()
+        cursor.execute("SELECT COUNT(*) FROM Vehicule")
+        total = cursor.fetchone()[0]
+        cursor.close()
+        return total
+
+    def upsert_vehicules(self, vehicules, taille_lot=TAILLE_LOT):
+        """
+        Insère ou met à jour les véhicules préparés (voir database.preparer_vehicule),
+        une transaction par lot. Un lot en erreur est annulé et compté en erreur.
+        Retourne (insérés, mis à jour, en erreur), comptés lot par lot dans sa
+        transaction : les écritures concurrentes d'autres connexions n'y entrent pas.
+        """
+        cursor = self.curseur()
+        cursor.execute("SELECT COALESCE(MAX(num_chargement), 0) + 1 FROM Vehicule")
+        num_chargement = cursor.fetchone()[0]
+        inseres = erreurs = 0
+        for debut in range(0, len(vehicules), taille_lot):
+            lot = vehicules[debut:debut + taille_lot]
+            try:
+                nouveaux = self._ecrire_lot(cursor, lot, num_chargement)
+                self.commit()
+                inseres += nouveaux
+            except Exception as e:
+                print(f"\n❌ Lot {debut // taille_lot + 1} annulé ({len(lot)} véhicules): {e}")
+                self.conn.rollback()
+                # Les ids créés pendant le lot annulé n'existent plus
+                self._ids.clear()
+                erreurs += len(lot)
+        cursor.close()
+        return inseres, len(vehicules) - erreurs - inseres, erreurs
+
+    # --- Lecture ---
+
+    def lire_entrainement(self):
+        """Données d'entraînement du modèle, en une seule requête."""
+        import pandas as pd
+        import warnings
+
+        with warnings.catch_warnings():
+            # pandas préfère SQLAlchemy mais accepte une connexion DB-API
+            warnings.simplefilter('ignore', UserWarning)
+            return pd.read_sql_query(REQUETE_ENTRAINEMENT, self.conn)
+
+
+def _ddl_vehicule(type_id, type_url):
+    """Colonnes et clés étrangères de la table Vehicule, pour les types d'un dialecte."""
+    colonnes = [
+        f"url {type_url} NOT NULL UNIQUE",
+        "nom_complet VARCHAR(255)",
+        "prix_ttc_eur INT",
+        # Âge fractionnaire, comme dans dataset.csv
+        "age_ans FLOAT",
+        "kilometrage INT",
+        "places INT",
+        "portes INT",
+        "puissance_fiscale INT",
+        "puissance_reelle INT",
+        "premiere_main BOOLEAN",
+        f"id_modele {type_id}",
+    ]
+    colonnes += [f"{fk} {type_id}" for _, _, fk in DIMENSIONS.values()]
+    colonnes.append("num_chargement INT")
+    colonnes.append("FOREIGN KEY (id_modele) REFERENCES Modele(id)")
+    colonnes += [f"FOREIGN KEY ({fk}) REFERENCES {table}(id)" for table, _, fk in DIMENSIONS.values()]
+    return ",\n                ".join(colonnes)
+
+
+class StockageMySQL(Stockage):
+    marqueur = '%s'
+
+    @classmethod
+    def connecter(cls, config):
+        """Crée la base si besoin puis s'y connecte."""
+        import mysql.connector
+
+        conn_init = mysql.connector.connect(host=config['host'], user=config['user'], password=config['password'])
+        cursor_init = conn_init.cursor()
+        cursor_init.execute(f"CREATE DATABASE IF NOT EXISTS {config['database']} CHARACTER SET utf8mb4 COLLATE utf8mb4_unicode_ci")
+        cursor_init.close()
+        conn_init.close()
+
+        conn = mysql.connector.connect(**config)
+        print(f"Connexion à la base de données '{config['database']}' réussie.")
+        return cls(conn)
+
+    def fermer(self):
+        if self.conn.is_connected():
+            self.conn.close()
+            print("Connexion MySQL fermée.")
+
+    def requetes_schema(self):
+        requetes = [
+            "CREATE TABLE IF NOT EXISTS Marque (id INT AUTO_INCREMENT PRIMARY KEY, nom_marque VARCHAR(255) NOT NULL UNIQUE) ENGINE=InnoDB;",
+            """
+            CREATE TABLE IF NOT EXISTS Modele (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                nom_modele VARCHAR(255) NOT NULL,
+                id_marque INT NOT NULL,
+                FOREIGN KEY (id_marque) REFERENCES Marque(id),
+                UNIQUE KEY uk_marque_modele (id_marque, nom_modele)
+            ) ENGINE=InnoDB;
+            """,
+        ]
+        requetes += [
+            f"CREATE TABLE IF NOT EXISTS {table} (id INT AUTO_INCREMENT PRIMARY KEY, {colonne} VARCHAR(50) NOT NULL UNIQUE) ENGINE=InnoDB;"
+            for table, colonne, _ in DIMENSIONS.values()
+        ]
+        requetes.append(f"""
+            CREATE TABLE IF NOT EXISTS Vehicule (
+                id INT AUTO_INCREMENT PRIMARY KEY,
+                {_ddl_vehicule('INT', 'VARCHAR(512)')}
+            ) ENGINE=InnoDB;
+        """)
+        return requetes
+
+    def colonnes_ajoutees(self):
+        return {
+            'id_type': "id_type INT, ADD FOREIGN KEY (id_type) REFERENCES TypeVehicule(id)",
+            'num_chargement': "num_chargement INT",
+        }
+
+    def retyper_colonnes(self, cursor):
+        # age_ans était entier dans les premières versions du schéma
+        cursor.execute("""
+            SELECT DATA_TYPE FROM information_schema.COLUMNS
+            WHERE TABLE_SCHEMA = DATABASE() AND TABLE_NAME = 'Vehicule' AND COLUMN_NAME = 'age_ans'
+        """)
+        ligne = cursor.fetchone()
+        if ligne and ligne[0].lower() != 'float':
+            cursor.execute("ALTER TABLE Vehicule MODIFY COLUMN age_ans FLOAT")
+            self.commit()
+
+    def verrouiller_urls(self, cursor, urls):
+        # FOR UPDATE verrouille les lignes trouvées et, sur l'index unique, les clés absentes
+        cursor.execute(f"SELECT url FROM Vehicule WHERE url IN ({', '.join(['%s'] * len(urls))}) FOR UPDATE", urls)
+        return {ligne[0] for ligne in cursor.fetchall()}
+
+    def creer_index(self, nom, table, colonnes):
+        # MySQL n'a pas de CREATE INDEX IF NOT EXISTS
+        cursor = self.conn.cursor()
+        cursor.execute(f"SHOW INDEX FROM {table} WHERE Key_name = %s", (nom,))
+        if not cursor.fetchall():
+            cursor.execute(f"CREATE INDEX {nom} ON {table} ({', '.join(colonnes)})")
+        cursor.close()
+
+    def requete_insertion_ignoree(self, table, colonnes):
+        return f"INSERT IGNORE INTO {table} ({', '.join(colonnes)}) VALUES ({', '.join(['%s'] * len(colonnes))})"
+
+    def requete_upsert_vehicule(self):
+        return (
+            f"INSERT INTO Vehicule ({', '.join(COLONNES_VEHICULE)}) VALUES ({', '.join(['%s'] * len(COLONNES_VEHICULE))}) "
+            "ON DUPLICATE KEY UPDATE " + ', '.join(f"{c} = VALUES({c})" for c in COLONNES_MISES_A_JOUR)
+        )
+
+
+class StockageSQLite(Stockage):
+    marqueur = '?'
+
+    @classmethod
+    def connecter(cls, chemin):
+        import sqlite3
+
+        conn = sqlite3.connect(chemin)
+        # WAL : les lectures (entraînement, requêtes) ne bloquent pas le chargement
+        conn.execute("PRAGMA journal_mode = WAL")
+        conn.execute("PRAGMA synchronous = NORMAL")
+        conn.execute("PRAGMA foreign_keys = ON")
+        print(f"Base SQLite '{chemin}' ouverte.")
+        return cls(conn)
+
+    def requetes_schema(self):
+        requetes = [
+            "CREATE TABLE IF NOT EXISTS Marque (id INTEGER PRIMARY KEY AUTOINCREMENT, nom_marque TEXT NOT NULL UNIQUE)",
+            """
+            CREATE TABLE IF NOT EXISTS Modele (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                nom_modele TEXT NOT NULL,
+                id_marque INTEGER NOT NULL REFERENCES Marque(id),
+                UNIQUE (id_marque, nom_modele)
+            )
+            """,
+        ]
+        requetes += [
+            f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY AUTOINCREMENT, {colonne} TEXT NOT NULL UNIQUE)"
+            for table, colonne, _ in DIMENSIONS.values()
+        ]
+        requetes.append(f"""
+            CREATE TABLE IF NOT EXISTS Vehicule (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                {_ddl_vehicule('INTEGER', 'TEXT')}
+            )
+        """)
+        return requetes
+
+    def colonnes_ajoutees(self):
+        return {
+            'id_type': "id_type INTEGER REFERENCES TypeVehicule(id)",
+            'num_chargement': "num_chargement INTEGER",
+        }
+
+    def creer_index(self, nom, table, colonnes):
+        self.conn.execute(f"CREATE INDEX IF NOT EXISTS {nom} ON {table} ({', '.join(colonnes)})")
+
+    def verrouiller_urls(self, cursor, urls):
+        # Un seul écrivain à la fois : le verrou d'écriture est pris avant la lecture
+        if not self.conn.in_transaction:
+            cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute(f"SELECT url FROM Vehicule WHERE url IN ({', '.join(['?'] * len(urls))})", urls)
+        return {ligne[0] for ligne in cursor.fetchall()}
+
+    def requete_insertion_ignoree(self, table, colonnes):
+        return f"INSERT OR IGNORE INTO {table} ({', '.join(colonnes)}) VALUES ({', '.join(['?'] * len(colonnes))})"
+
+    def requete_upsert_vehicule(self):
+        return (
+            f"INSERT INTO Vehicule ({', '.join(COLONNES_VEHICULE)}) VALUES ({', '.join(['?'] * len(COLONNES_VEHICULE))}) "
+            "ON CONFLICT(url) DO UPDATE SET " + ', '.join(f"{c} = excluded.{c}" for c in COLONNES_MISES_A_JOUR)
+        )
+
+
+def ouvrir_stockage(url, config_mysql=None):
+    """
+    Ouvre le backend désigné par `url` :
+    'sqlite:///chemin.db' (fichier SQLite) ou 'mysql://base' (serveur MySQL décrit par config_mysql).
+    """
+    if url.startswith('sqlite:///'):
+        return StockageSQLite.connecter(url[len('sqlite:///'):])
+    if url.startswith('mysql://'):
+        config = dict(config_mysql or {})
+        config['database'] = url[len('mysql://'):] or config.get('database')
+        return StockageMySQL.connecter(config)
+    raise ValueError(f"Stockage inconnu: '{url}' (attendu: sqlite:///chemin.db ou mysql://base)")
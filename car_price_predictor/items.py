@@ -3,10 +3,129 @@
 # See documentation in:
 # https://docs.scrapy.org/en/latest/topics/items.html
 
-import scrapy
+import re
+from dataclasses import dataclass
+from datetime import datetime
 
+# Libellé normalisé d'Autosphere (sans le titre de section, voir sites.normaliser_libelle) -> champ de FicheVehicule
+CHAMPS_PAR_LIBELLE = {
+    'energie': 'energie',
+    'boite_de_vitesses': 'boite_de_vitesses',
+    'couleur': 'couleur',
+    'categorie': 'type_vehicule',
+    'provenance': 'provenance',
+    'premiere_main': 'premiere_main',
+    'kilometrage': 'kilometrage',
+    'date_de_mise_en_circulation': 'date_mise_en_circulation',
+    'puissance_fiscale': 'puissance_fiscale',
+    'puissance_reelle': 'puissance_reelle',
+    'portes': 'portes',
+    'places': 'places',
+    'longueur': 'longueur',
+    'largeur': 'largeur',
+    'hauteur': 'hauteur',
+    'poids': 'poids',
+    'volume_du_coffre': 'volume_coffre',
+    'air_quality_icon': 'air_quality_icon',
+    'ville': 'ville',
+}
 
-class CarPricePredictorItem(scrapy.Item):
-    # define the fields for your item here like:
-    # name = scrapy.Field()
-    pass
+# Identifiant d'annonce en fin d'URL : …-nanteuil-les-meaux-037139, …-dizy-cr307106
+ID_ANNONCE_REGEX = re.compile(r'-([a-z0-9]+)/?(?:[?#].*)?$')
+
+# Un même libellé peut apparaître dans plusieurs sections (bonnes_affaires_, acheter_...) :
+# la valeur de cette section l'emporte, les autres ne comblent que les champs vides
+SECTION_PRIORITAIRE = 'menu'
+
+# Portes et places d'une annonce qui ne les indique pas
+PORTES_PLACES_DEFAUT = 5
+
+
+@dataclass(slots=True)
+class FicheVehicule:
+    """
+    Fiche d'un véhicule scrapé. Les valeurs sont les textes affichés par le site
+    (sauf le prix, déjà converti en entier) ; le nettoyage numérique est fait
+    par le convertisseur et le chargement BDD.
+    """
+    url: str = None
+    nom_complet_vehicule: str = None
+    prix_ttc_eur: int = None
+    energie: str = None
+    boite_de_vitesses: str = None
+    couleur: str = None
+    type_vehicule: str = None
+    provenance: str = None
+    premiere_main: str = None
+    kilometrage: str = None
+    date_mise_en_circulation: str = None
+    puissance_fiscale: str = None
+    puissance_reelle: str = None
+    portes: str = None
+    places: str = None
+    longueur: str = None
+    largeur: str = None
+    hauteur: str = None
+    poids: str = None
+    volume_coffre: str = None
+    air_quality_icon: str = None
+    ville: str = None
+
+    def renseigner(self, section, libelle, valeur, champs=CHAMPS_PAR_LIBELLE, section_prioritaire=SECTION_PRIORITAIRE):
+        """
+        Range la valeur du libellé normalisé `libelle` de `section` ; les libellés inconnus sont ignorés.
+        `champs` et `section_prioritaire` sont ceux de l'adaptateur du site (sites.py).
+        """
+        champ = champs.get(libelle)
+        if champ is not None and valeur and (section == section_prioritaire or getattr(self, champ) is None):
+            setattr(self, champ, valeur)
+
+    def marque_modele(self):
+        """(marque, modèle) : les deux premiers mots du nom complet, '' quand ils manquent."""
+        parts = (self.nom_complet_vehicule or '').split(' ')
+        return parts[0], parts[1] if len(parts) > 1 else ''
+
+    def age_ans(self, maintenant=None):
+        """Âge en années (fractionnaire) à `maintenant` (défaut : l'instant présent), None si la date JJ/MM/AAAA manque ou est invalide."""
+        if not self.date_mise_en_circulation:
+            return None
+        try:
+            date_immat = datetime.strptime(self.date_mise_en_circulation, '%d/%m/%Y')
+        except ValueError:
+            return None
+        return ((maintenant or datetime.now()) - date_immat).days / 365.25
+
+    def en_dict(self):
+        """Champs renseignés, tels qu'écrits dans autosphere_data.json."""
+        return {champ: getattr(self, champ) for champ in self.__slots__ if getattr(self, champ) is not None}
+
+    @classmethod
+    def depuis_dict(cls, donnees):
+        """
+        Relit une fiche de autosphere_data.json / scrapped/. Accepte aussi l'ancien
+        format du spider, à clés '<section>_<libellé>' (menu_kilometrage...).
+        """
+        if CHAMPS_FICHE.issuperset(donnees):
+            return cls(**donnees)
+        fiche = cls()
+        for cle, valeur in donnees.items():
+            if cle in CHAMPS_FICHE:
+                setattr(fiche, cle, valeur)
+                continue
+            if cle.startswith('bonnes_affaires_'):
+                section, libelle = 'bonnes_affaires', cle[len('bonnes_affaires_'):]
+            else:
+                section, _, libelle = cle.partition('_')
+            fiche.renseigner(section, libelle, valeur)
+        return fiche
+
+
+CHAMPS_FICHE = frozenset(FicheVehicule.__slots__)
+
+
+def identifiant_annonce(url):
+    """Identifiant de l'annonce (suffixe de l'URL), commun aux variantes /fiche et /fiche-mixte ; None si absent."""
+    if not url:
+        return None
+    match = ID_ANNONCE_REGEX.search(url)
+    return match.group(1) if match else None
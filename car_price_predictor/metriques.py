@@ -0,0 +1,197 @@
+"""
+Instrumentation légère partagée par le spider, l'ETL, la BDD et le modèle.
+
+Trois types de métriques, identifiées par un nom et des étiquettes :
+  - compteurs (incrementer),
+  - jauges (definir),
+  - histogrammes (observer, ou chronometre pour mesurer une durée en secondes).
+Le registre s'exporte au format texte Prometheus ou en instantané JSON.
+
+Désactivée par défaut : chaque appel se réduit alors à un test de booléen.
+On l'active avec activer() ou la variable d'environnement CAR_PRICE_METRIQUES=1.
+"""
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+PREFIXE = 'car_price_'
+
+# Bornes (s) des histogrammes de durée : de la milliseconde à la minute
+BORNES_SECONDES = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60)
+
+_actif = os.environ.get('CAR_PRICE_METRIQUES', '') not in ('', '0')
+_verrou = threading.Lock()
+_compteurs = {}
+_jauges = {}
+_histogrammes = {}
+
+
+class _Histogramme:
+    __slots__ = ('bornes', 'effectifs', 'somme', 'nombre', 'min', 'max')
+
+    def __init__(self, bornes):
+        self.bornes = bornes
+        self.effectifs = [0] * len(bornes)
+        self.somme = 0.0
+        self.nombre = 0
+        self.min = float('inf')
+        self.max = float('-inf')
+
+    def observer(self, valeur):
+        for i, borne in enumerate(self.bornes):
+            if valeur <= borne:
+                self.effectifs[i] += 1
+                break
+        self.somme += valeur
+        self.nombre += 1
+        self.min = min(self.min, valeur)
+        self.max = max(self.max, valeur)
+
+
+def activer():
+    global _actif
+    _actif = True
+
+
+def desactiver():
+    global _actif
+    _actif = False
+
+
+def est_actif():
+    return _actif
+
+
+def reinitialiser():
+    with _verrou:
+        _compteurs.clear()
+        _jauges.clear()
+        _histogrammes.clear()
+
+
+def _cle(nom, etiquettes):
+    return nom, tuple(sorted(etiquettes.items()))
+
+
+def incrementer(nom, valeur=1, **etiquettes):
+    if not _actif:
+        return
+    cle = _cle(nom, etiquettes)
+    with _verrou:
+        _compteurs[cle] = _compteurs.get(cle, 0) + valeur
+
+
+def definir(nom, valeur, **etiquettes):
+    if not _actif:
+        return
+    with _verrou:
+        _jauges[_cle(nom, etiquettes)] = valeur
+
+
+def observer(nom, valeur, bornes=BORNES_SECONDES, **etiquettes):
+    if not _actif:
+        return
+    cle = _cle(nom, etiquettes)
+    with _verrou:
+        histogramme = _histogrammes.get(cle)
+        if histogramme is None:
+            histogramme = _histogrammes[cle] = _Histogramme(bornes)
+        histogramme.observer(valeur)
+
+
+@contextmanager
+def _chronometre_actif(nom, etiquettes):
+    debut = time.perf_counter()
+    try:
+        yield
+    finally:
+        observer(nom, time.perf_counter() - debut, **etiquettes)
+
+
+class _ChronometreInactif:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_INACTIF = _ChronometreInactif()
+
+
+def chronometre(nom, **etiquettes):
+    """Context manager qui ajoute la durée du bloc (s) à l'histogramme `nom`."""
+    if not _actif:
+        return _INACTIF
+    return _chronometre_actif(nom, etiquettes)
+
+
+# --- EXPORT ---
+
+def _format_etiquettes(etiquettes, extra=()):
+    paires = list(etiquettes) + list(extra)
+    if not paires:
+        return ''
+    echappe = lambda v: str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+    return '{' + ','.join(f'{k}="{echappe(v)}"' for k, v in paires) + '}'
+
+
+def exporter_prometheus():
+    """Registre au format d'exposition texte de Prometheus."""
+    lignes = []
+    with _verrou:
+        for type_metrique, registre in (('counter', _compteurs), ('gauge', _jauges)):
+            deja_declares = set()
+            for (nom, etiquettes), valeur in sorted(registre.items()):
+                nom_complet = PREFIXE + nom
+                if nom_complet not in deja_declares:
+                    lignes.append(f'# TYPE {nom_complet} {type_metrique}')
+                    deja_declares.add(nom_complet)
+                lignes.append(f'{nom_complet}{_format_etiquettes(etiquettes)} {valeur}')
+
+        deja_declares = set()
+        for (nom, etiquettes), h in sorted(_histogrammes.items()):
+            nom_complet = PREFIXE + nom
+            if nom_complet not in deja_declares:
+                lignes.append(f'# TYPE {nom_complet} histogram')
+                deja_declares.add(nom_complet)
+            cumul = 0
+            for borne, effectif in zip(h.bornes, h.effectifs):
+                cumul += effectif
+                lignes.append(f'{nom_complet}_bucket{_format_etiquettes(etiquettes, [("le", borne)])} {cumul}')
+            lignes.append(f'{nom_complet}_bucket{_format_etiquettes(etiquettes, [("le", "+Inf")])} {h.nombre}')
+            lignes.append(f'{nom_complet}_sum{_format_etiquettes(etiquettes)} {h.somme}')
+            lignes.append(f'{nom_complet}_count{_format_etiquettes(etiquettes)} {h.nombre}')
+    return '\n'.join(lignes) + '\n'
+
+
+def exporter_json():
+    """Instantané du registre sous forme de dictionnaire sérialisable en JSON."""
+    def entree(nom, etiquettes, **valeurs):
+        return {'nom': nom, 'etiquettes': dict(etiquettes), **valeurs}
+
+    with _verrou:
+        return {
+            'compteurs': [entree(n, e, valeur=v) for (n, e), v in sorted(_compteurs.items())],
+            'jauges': [entree(n, e, valeur=v) for (n, e), v in sorted(_jauges.items())],
+            'histogrammes': [
+                entree(n, e, nombre=h.nombre, somme=h.somme, moyenne=h.somme / h.nombre,
+                       min=h.min, max=h.max, bornes=dict(zip(map(str, h.bornes), h.effectifs)))
+                for (n, e), h in sorted(_histogrammes.items())
+            ],
+        }
+
+
+def ecrire(chemin):
+    """Écrit le registre dans `chemin` : JSON si l'extension est .json, texte Prometheus sinon."""
+    if chemin.endswith('.json'):
+        contenu = json.dumps(exporter_json(), indent=2, ensure_ascii=False)
+    else:
+        contenu = exporter_prometheus()
+    with open(chemin, 'w', encoding='utf-8') as f:
+        f.write(contenu)
+    print(f"📈 Métriques écrites dans {chemin}")
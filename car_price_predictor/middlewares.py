@@ -4,6 +4,8 @@
 # https://docs.scrapy.org/en/latest/topics/spider-middleware.html
 
 from scrapy import signals
+from scrapy.exceptions import IgnoreRequest
+from scrapy.http import HtmlResponse
 
 # useful for handling different item types with a single interface
 from itemadapter import is_item, ItemAdapter
@@ -101,3 +103,20 @@ class CarPricePredictorDownloaderMiddleware:
 
     def spider_opened(self, spider):
         spider.logger.info("Spider opened: %s" % spider.name)
+
+
+class ArchiveRejeuMiddleware:
+    """
+    En mode rejeu (spider.archive_rejeu), sert le HTML archivé au lieu de
+    télécharger la page : ni réseau ni Playwright. Une URL absente de
+    l'archive est ignorée.
+    """
+
+    def process_request(self, request, spider):
+        archive = getattr(spider, 'archive_rejeu', None)
+        if archive is None:
+            return None
+        contenu = archive.lire(request.url)
+        if contenu is None:
+            raise IgnoreRequest(f"{request.url} absente de l'archive")
+        return HtmlResponse(url=request.url, body=contenu, encoding='utf-8', request=request)
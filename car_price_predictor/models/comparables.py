@@ -0,0 +1,296 @@
+"""
+Annonces comparables : les k annonces réelles les plus proches d'une configuration.
+
+L'index est construit à partir des mêmes colonnes que le modèle (model.py) :
+  - les numériques, imputées par la médiane puis centrées-réduites,
+  - les catégorielles, encodées en one-hot pondéré (deux modalités différentes
+    coûtent POIDS_CATEGORIEL en distance euclidienne),
+avec un blocage par marque/modèle : on ne cherche des voisins que parmi les
+annonces du même modèle, donc marque et modele ne sont pas des dimensions.
+
+Sur disque (ARTIFACTS_DIR/comparables/), tout est lisible en mémoire projetée :
+  - features.npy  : matrice float32 des annonces, triées par bloc,
+  - prix.npy      : prix des annonces, dans le même ordre,
+  - urls.bin      : URLs concaténées (UTF-8), urls_fin.npy : position de fin de chacune,
+  - arbres/N.joblib : KDTree sklearn des blocs d'au moins TAILLE_MIN_ARBRE annonces,
+  - meta.json     : colonnes, statistiques de mise à l'échelle, modalités et blocs.
+Les petits blocs sont parcourus en force brute vectorisée, plus rapide qu'un arbre.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor.models.comparables --construire -k 10
+"""
+import argparse
+import json
+import os
+import shutil
+import time
+from datetime import datetime
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.neighbors import KDTree
+
+from .model import ARTIFACTS_DIR, CAR_CONFIG, DATASET_CSV, cat_cols, charger_dataset, num_cols
+
+INDEX_DIR = os.path.join(ARTIFACTS_DIR, 'comparables')
+
+K_COMPARABLES = 10
+
+# Distance entre deux modalités différentes d'une même colonne catégorielle,
+# à comparer à un écart-type sur une colonne numérique
+POIDS_CATEGORIEL = 1.0
+
+# En dessous, la force brute sur le bloc est plus rapide que la descente d'un arbre
+TAILLE_MIN_ARBRE = 1000
+TAILLE_FEUILLE = 40
+
+# Marque et modèle définissent le bloc, pas la distance
+colonnes_categorielles = [col for col in cat_cols if col not in ('marque', 'modele')]
+
+
+def cle_bloc(marque, modele):
+    return f"{str(marque).lower().strip()}|{str(modele).lower().strip()}"
+
+
+class IndexComparables:
+    def __init__(self, dossier, meta):
+        self.dossier = dossier
+        self.meta = meta
+        self.blocs = meta['blocs']
+        self.moyennes = np.array(meta['moyennes'], dtype=np.float32)
+        self.ecarts = np.array(meta['ecarts'], dtype=np.float32)
+        # Position de chaque modalité dans la partie one-hot du vecteur
+        self.positions = {}
+        position = len(num_cols)
+        for col in colonnes_categorielles:
+            self.positions[col] = {modalite: position + i for i, modalite in enumerate(meta['categories'][col])}
+            position += len(meta['categories'][col])
+        self.dimension = position
+
+        self.features = np.load(os.path.join(dossier, 'features.npy'), mmap_mode='r')
+        self.prix = np.load(os.path.join(dossier, 'prix.npy'), mmap_mode='r')
+        self.urls = np.memmap(os.path.join(dossier, 'urls.bin'), dtype=np.uint8, mode='r')
+        self.urls_fin = np.load(os.path.join(dossier, 'urls_fin.npy'), mmap_mode='r')
+        self._arbres = {}
+
+    @classmethod
+    def charger(cls, dossier=INDEX_DIR):
+        """Ouvre l'index persisté (en mémoire projetée), ou None s'il n'a pas été construit."""
+        chemin_meta = os.path.join(dossier, 'meta.json')
+        if not os.path.exists(chemin_meta):
+            return None
+        with open(chemin_meta, 'r', encoding='utf-8') as f:
+            return cls(dossier, json.load(f))
+
+    def _arbre(self, numero):
+        arbre = self._arbres.get(numero)
+        if arbre is None:
+            # Les tableaux de l'arbre restent projetés depuis le fichier
+            arbre = self._arbres[numero] = joblib.load(os.path.join(self.dossier, 'arbres', f'{numero}.joblib'),
+                                                       mmap_mode='r')
+        return arbre
+
+    def vecteur(self, config):
+        """Encode une configuration (dict au format de car_config.json) comme les annonces de l'index."""
+        x = np.zeros(self.dimension, dtype=np.float32)
+        for j, col in enumerate(num_cols):
+            valeur = config.get(col)
+            x[j] = self.meta['medianes'][col] if valeur is None or pd.isna(valeur) else float(valeur)
+        x[:len(num_cols)] = (x[:len(num_cols)] - self.moyennes) / self.ecarts
+        poids = POIDS_CATEGORIEL / np.sqrt(2)
+        for col in colonnes_categorielles:
+            position = self.positions[col].get(str(config.get(col, 'manquant')).lower().strip())
+            # Modalité inconnue : aucune colonne à 1, à égale distance de toutes les modalités connues
+            if position is not None:
+                x[position] = poids
+        return x
+
+    def url(self, i):
+        debut = self.urls_fin[i - 1] if i > 0 else 0
+        return bytes(self.urls[debut:self.urls_fin[i]]).decode('utf-8')
+
+    def rechercher(self, config, k=K_COMPARABLES):
+        """
+        Les k annonces du même marque/modèle les plus proches de `config`.
+        Retourne un DataFrame (url, prix_ttc_eur, age_ans, kilometrage, distance),
+        vide si le modèle est absent de l'index.
+        """
+        colonnes = ['url', 'prix_ttc_eur', 'age_ans', 'kilometrage', 'distance']
+        bloc = self.blocs.get(cle_bloc(config.get('marque', ''), config.get('modele', '')))
+        if bloc is None:
+            return pd.DataFrame(columns=colonnes)
+        debut, fin, numero_arbre = bloc
+        x = self.vecteur(config)
+        k = min(k, fin - debut)
+
+        if numero_arbre is not None:
+            distances, indices = self._arbre(numero_arbre).query(x[None, :], k=k)
+            distances, indices = distances[0], indices[0]
+        else:
+            carres = ((self.features[debut:fin] - x) ** 2).sum(axis=1)
+            indices = np.argpartition(carres, k - 1)[:k] if k < len(carres) else np.arange(len(carres))
+            indices = indices[np.argsort(carres[indices])]
+            distances = np.sqrt(carres[indices])
+        lignes = debut + indices
+
+        # Âge et kilométrage remis à l'échelle d'origine pour l'affichage
+        age, km = num_cols.index('age_ans'), num_cols.index('kilometrage')
+        numeriques = self.features[lignes][:, [age, km]] * self.ecarts[[age, km]] + self.moyennes[[age, km]]
+        return pd.DataFrame({
+            'url': [self.url(i) for i in lignes],
+            'prix_ttc_eur': self.prix[lignes],
+            'age_ans': numeriques[:, 0],
+            'kilometrage': numeriques[:, 1].round(),
+            'distance': distances,
+        })
+
+
+def _libelles(serie):
+    """Valeurs d'une colonne catégorielle en texte, NaN remplacés par 'manquant' (dtype object ou category)."""
+    return serie.astype(object).fillna('manquant').astype(str)
+
+
+def _encoder(df, medianes, moyennes, ecarts, categories):
+    """Matrice float32 (une ligne par annonce) : numériques centrées-réduites puis one-hot pondéré."""
+    colonnes = [((df[num_cols].fillna(medianes) - moyennes) / ecarts).to_numpy(np.float32)]
+    poids = POIDS_CATEGORIEL / np.sqrt(2)
+    for col in colonnes_categorielles:
+        codes = pd.Categorical(_libelles(df[col]), categories=categories[col]).codes
+        one_hot = np.zeros((len(df), len(categories[col])), dtype=np.float32)
+        one_hot[np.arange(len(df)), codes] = poids
+        colonnes.append(one_hot)
+    return np.hstack(colonnes)
+
+
+def construire_index(df, dossier=INDEX_DIR):
+    """
+    Construit et persiste l'index des annonces de `df` (colonnes de dataset.csv, avec 'url'),
+    sans les annonces sans prix ; les prix sont arrondis à l'euro.
+    L'index est écrit à côté puis substitué à l'ancien. Retourne l'index chargé, ou None sans 'url' :
+    l'ancien index, construit sur d'autres annonces que le modèle, est alors supprimé.
+    """
+    if 'url' not in df.columns:
+        print("⚠️ Index des comparables NON construit : le dataset n'a pas de colonne 'url' "
+              "(dataset.csv produit avant son ajout à JsonToCsv.py).\n"
+              "   Pour l'obtenir : relancer la conversion (python -m car_price_predictor convert) "
+              "ou entraîner depuis le stockage (--source sqlite:///annonces.db).")
+        if os.path.isdir(dossier):
+            shutil.rmtree(dossier)
+            print(f"   L'ancien index ({dossier}) ne correspond plus au modèle : supprimé.")
+        return None
+    debut = time.perf_counter()
+
+    # Une annonce sans prix n'apprend rien à l'utilisateur (et ne tient pas dans prix.npy)
+    df = df.dropna(subset=['url', 'prix_ttc_eur'])
+    df = df.assign(_bloc=df['marque'].astype(str).str.lower().str.strip() + '|' +
+                   df['modele'].astype(str).str.lower().str.strip())
+    df = df.sort_values('_bloc', kind='stable')
+
+    medianes = df[num_cols].median()
+    moyennes = df[num_cols].fillna(medianes).mean()
+    # Une colonne constante ne doit pas provoquer de division par zéro
+    ecarts = df[num_cols].fillna(medianes).std().replace(0, 1).fillna(1)
+    categories = {col: sorted(_libelles(df[col]).unique()) for col in colonnes_categorielles}
+    features = _encoder(df, medianes, moyennes, ecarts, categories)
+
+    temporaire = dossier + '.tmp'
+    shutil.rmtree(temporaire, ignore_errors=True)
+    os.makedirs(os.path.join(temporaire, 'arbres'))
+
+    blocs = {}
+    nb_arbres = 0
+    bornes = np.flatnonzero(np.r_[True, df['_bloc'].to_numpy()[1:] != df['_bloc'].to_numpy()[:-1], True])
+    for debut_bloc, fin_bloc in zip(bornes[:-1], bornes[1:]):
+        numero_arbre = None
+        if fin_bloc - debut_bloc >= TAILLE_MIN_ARBRE:
+            numero_arbre = nb_arbres
+            joblib.dump(KDTree(features[debut_bloc:fin_bloc], leaf_size=TAILLE_FEUILLE),
+                        os.path.join(temporaire, 'arbres', f'{numero_arbre}.joblib'))
+            nb_arbres += 1
+        blocs[df['_bloc'].iat[debut_bloc]] = [int(debut_bloc), int(fin_bloc), numero_arbre]
+
+    np.save(os.path.join(temporaire, 'features.npy'), features)
+    np.save(os.path.join(temporaire, 'prix.npy'), df['prix_ttc_eur'].round().astype(np.int32).to_numpy())
+    urls = df['url'].astype(str).str.encode('utf-8')
+    np.save(os.path.join(temporaire, 'urls_fin.npy'), np.cumsum(urls.str.len().to_numpy(np.int64)))
+    with open(os.path.join(temporaire, 'urls.bin'), 'wb') as f:
+        f.write(b''.join(urls))
+
+    with open(os.path.join(temporaire, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'nb_annonces': len(df),
+            'num_cols': num_cols,
+            'medianes': medianes.to_dict(),
+            'moyennes': moyennes.tolist(),
+            'ecarts': ecarts.tolist(),
+            'categories': categories,
+            'poids_categoriel': POIDS_CATEGORIEL,
+            'blocs': blocs,
+        }, f, ensure_ascii=False)
+
+    shutil.rmtree(dossier, ignore_errors=True)
+    os.replace(temporaire, dossier)
+    print(f"🔎 Index des comparables : {len(df)} annonces, {len(blocs)} modèles ({nb_arbres} arbres) "
+          f"en {time.perf_counter() - debut:.1f}s dans {dossier}")
+    return IndexComparables.charger(dossier)
+
+
+def afficher_comparables(index, config, k=K_COMPARABLES):
+    """Affiche les k annonces comparables à `config` et les retourne."""
+    resultats = index.rechercher(config, k)
+    if resultats.empty:
+        print(f"Aucune annonce comparable pour {config.get('marque')} {config.get('modele')}.")
+        return resultats
+    print(f"--- {len(resultats)} annonce(s) comparable(s) ---")
+    for r in resultats.itertuples():
+        print(f"{r.prix_ttc_eur:>8,}€  {r.age_ans:>4.1f} ans  {int(r.kilometrage):>8,} km  {r.url}")
+    return resultats
+
+
+def mesurer_latence(index, df, nb_requetes=1000, k=K_COMPARABLES, seed=42):
+    """Latences (ms) de nb_requetes recherches sur des annonces tirées de `df`."""
+    configs = df.sample(n=nb_requetes, replace=len(df) < nb_requetes, random_state=seed).to_dict('records')
+    latences = []
+    for config in configs:
+        debut = time.perf_counter()
+        index.rechercher(config, k)
+        latences.append((time.perf_counter() - debut) * 1000)
+    return np.array(latences)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Annonces comparables à car_config.json (k plus proches voisins).")
+    parser.add_argument('--source', default=DATASET_CSV,
+                        help="dataset.csv (défaut) ou stockage : sqlite:///chemin.db, mysql://base.")
+    parser.add_argument('--config', default=CAR_CONFIG, help="Configuration du véhicule (défaut: car_config.json).")
+    parser.add_argument('-k', type=int, default=K_COMPARABLES, help="Nombre d'annonces comparables.")
+    parser.add_argument('--construire', action='store_true', help="(Re)construit l'index depuis --source.")
+    parser.add_argument('--benchmark', type=int, metavar='N',
+                        help="Mesure la latence de N recherches sur des annonces de --source.")
+    args = parser.parse_args(argv)
+
+    df = None
+    if args.construire or args.benchmark:
+        df = charger_dataset(args.source)
+        if df is None:
+            return
+    index = construire_index(df) if args.construire else IndexComparables.charger()
+    if index is None:
+        print("❌ Index des comparables introuvable : lancer avec --construire.")
+        return
+
+    if args.benchmark:
+        latences = mesurer_latence(index, df, args.benchmark, args.k)
+        print(f"⏱️ {len(latences)} recherches sur {index.meta['nb_annonces']:,} annonces : "
+              f"p50 {np.percentile(latences, 50):.2f} ms, p95 {np.percentile(latences, 95):.2f} ms, "
+              f"max {latences.max():.2f} ms")
+        return
+
+    with open(args.config, 'r', encoding='utf-8') as f:
+        afficher_comparables(index, json.load(f), args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,256 @@
+"""
+Validation croisée K-fold avec plis pré-traités mis en cache.
+
+Chaque pli est pré-traité une seule fois (imputation et pré-processeur ajustés
+sur la partie entraînement du pli, comme dans model.py) puis sauvegardé en
+tableaux NumPy dans cache/cv/. La clé du cache dépend des données lues (fichier
+CSV ou contenu de la base), du découpage, des types de lecture (TYPES_DATASET)
+et du code d'imputation/pré-traitement, mais pas des hyperparamètres : on peut
+itérer sur les paramètres du modèle sans refaire le pré-traitement.
+
+Les plis sont entraînés en parallèle (un processus par pli) et le rapport donne
+la moyenne/l'écart-type du RMSE et du MAE, globalement et par marque.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor.models.cross_validation --plis 5 --params '{"max_depth": 5}'
+"""
+import argparse
+import hashlib
+import inspect
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from scipy import sparse
+from sklearn.model_selection import KFold
+
+from .model import (
+    DATASET_CSV, MODELS_DIR, MODES, MODE_NATIVE, MODE_ONEHOT, MAX_CAT_TO_ONEHOT, TYPES_DATASET,
+    EncodeurCategoriel, appliquer_imputation, cat_cols, charger_dataset, charger_params_xgb,
+    construire_modele, empreinte_source, imputer, num_cols
+)
+
+CV_CACHE_DIR = os.path.join(MODELS_DIR, 'cache', 'cv')
+
+# Les marques avec moins de lignes hors-pli que ce seuil sont regroupées dans 'autres'
+MIN_LIGNES_SEGMENT = 10
+
+
+def version_pretraitement():
+    """
+    Empreinte de ce qui produit les plis à partir des lignes : types de lecture
+    et code source de l'imputation, du pré-processeur et de la conversion en matrice.
+    """
+    h = hashlib.sha1()
+    h.update(json.dumps({col: str(type_) for col, type_ in TYPES_DATASET.items()}, sort_keys=True).encode('utf-8'))
+    for objet in (imputer, appliquer_imputation, construire_modele, EncodeurCategoriel, _vers_matrice):
+        h.update(inspect.getsource(objet).encode('utf-8'))
+    return h.hexdigest()[:16]
+
+
+def cle_plis(dataset_hash, n_plis, seed, mode, max_cat_to_onehot):
+    """Clé du cache des plis : indépendante des hyperparamètres du modèle."""
+    brut = json.dumps({
+        'dataset': dataset_hash,
+        'pretraitement': version_pretraitement(),
+        'n_plis': n_plis,
+        'seed': seed,
+        'mode': mode,
+        'max_cat_to_onehot': max_cat_to_onehot,
+        'num_cols': num_cols,
+        'cat_cols': cat_cols,
+    }, sort_keys=True)
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()[:16]
+
+
+def _vers_matrice(X, mode):
+    """Convertit la sortie du pré-processeur en matrice numérique (dense ou CSR) pour XGBoost."""
+    if mode == MODE_NATIVE:
+        # Catégories -> codes entiers, modalité inconnue (-1) -> NaN
+        colonnes = [X[col].to_numpy(dtype=np.float32) for col in num_cols]
+        for col in cat_cols:
+            codes = X[col].cat.codes.to_numpy().astype(np.float32)
+            codes[codes < 0] = np.nan
+            colonnes.append(codes)
+        return np.column_stack(colonnes)
+    if sparse.issparse(X):
+        return X.tocsr().astype(np.float32)
+    return np.asarray(X, dtype=np.float32)
+
+
+def _sauver_matrice(nom, X, buffers):
+    """Ajoute une matrice (dense ou CSR) au dictionnaire de tableaux à sauvegarder."""
+    if sparse.issparse(X):
+        buffers[f'{nom}_data'] = X.data
+        buffers[f'{nom}_indices'] = X.indices
+        buffers[f'{nom}_indptr'] = X.indptr
+        buffers[f'{nom}_shape'] = np.array(X.shape)
+    else:
+        buffers[nom] = X
+
+
+def _charger_matrice(npz, nom):
+    if f'{nom}_data' in npz:
+        return sparse.csr_matrix(
+            (npz[f'{nom}_data'], npz[f'{nom}_indices'], npz[f'{nom}_indptr']),
+            shape=tuple(npz[f'{nom}_shape'])
+        )
+    return npz[nom]
+
+
+def preparer_plis(df, n_plis=5, seed=42, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT, source=DATASET_CSV):
+    """
+    Pré-traite chaque pli une seule fois et retourne la liste des fichiers .npz.
+    `source` est le fichier ou l'URL de base d'où `df` a été lu.
+    Si les plis existent déjà pour ces données et ce découpage, ils sont réutilisés.
+    """
+    cle = cle_plis(empreinte_source(df, source), n_plis, seed, mode, max_cat_to_onehot)
+    dossier = os.path.join(CV_CACHE_DIR, cle)
+    fichiers = [os.path.join(dossier, f'pli_{k}.npz') for k in range(n_plis)]
+
+    if all(os.path.exists(f) for f in fichiers):
+        print(f"♻️ Plis pré-traités réutilisés depuis {dossier}")
+        return fichiers
+
+    print(f"⚙️ Pré-traitement de {n_plis} plis dans {dossier}...")
+    os.makedirs(dossier, exist_ok=True)
+
+    X = df.drop('prix_ttc_eur', axis=1)
+    y = df['prix_ttc_eur']
+    kfold = KFold(n_splits=n_plis, shuffle=True, random_state=seed)
+
+    for k, (idx_train, idx_val) in enumerate(kfold.split(X)):
+        X_train, X_val = X.take(idx_train), X.take(idx_val)
+        # Imputation ajustée sur la partie entraînement du pli uniquement
+        imputer(X_train, X_val)
+
+        preprocessor = construire_modele(mode, max_cat_to_onehot).named_steps['preprocessor']
+        buffers = {
+            'y_train': y.to_numpy(dtype=np.float32)[idx_train],
+            'y_val': y.to_numpy(dtype=np.float32)[idx_val],
+            'marque_val': X_val['marque'].astype(str).to_numpy(dtype=str),
+        }
+        _sauver_matrice('X_train', _vers_matrice(preprocessor.fit_transform(X_train), mode), buffers)
+        _sauver_matrice('X_val', _vers_matrice(preprocessor.transform(X_val), mode), buffers)
+
+        # Écriture atomique : un pli à moitié écrit ne doit jamais être relu comme valide
+        tmp = fichiers[k] + '.tmp.npz'
+        np.savez(tmp, **buffers)
+        os.replace(tmp, fichiers[k])
+
+    return fichiers
+
+
+def params_booster(params, mode, max_cat_to_onehot, n_jobs):
+    """Traduit les paramètres de XGBRegressor (model.py) vers l'API native xgb.train."""
+    params = dict(params)
+    nb_arbres = params.pop('n_estimators')
+    params.pop('early_stopping_rounds', None)
+    params['seed'] = params.pop('random_state', 0)
+    params['objective'] = 'reg:squarederror'
+    params['nthread'] = n_jobs
+    if mode == MODE_NATIVE:
+        params['tree_method'] = 'hist'
+        params['max_cat_to_onehot'] = max_cat_to_onehot
+    return params, nb_arbres
+
+
+def _entrainer_pli(fichier, params, mode, max_cat_to_onehot, n_jobs):
+    """Entraîne et évalue un pli à partir de ses buffers en cache (exécuté dans un worker)."""
+    with np.load(fichier) as npz:
+        X_train, X_val = _charger_matrice(npz, 'X_train'), _charger_matrice(npz, 'X_val')
+        y_train, y_val, marque_val = npz['y_train'], npz['y_val'], npz['marque_val']
+
+    feature_types = None
+    if mode == MODE_NATIVE:
+        feature_types = ['q'] * len(num_cols) + ['c'] * len(cat_cols)
+    dtrain = xgb.DMatrix(X_train, label=y_train, feature_types=feature_types, enable_categorical=mode == MODE_NATIVE)
+    dval = xgb.DMatrix(X_val, feature_types=feature_types, enable_categorical=mode == MODE_NATIVE)
+
+    params_natifs, nb_arbres = params_booster(params, mode, max_cat_to_onehot, n_jobs)
+    booster = xgb.train(params_natifs, dtrain, num_boost_round=nb_arbres)
+    return marque_val, y_val, booster.predict(dval)
+
+
+def _metriques(hors_pli, par):
+    """RMSE, MAE et nombre de lignes des prédictions hors-pli, agrégés selon `par`."""
+    metriques = hors_pli.groupby(par).agg(
+        mse=('erreur_carree', 'mean'), mae=('erreur_absolue', 'mean'), lignes=('prix', 'size')
+    )
+    metriques['rmse'] = np.sqrt(metriques.pop('mse'))
+    return metriques
+
+
+def valider(fichiers, params, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT, workers=None):
+    """Entraîne les plis en parallèle et retourne (métriques par pli, métriques par marque)."""
+    nb_cpu = os.cpu_count() or 1
+    nb_workers = min(workers or nb_cpu, len(fichiers))
+    n_jobs = max(1, nb_cpu // nb_workers)
+
+    with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+        futures = [executor.submit(_entrainer_pli, f, params, mode, max_cat_to_onehot, n_jobs) for f in fichiers]
+        hors_pli = pd.concat([
+            pd.DataFrame({'pli': k, 'marque': marque, 'prix': y.astype(np.float64), 'prediction': pred.astype(np.float64)})
+            for k, (marque, y, pred) in enumerate(f.result() for f in futures)
+        ], ignore_index=True)
+
+    erreur = hors_pli['prediction'] - hors_pli['prix']
+    hors_pli['erreur_carree'] = erreur ** 2
+    hors_pli['erreur_absolue'] = erreur.abs()
+    par_pli = _metriques(hors_pli, 'pli')
+
+    # Regroupe les marques trop rares pour avoir une mesure stable
+    effectifs = hors_pli['marque'].value_counts()
+    rares = effectifs[effectifs < MIN_LIGNES_SEGMENT].index
+    hors_pli.loc[hors_pli['marque'].isin(rares), 'marque'] = 'autres'
+
+    par_segment = (
+        _metriques(hors_pli, ['marque', 'pli'])
+        .groupby('marque')
+        .agg(rmse_moyen=('rmse', 'mean'), rmse_std=('rmse', 'std'),
+             mae_moyen=('mae', 'mean'), mae_std=('mae', 'std'), lignes=('lignes', 'sum'))
+        .sort_values('lignes', ascending=False)
+    )
+    return par_pli, par_segment
+
+
+def afficher_rapport(par_pli, par_segment):
+    print(f"\n--- Validation croisée ({len(par_pli)} plis) ---")
+    print(f"RMSE : {par_pli['rmse'].mean():,.2f} € ± {par_pli['rmse'].std():,.2f}")
+    print(f"MAE  : {par_pli['mae'].mean():,.2f} € ± {par_pli['mae'].std():,.2f}")
+    print(f"\n{'marque':<15} {'lignes':>7} {'RMSE moyen':>11} {'± std':>9} {'MAE moyen':>10} {'± std':>9}")
+    for marque, r in par_segment.iterrows():
+        print(f"{marque:<15} {int(r['lignes']):>7} {r['rmse_moyen']:>11,.0f} {r['rmse_std']:>9,.0f} "
+              f"{r['mae_moyen']:>10,.0f} {r['mae_std']:>9,.0f}")
+    print(f"--------------------------")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Validation croisée K-fold du modèle XGBoost.")
+    parser.add_argument('--plis', type=int, default=5, help="Nombre de plis (défaut: 5).")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--source', default=DATASET_CSV,
+                        help="Dataset CSV ou URL de base 'sqlite:///...' / 'mysql://...' (défaut: dataset.csv).")
+    parser.add_argument('--workers', type=int, default=None, help="Plis entraînés en parallèle (défaut: nombre de CPU).")
+    parser.add_argument('--mode', choices=MODES, default=MODE_ONEHOT)
+    parser.add_argument('--max-cat-to-onehot', type=int, default=MAX_CAT_TO_ONEHOT)
+    parser.add_argument('--params', type=json.loads, default={},
+                        help="Surcharge JSON des hyperparamètres, ex: '{\"max_depth\": 5}'.")
+    args = parser.parse_args(argv)
+
+    df = charger_dataset(args.source)
+    if df is None:
+        sys.exit(1)
+
+    fichiers = preparer_plis(df, args.plis, args.seed, args.mode, args.max_cat_to_onehot, source=args.source)
+    params = {**charger_params_xgb(args.mode), **args.params}
+    par_pli, par_segment = valider(fichiers, params, args.mode, args.max_cat_to_onehot, args.workers)
+    afficher_rapport(par_pli, par_segment)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,350 @@
+"""
+Entraînement hors mémoire, pour un dataset.csv plus grand que la RAM.
+
+Le CSV est lu par blocs (pandas, chunksize) et n'est jamais chargé en entier :
+  1. une première passe, avec les types de model.TYPES_DATASET (catégorielles
+     en texte), collecte les modalités des colonnes catégorielles et tire un échantillon
+     uniforme des lignes d'entraînement. Les médianes d'imputation sont calculées
+     et le pré-processeur de model.py (mode 'onehot' ou 'native') est ajusté sur
+     cet échantillon, avec les modalités de tout le fichier ;
+  2. un xgboost.DataIter relit le CSV bloc par bloc, impute et transforme chaque
+     bloc et alimente un QuantileDMatrix. XGBoost ne garde que la matrice
+     quantifiée (un octet par valeur). Avec --memoire-externe, un
+     ExtMemQuantileDMatrix en garde les pages sur disque ;
+  3. une dernière passe calcule le RMSE et la couverture de l'intervalle sur les
+     lignes de test, ainsi que les empreintes des lignes (refresh.py).
+Les lignes de test sont tirées sur le numéro de ligne : le split est le même à
+chaque passe et pour l'entraînement en mémoire de --comparer.
+
+Le pipeline sauvegardé (pré-processeur + XGBRegressor) a le même format que celui
+de model.py : predict et refresh.py le relisent sans distinction. L'index des
+annonces comparables, qui tient toutes les annonces, n'est pas reconstruit.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor train --hors-memoire
+    python -m car_price_predictor.models.hors_memoire --taille-bloc 200000 --memoire-externe
+    python -m car_price_predictor.models.hors_memoire --comparer
+"""
+import argparse
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from math import sqrt
+
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from sklearn.pipeline import Pipeline
+from xgboost import XGBRegressor
+
+from .. import metriques
+from .model import (
+    DATASET_CSV, MAX_CAT_TO_ONEHOT, MODE_NATIVE, MODE_ONEHOT, MODES, QUANTILES, TYPES_DATASET, appliquer_imputation,
+    cat_cols, charger_dataset, charger_params_xgb, construire_modele, empreintes_lignes, est_stockage, num_cols,
+    pic_memoire_mo, predire_config, sauvegarder_modele
+)
+
+TAILLE_BLOC = 100_000
+# Lignes d'entraînement gardées pour les médianes et l'ajustement du pré-processeur
+TAILLE_ECHANTILLON = 200_000
+# Part des lignes réservée au test, tirée sur le numéro de ligne
+PART_TEST = 0.2
+
+
+def lire_blocs(chemin, taille_bloc=TAILLE_BLOC, types=None):
+    """
+    Itère sur (numéro de la première ligne, bloc) du CSV, limité aux colonnes de `types`
+    et à 'url' : mêmes colonnes que charger_dataset, donc mêmes empreintes_lignes
+    que celles recalculées par refresh.py.
+    """
+    debut = 0
+    for bloc in pd.read_csv(chemin, chunksize=taille_bloc, dtype=types, usecols=lambda col: col in types or col == 'url'):
+        yield debut, bloc
+        debut += len(bloc)
+
+
+def masque_test(debut, taille):
+    """Lignes de test d'un bloc commençant à la ligne `debut` : tirage déterministe sur le numéro de ligne."""
+    lignes = np.arange(debut, debut + taille, dtype=np.uint64)
+    return pd.util.hash_array(lignes) % 1000 < PART_TEST * 1000
+
+
+def preparer_bloc(bloc, masque, medianes):
+    """X (colonnes du modèle, imputées) et y des lignes `masque` du bloc."""
+    X = bloc.loc[masque, num_cols + cat_cols].copy()
+    appliquer_imputation(X, medianes)
+    return X, bloc.loc[masque, 'prix_ttc_eur']
+
+
+def premiere_passe(chemin, taille_bloc=TAILLE_BLOC, taille_echantillon=TAILLE_ECHANTILLON, seed=42):
+    """
+    Types de lecture des blocs, modalités des colonnes catégorielles et échantillon
+    uniforme des lignes d'entraînement (sans 'url'). ValueError si le CSV n'a aucune
+    ligne d'entraînement.
+    """
+    rng = np.random.default_rng(seed)
+    # Types de model.py, catégorielles en texte : un dtype 'category' n'aurait que les modalités de son bloc
+    types = {col: str if col in cat_cols else type_ for col, type_ in TYPES_DATASET.items()}
+    modalites = {col: set() for col in cat_cols}
+    echantillon = None
+    for debut, bloc in lire_blocs(chemin, taille_bloc, types):
+        train = bloc[~masque_test(debut, len(bloc))].drop(columns='url', errors='ignore')
+        for col in cat_cols:
+            modalites[col].update(train[col].fillna('manquant').unique())
+        # Échantillon uniforme : les `taille_echantillon` lignes de plus petite clé aléatoire
+        train = train.assign(_cle=rng.random(len(train)))
+        echantillon = train if echantillon is None else pd.concat([echantillon, train])
+        echantillon = echantillon.nsmallest(taille_echantillon, '_cle')
+    if echantillon is None or echantillon.empty:
+        raise ValueError(f"{chemin} ne contient aucune ligne d'entraînement")
+    return types, modalites, echantillon.drop(columns='_cle')
+
+
+def ajuster_preprocesseur(echantillon, modalites, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT):
+    """Médianes d'imputation et pré-processeur de model.py ajustés sur l'échantillon, avec toutes les modalités."""
+    medianes = echantillon[num_cols].median()
+    X = echantillon[num_cols + cat_cols].copy()
+    appliquer_imputation(X, medianes)
+
+    categories = {col: sorted(modalites[col]) for col in cat_cols}
+    preprocesseur = construire_modele(mode, max_cat_to_onehot).named_steps['preprocessor']
+    if mode == MODE_ONEHOT:
+        preprocesseur.set_params(cat__categories=[categories[col] for col in cat_cols])
+    preprocesseur.fit(X)
+    if mode == MODE_NATIVE:
+        # L'échantillon n'a pas forcément vu toutes les modalités du fichier
+        preprocesseur.categories_ = {col: pd.Index(categories[col]) for col in cat_cols}
+    return preprocesseur, medianes
+
+
+class IterateurBlocs(xgb.DataIter):
+    """Relit le CSV bloc par bloc pour XGBoost : lignes d'entraînement imputées puis pré-traitées."""
+
+    def __init__(self, chemin, types, preprocesseur, medianes, taille_bloc=TAILLE_BLOC, cache_prefix=None):
+        super().__init__(cache_prefix=cache_prefix)
+        self.chemin = chemin
+        self.types = types
+        self.preprocesseur = preprocesseur
+        self.medianes = medianes
+        self.taille_bloc = taille_bloc
+        self._blocs = None
+
+    def reset(self):
+        self._blocs = None
+
+    def next(self, input_data):
+        if self._blocs is None:
+            self._blocs = lire_blocs(self.chemin, self.taille_bloc, self.types)
+        for debut, bloc in self._blocs:
+            masque = ~masque_test(debut, len(bloc))
+            if not masque.any():
+                continue
+            X, y = preparer_bloc(bloc, masque, self.medianes)
+            input_data(data=self.preprocesseur.transform(X), label=y.to_numpy())
+            return True
+        return False
+
+
+def parametres_natifs(mode, max_cat_to_onehot, arbres=None):
+    """Hyperparamètres de model.py traduits pour xgboost.train : (paramètres, nombre d'arbres)."""
+    params = charger_params_xgb(mode)
+    nb_arbres = arbres or params.pop('n_estimators')
+    params.pop('n_estimators', None)
+    params['seed'] = params.pop('random_state', 0)
+    params['tree_method'] = 'hist'
+    if mode == MODE_NATIVE:
+        params['max_cat_to_onehot'] = max_cat_to_onehot
+    return params, nb_arbres
+
+
+def vers_regresseur(booster, mode):
+    """XGBRegressor enveloppant `booster`, pour un pipeline au même format que celui de model.py."""
+    regresseur = XGBRegressor(enable_categorical=mode == MODE_NATIVE)
+    regresseur.load_model(bytearray(booster.save_raw('ubj')))
+    return regresseur
+
+
+def evaluer_par_blocs(chemin, types, preprocesseur, medianes, booster, booster_quantiles=None, taille_bloc=TAILLE_BLOC):
+    """
+    RMSE et couverture de l'intervalle sur les lignes de test, et empreintes de toutes les lignes (une passe).
+    ValueError si le CSV n'a aucune ligne de test.
+    """
+    somme_carres = nb_test = nb_couverts = 0
+    empreintes = []
+    for debut, bloc in lire_blocs(chemin, taille_bloc, types):
+        empreintes.append(empreintes_lignes(bloc))
+        masque = masque_test(debut, len(bloc))
+        if not masque.any():
+            continue
+        X, y = preparer_bloc(bloc, masque, medianes)
+        matrice = xgb.DMatrix(preprocesseur.transform(X), enable_categorical=True)
+        y = y.to_numpy()
+        somme_carres += float(((booster.predict(matrice) - y) ** 2).sum())
+        nb_test += len(y)
+        if booster_quantiles is not None:
+            bornes = np.sort(booster_quantiles.predict(matrice).reshape(len(y), -1), axis=1)
+            nb_couverts += int(((y >= bornes[:, 0]) & (y <= bornes[:, -1])).sum())
+    if nb_test == 0:
+        raise ValueError(f"{chemin} ne contient aucune ligne de test : RMSE impossible à calculer")
+    couverture = nb_couverts / nb_test if booster_quantiles is not None else None
+    return sqrt(somme_carres / nb_test), couverture, np.concatenate(empreintes)
+
+
+def entrainer_hors_memoire(chemin=DATASET_CSV, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT,
+                           intervalles=True, taille_bloc=TAILLE_BLOC, memoire_externe=False,
+                           taille_echantillon=TAILLE_ECHANTILLON, arbres=None):
+    """
+    Entraîne le modèle (et le modèle de quantiles) sans charger le CSV en mémoire.
+    Retourne (pipeline, modèle de quantiles ou None, échantillon d'entraînement, rapport).
+    """
+    debut = time.perf_counter()
+    print(f"📖 Première passe sur {chemin} (blocs de {taille_bloc:,} lignes)...")
+    types, modalites, echantillon = premiere_passe(chemin, taille_bloc, taille_echantillon)
+    preprocesseur, medianes = ajuster_preprocesseur(echantillon, modalites, mode, max_cat_to_onehot)
+    params, nb_arbres = parametres_natifs(mode, max_cat_to_onehot, arbres)
+
+    with tempfile.TemporaryDirectory(prefix='xgb_pages_') as dossier_pages:
+        iterateur = IterateurBlocs(chemin, types, preprocesseur, medianes, taille_bloc,
+                                   cache_prefix=os.path.join(dossier_pages, 'cache') if memoire_externe else None)
+        classe = xgb.ExtMemQuantileDMatrix if memoire_externe else xgb.QuantileDMatrix
+        print(f"🧱 Construction du {classe.__name__} bloc par bloc...")
+        dtrain = classe(iterateur, enable_categorical=mode == MODE_NATIVE)
+        print(f"Début de l'entraînement hors mémoire ({dtrain.num_row():,} lignes, encodage '{mode}')...")
+        with metriques.chronometre('modele_entrainement_secondes', modele='prix'):
+            booster = xgb.train(params, dtrain, nb_arbres)
+
+        booster_quantiles = None
+        if intervalles:
+            print(f"Entraînement du modèle d'intervalles (quantiles {QUANTILES})...")
+            with metriques.chronometre('modele_entrainement_secondes', modele='quantiles'):
+                booster_quantiles = xgb.train({**params, 'objective': 'reg:quantileerror',
+                                               'quantile_alpha': np.array(QUANTILES)}, dtrain, nb_arbres)
+        del dtrain
+
+    rmse, couverture, empreintes = evaluer_par_blocs(chemin, types, preprocesseur, medianes, booster,
+                                                     booster_quantiles, taille_bloc)
+    pipeline = Pipeline(steps=[('preprocessor', preprocesseur), ('regressor', vers_regresseur(booster, mode))])
+    modele_quantiles = vers_regresseur(booster_quantiles, mode) if booster_quantiles is not None else None
+    rapport = {
+        'rmse': rmse,
+        'couverture': couverture,
+        'medianes': medianes.to_dict(),
+        'empreintes': empreintes,
+        'duree_s': time.perf_counter() - debut,
+        'nb_arbres': booster.num_boosted_rounds(),
+    }
+    return pipeline, modele_quantiles, echantillon, rapport
+
+
+def entrainer_et_sauvegarder(chemin=DATASET_CSV, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT,
+                             intervalles=True, taille_bloc=TAILLE_BLOC, memoire_externe=False):
+    """Entraînement hors mémoire, sauvegarde au format de model.py et prédiction de car_config.json."""
+    pipeline, modele_quantiles, echantillon, rapport = entrainer_hors_memoire(
+        chemin, mode, max_cat_to_onehot, intervalles, taille_bloc, memoire_externe
+    )
+    print(f"L'écart de prix moyen (RMSE) est : {rapport['rmse']:,.2f} €")
+    if rapport['couverture'] is not None:
+        print(f"Couverture de l'intervalle {int(QUANTILES[0] * 100)}%-{int(QUANTILES[-1] * 100)}% "
+              f"sur le test : {rapport['couverture']:.1%} (attendu: {QUANTILES[-1] - QUANTILES[0]:.0%})")
+    print(f"⏱️ {rapport['duree_s']:.1f}s, pic RSS {pic_memoire_mo():,.0f} Mo")
+
+    sauvegarder_modele(pipeline, {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'mode': mode,
+        'max_cat_to_onehot': max_cat_to_onehot,
+        'params': charger_params_xgb(mode),
+        'nb_arbres': rapport['nb_arbres'],
+        'medianes': rapport['medianes'],
+        'rmse_reference': rapport['rmse'],
+        'rmse_dernier': rapport['rmse'],
+        'nb_refresh': 0,
+        'quantiles': QUANTILES if intervalles else None,
+        'hors_memoire': {'taille_bloc': taille_bloc, 'memoire_externe': memoire_externe},
+    }, rapport['empreintes'], modele_quantiles)
+    predire_config(pipeline, num_cols + cat_cols, pd.Series(rapport['medianes']), modele_quantiles=modele_quantiles)
+    return pipeline
+
+
+# --- COMPARAISON AVEC L'ENTRAÎNEMENT EN MÉMOIRE ---
+
+def _mesurer_en_memoire(chemin, mode, max_cat_to_onehot, arbres):
+    """Entraînement de model.py sur le CSV chargé en entier, même split (exécuté dans un processus dédié)."""
+    debut = time.perf_counter()
+    df = charger_dataset(chemin)
+    test = masque_test(0, len(df))
+    medianes = df.loc[~test, num_cols].median()
+    X_train, y_train = preparer_bloc(df, ~test, medianes)
+    X_test, y_test = preparer_bloc(df, test, medianes)
+    model = construire_modele(mode, max_cat_to_onehot, params={'n_estimators': arbres} if arbres else None)
+    model.fit(X_train, y_train)
+    rmse = sqrt(float(((model.predict(X_test) - y_test.to_numpy()) ** 2).mean()))
+    return {'entrainement': 'en mémoire', 'temps_s': time.perf_counter() - debut,
+            'pic_memoire_mo': pic_memoire_mo(), 'rmse': rmse}
+
+
+def _mesurer_hors_memoire(chemin, mode, max_cat_to_onehot, arbres, taille_bloc, memoire_externe):
+    """Entraînement hors mémoire sans sauvegarde (exécuté dans un processus dédié)."""
+    _, _, _, rapport = entrainer_hors_memoire(chemin, mode, max_cat_to_onehot, intervalles=False, taille_bloc=taille_bloc,
+                                              memoire_externe=memoire_externe, arbres=arbres)
+    nom = 'mémoire externe' if memoire_externe else 'par blocs'
+    return {'entrainement': nom, 'temps_s': rapport['duree_s'], 'pic_memoire_mo': pic_memoire_mo(),
+            'rmse': rapport['rmse']}
+
+
+def comparer(chemin=DATASET_CSV, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT, taille_bloc=TAILLE_BLOC,
+             arbres=None):
+    """
+    Compare temps, pic RSS et RMSE de l'entraînement en mémoire, par blocs et en
+    mémoire externe, chacun dans un processus neuf (modèle ponctuel uniquement).
+    """
+    mesures = [(_mesurer_en_memoire, (chemin, mode, max_cat_to_onehot, arbres))]
+    mesures += [(_mesurer_hors_memoire, (chemin, mode, max_cat_to_onehot, arbres, taille_bloc, externe))
+                for externe in (False, True)]
+    resultats = []
+    for fonction, arguments in mesures:
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            resultats.append(executor.submit(fonction, *arguments).result())
+
+    print(f"\n--- Entraînement en mémoire / hors mémoire ({os.path.getsize(chemin) / 1e6:,.0f} Mo de CSV, "
+          f"encodage '{mode}', blocs de {taille_bloc:,} lignes) ---")
+    print(f"{'entraînement':<16} {'temps (s)':>10} {'pic RSS (Mo)':>13} {'RMSE (€)':>11}")
+    for r in resultats:
+        print(f"{r['entrainement']:<16} {r['temps_s']:>10.2f} {r['pic_memoire_mo']:>13.1f} {r['rmse']:>11,.2f}")
+    print(f"--------------------------")
+    return resultats
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entraînement du modèle sans charger dataset.csv en mémoire.")
+    parser.add_argument('--source', default=DATASET_CSV, help="CSV d'entraînement (défaut: dataset.csv).")
+    parser.add_argument('--mode', choices=MODES, default=MODE_ONEHOT,
+                        help="Encodage des colonnes catégorielles (défaut: onehot).")
+    parser.add_argument('--max-cat-to-onehot', type=int, default=MAX_CAT_TO_ONEHOT,
+                        help="Mode 'native' : nombre de modalités en dessous duquel XGBoost fait un split one-hot.")
+    parser.add_argument('--taille-bloc', type=int, default=TAILLE_BLOC, help=f"Lignes lues par bloc (défaut: {TAILLE_BLOC:,}).")
+    parser.add_argument('--memoire-externe', action='store_true',
+                        help="Garde aussi la matrice quantifiée sur disque (ExtMemQuantileDMatrix).")
+    parser.add_argument('--sans-intervalles', action='store_true',
+                        help="N'entraîne pas le modèle de quantiles (prix ponctuel uniquement).")
+    parser.add_argument('--comparer', action='store_true',
+                        help="Compare au lieu d'entraîner : en mémoire, par blocs, mémoire externe (temps, pic RSS, RMSE).")
+    parser.add_argument('--arbres', type=int, default=None,
+                        help="--comparer : nombre d'arbres (défaut: celui de model.py).")
+    args = parser.parse_args(argv)
+    if est_stockage(args.source):
+        parser.error("la lecture par blocs ne porte que sur un fichier CSV : --source ne peut pas être un stockage")
+
+    if args.comparer:
+        comparer(args.source, args.mode, args.max_cat_to_onehot, args.taille_bloc, args.arbres)
+        return
+    try:
+        entrainer_et_sauvegarder(args.source, args.mode, args.max_cat_to_onehot, not args.sans_intervalles,
+                                 args.taille_bloc, args.memoire_externe)
+    except ValueError as e:
+        print(f"❌ Erreur: {e}")
+
+
+if __name__ == "__main__":
+    main()
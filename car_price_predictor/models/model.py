@@ -1,119 +1,674 @@
+import numpy as np
 import pandas as pd
 from sklearn.model_selection import train_test_split
 from sklearn.preprocessing import OneHotEncoder, StandardScaler
 from sklearn.compose import ColumnTransformer
 from sklearn.pipeline import Pipeline
+from sklearn.base import BaseEstimator, TransformerMixin
 from xgboost import XGBRegressor
 from sklearn.metrics import mean_squared_error
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
 from math import sqrt
+import argparse
+import hashlib
+import joblib
 import json
+import os
+import resource
+import sys
+import time
 
-# Lecture du dataset
-try:
-    df = pd.read_csv('database/dataset.csv')
-except FileNotFoundError:
-    print("❌ Erreur: Le fichier 'dataset.csv' est introuvable. Assurez-vous d'exécuter JsonToCsv.py d'abord.")
-    exit()
+if __package__:
+    from .. import metriques, profilage
+    from .prediction import afficher_prediction
+else:  # lancé comme script : python3 models/model.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from car_price_predictor import metriques, profilage
+    from car_price_predictor.models.prediction import afficher_prediction
 
-print(f"Nombre de lignes prises en compte : {len(df)}")
+# Chemins résolus depuis ce fichier pour pouvoir lancer le script depuis n'importe où
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASET_CSV = os.path.join(MODELS_DIR, '..', 'database', 'dataset.csv')
+CAR_CONFIG = os.path.join(MODELS_DIR, '..', '..', 'to_predict', 'car_config.json')
 
-# On retire la colonne que l'on souhaite prédire.
-X = df.drop('prix_ttc_eur', axis=1)
-y = df['prix_ttc_eur']
+# Meilleure configuration trouvée par tuning.py (utilisée par défaut si présente)
+BEST_PARAMS_JSON = os.path.join(MODELS_DIR, 'best_params.json')
 
-# On split le dataset (train/test).
-X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+# Dernier modèle entraîné (pipeline complet + métadonnées), repris par refresh.py
+ARTIFACTS_DIR = os.path.join(MODELS_DIR, 'artifacts')
+PIPELINE_JOBLIB = os.path.join(ARTIFACTS_DIR, 'pipeline.joblib')
+META_JSON = os.path.join(ARTIFACTS_DIR, 'meta.json')
+LIGNES_VUES_NPY = os.path.join(ARTIFACTS_DIR, 'lignes_vues.npy')
+QUANTILES_JOBLIB = os.path.join(ARTIFACTS_DIR, 'quantiles.joblib')
 
-# --- MISE À JOUR DE LA SÉLECTION DES COLONNES ---
+# --- SÉLECTION DES COLONNES ---
 
 # 1. Colonnes Numériques (à normaliser/scaler)
-num_cols = ['age_ans', 'kilometrage', 'places', 'portes', 'puissance_fiscale', 'puissance_reelle'] 
+num_cols = ['age_ans', 'kilometrage', 'places', 'portes', 'puissance_fiscale', 'puissance_reelle']
 
 # 2. Colonnes Catégorielles (à encoder)
 cat_cols = ['marque', 'modele', 'energie', 'boite_de_vitesses', 'couleur', 'type_vehicule', 'provenance', 'premiere_main']
 
-# Nettoyage des NaN/valeurs vides sur les colonnes numériques/catégorielles sélectionnées
-# Imputation par la médiane du training set (pour les numériques)
-X_train[num_cols] = X_train[num_cols].fillna(X_train[num_cols].median())
-X_test[num_cols] = X_test[num_cols].fillna(X_train[num_cols].median()) 
-
-# Imputation par la valeur 'manquant' (pour les catégorielles)
-X_train[cat_cols] = X_train[cat_cols].fillna('manquant')
-X_test[cat_cols] = X_test[cat_cols].fillna('manquant')
-
-
-# On utilise un pré-processeur pour normaliser nos données.
-preprocessor = ColumnTransformer(
-    transformers=[
-        ('num', StandardScaler(), num_cols),
-        ('cat', OneHotEncoder(handle_unknown='ignore'), cat_cols)
-    ],
-    remainder='drop' 
-)
-
-# On utilise XGBoost.
-model = Pipeline(steps=[('preprocessor', preprocessor), 
-                        ('regressor', XGBRegressor(
-                            n_estimators=1000,
-                            learning_rate=0.05,
-                            max_depth=7,
-                            subsample=0.7,
-                            colsample_bytree=0.7,
-                            random_state=42
-                        ))])
-
-# Entraînement
-print("\nDébut de l'entraînement du modèle XGBoost...")
-model.fit(X_train, y_train)
-print("Entraînement terminé.")
-
-y_pred = model.predict(X_test)
-
-# On évalue l'erreur.
-mse = mean_squared_error(y_test, y_pred)
-print(f"\n--- Évaluation du Modèle ---")
-print(f"Erreur quadratique moyenne (MSE): {mse:,.2f}")
-print(f"L'écart de prix moyen (RMSE) est : {sqrt(mse):,.2f} €")
-print(f"Taille moyenne des prédictions (pour contexte): {y_pred.mean():,.2f} €")
-print(f"--------------------------")
-
-# --- PRÉDICTION FINALE AVEC CORRECTION D'IMPUTATION ---
-try:
-    with open("../to_predict/car_config.json", 'r') as fichier_json:
-        car_config = json.load(fichier_json)
-        
+# Types de lecture du dataset : float32 pour les numériques (XGBoost travaille en float32)
+# et 'category' pour les catégorielles (un code entier par ligne, chaque libellé stocké une fois).
+# Les colonnes absentes de ce dictionnaire (sauf 'url', pour les comparables) ne sont pas lues.
+TYPES_DATASET = {
+    'prix_ttc_eur': 'float32',
+    **{col: 'float32' for col in num_cols},
+    **{col: 'category' for col in cat_cols},
+}
+
+# Hyperparamètres XGBoost communs aux deux modes d'encodage
+PARAMS_XGB = {
+    'n_estimators': 1000,
+    'learning_rate': 0.05,
+    'max_depth': 7,
+    'subsample': 0.7,
+    'colsample_bytree': 0.7,
+    'random_state': 42,
+}
+
+# Modes d'encodage des colonnes catégorielles
+MODE_ONEHOT = 'onehot'   # OneHotEncoder (matrice large et creuse)
+MODE_NATIVE = 'native'   # dtype 'category' pandas + enable_categorical XGBoost
+MODES = [MODE_ONEHOT, MODE_NATIVE]
+
+# Quantiles de l'intervalle de prix (bas, médiane, haut), appris par un seul modèle multi-quantile
+QUANTILES = [0.1, 0.5, 0.9]
+
+# En dessous de ce nombre de modalités, XGBoost fait un split one-vs-rest
+# (valeur par défaut de XGBoost), au-delà il partitionne les catégories.
+MAX_CAT_TO_ONEHOT = 4
+
+
+class EncodeurCategoriel(BaseEstimator, TransformerMixin):
+    """
+    Convertit les colonnes catégorielles en dtype 'category' pandas.
+    Les catégories sont figées au fit : une modalité inconnue à la prédiction
+    devient une valeur manquante (gérée nativement par XGBoost) au lieu de
+    décaler les codes.
+    """
+
+    def __init__(self, num_cols=None, cat_cols=None):
+        self.num_cols = num_cols
+        self.cat_cols = cat_cols
+
+    def fit(self, X, y=None):
+        self.categories_ = {
+            col: pd.Index(sorted(X[col].astype(str).unique())) for col in self.cat_cols
+        }
+        return self
+
+    def transform(self, X):
+        X_cat = pd.DataFrame(index=X.index)
+        for col in self.num_cols:
+            X_cat[col] = X[col].astype(np.float32)
+        for col in self.cat_cols:
+            valeurs = X[col]
+            if isinstance(valeurs.dtype, pd.CategoricalDtype):
+                # Seuls les libellés distincts sont convertis, pas chaque ligne
+                valeurs = valeurs.cat.rename_categories(valeurs.cat.categories.astype(str))
+            else:
+                valeurs = valeurs.astype(str)
+            X_cat[col] = pd.Categorical(valeurs, categories=self.categories_[col])
+        return X_cat
+
+
+# (fichier, mode) déjà signalés par lire_reglage : un avertissement par processus
+_REGLAGES_IGNORES = set()
+
+
+def lire_reglage(mode=None, chemin=BEST_PARAMS_JSON):
+    """
+    Hyperparamètres de la meilleure configuration émise par tuning.py, ou None s'il n'y en a
+    pas ou si elle a été trouvée pour un autre mode d'encodage que `mode` (None : tout mode).
+    """
+    if not os.path.exists(chemin):
+        return None
+    with open(chemin, 'r', encoding='utf-8') as f:
+        reglage = json.load(f)
+    if mode is not None and reglage.get('mode', mode) != mode:
+        if (chemin, mode) not in _REGLAGES_IGNORES:
+            _REGLAGES_IGNORES.add((chemin, mode))
+            print(f"⚠️ {chemin} a été réglé pour l'encodage '{reglage['mode']}' : ignoré en mode '{mode}'")
+        return None
+    return reglage['params']
+
+
+def charger_params_xgb(mode=None, chemin=BEST_PARAMS_JSON):
+    """
+    Hyperparamètres d'entraînement par défaut : PARAMS_XGB, surchargés par
+    la meilleure configuration émise par tuning.py pour le même mode d'encodage.
+    """
+    return {**PARAMS_XGB, **(lire_reglage(mode, chemin) or {})}
+
+
+def empreinte_source(df, source):
+    """
+    Empreinte des données : celle du fichier CSV lu, ou celle du contenu du
+    DataFrame quand il vient d'une base (qui n'a pas de fichier à hacher).
+    """
+    if os.path.isfile(source):
+        return empreinte_fichier(source)
+    return hashlib.sha256(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes()).hexdigest()
+
+
+def empreinte_fichier(chemin):
+    """Empreinte SHA-256 du contenu d'un fichier (sert de clé de cache)."""
+    h = hashlib.sha256()
+    with open(chemin, 'rb') as f:
+        for bloc in iter(lambda: f.read(1 << 20), b''):
+            h.update(bloc)
+    return h.hexdigest()
+
+
+def typer_dataset(df):
+    """Colonnes du modèle (et 'url' si présente) converties aux types de TYPES_DATASET."""
+    colonnes = list(TYPES_DATASET) + (['url'] if 'url' in df.columns else [])
+    return df[colonnes].astype(TYPES_DATASET)
+
+
+def memoire_mo(df):
+    """Empreinte mémoire d'un DataFrame ou d'une Series en Mo, chaînes comprises (memory_usage(deep=True))."""
+    return np.sum(df.memory_usage(deep=True)) / 1e6
+
+
+def est_stockage(chemin):
+    """Vrai si `chemin` désigne un stockage ('sqlite:///...', 'mysql://...') plutôt qu'un CSV."""
+    return chemin.startswith(('sqlite:///', 'mysql://'))
+
+
+def lire_stockage(url):
+    """Données d'entraînement du stockage `url`, avec les types renvoyés par la base."""
+    if __package__:
+        from ..database.database import ouvrir_base
+    else:
+        from car_price_predictor.database.database import ouvrir_base
+    stockage = ouvrir_base(url)
+    try:
+        return stockage.lire_entrainement()
+    finally:
+        stockage.fermer()
+
+
+def charger_dataset(chemin=DATASET_CSV):
+    """
+    Lit le dataset produit par JsonToCsv.py, ou directement le stockage si `chemin`
+    est une URL 'sqlite:///...' / 'mysql://...', avec les types compacts de TYPES_DATASET.
+    Retourne None s'il est introuvable.
+    """
+    if est_stockage(chemin):
+        df = typer_dataset(lire_stockage(chemin))
+        print(f"Nombre de lignes prises en compte : {len(df)} ({memoire_mo(df):,.1f} Mo)")
+        return df
+
+    try:
+        df = pd.read_csv(chemin, dtype=TYPES_DATASET, usecols=lambda col: col in TYPES_DATASET or col == 'url')
+    except FileNotFoundError:
+        print("❌ Erreur: Le fichier 'dataset.csv' est introuvable. Assurez-vous d'exécuter JsonToCsv.py d'abord.")
+        return None
+
+    print(f"Nombre de lignes prises en compte : {len(df)} ({memoire_mo(df):,.1f} Mo)")
+    return df
+
+
+def empreintes_lignes(df):
+    """
+    Empreinte 64 bits de chaque ligne du dataset, pour repérer les nouvelles annonces.
+    'age_ans' est exclu : JsonToCsv.py le recalcule à chaque exécution depuis la date du jour.
+    """
+    return pd.util.hash_pandas_object(df.drop(columns=['age_ans']), index=False).to_numpy()
+
+
+def preparer_entrainement(df):
+    """
+    Split train/test (80/20) et imputation, avec une seule copie des colonnes du modèle.
+    Les lignes sont réordonnées une fois [train | test] selon les indices de train_test_split,
+    les médianes calculées une fois sur la partie train, l'imputation faite en place sur
+    tout le tampon, puis X_train/X_test et y_train/y_test en sont des tranches (des vues).
+    Retourne (X_train, X_test, y_train, y_test, médianes).
+    """
+    # Les indices seuls sont mélangés : mêmes lignes et même ordre qu'un split des DataFrames
+    idx_train, idx_test = train_test_split(np.arange(len(df)), test_size=0.2, random_state=42)
+    ordre = np.concatenate([idx_train, idx_test])
+    X = df[num_cols + cat_cols].take(ordre)
+    y = df['prix_ttc_eur'].take(ordre)
+
+    nb_train = len(idx_train)
+    medianes = X[num_cols].iloc[:nb_train].median()
+    appliquer_imputation(X, medianes)
+    compacter_entiers(X)
+
+    return X.iloc[:nb_train], X.iloc[nb_train:], y.iloc[:nb_train], y.iloc[nb_train:], medianes
+
+
+def separer_et_imputer(df):
+    """Split train/test (80/20) puis imputation des valeurs manquantes à partir du training set."""
+    return preparer_entrainement(df)[:4]
+
+
+def imputer(X_train, X_test):
+    """Impute les valeurs manquantes (en place) avec les statistiques du training set uniquement."""
+    # Nettoyage des NaN/valeurs vides sur les colonnes numériques/catégorielles sélectionnées
+    # Imputation par la médiane du training set (pour les numériques)
+    medianes = X_train[num_cols].median()
+    appliquer_imputation(X_train, medianes)
+    appliquer_imputation(X_test, medianes)
+    return medianes
+
+
+def appliquer_imputation(X, medianes):
+    """Remplit (en place) les NaN numériques avec des médianes déjà calculées et les catégorielles avec 'manquant'."""
+    # Médianes au type de leur colonne : un float64 dans une colonne float32 la convertirait
+    valeurs = {col: X[col].dtype.type(medianes[col]) if X[col].dtype.kind == 'f' else medianes[col] for col in num_cols}
+    # Imputation par la valeur 'manquant' (pour les catégorielles)
+    for col in cat_cols:
+        if isinstance(X[col].dtype, pd.CategoricalDtype) and 'manquant' not in X[col].cat.categories:
+            X[col] = X[col].cat.add_categories('manquant')
+        valeurs[col] = 'manquant'
+    X.fillna(valeurs, inplace=True)
+
+
+def compacter_entiers(X, colonnes=num_cols):
+    """Convertit en int16 (en place) les colonnes numériques imputées dont toutes les valeurs sont des entiers 16 bits."""
+    bornes = np.iinfo(np.int16)
+    for col in colonnes:
+        valeurs = X[col].to_numpy()
+        if (valeurs.dtype.kind == 'f' and len(valeurs) and not np.isnan(valeurs).any()
+                and bornes.min <= valeurs.min() and valeurs.max() <= bornes.max and (valeurs == np.round(valeurs)).all()):
+            X[col] = valeurs.astype(np.int16)
+
+
+def construire_modele(mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT, params=None):
+    """
+    Construit le pipeline (pré-processeur + XGBoost) pour le mode d'encodage demandé.
+    - 'onehot' : StandardScaler + OneHotEncoder, comportement historique.
+    - 'native' : catégories pandas passées telles quelles à XGBoost (tree_method='hist').
+    """
+    params = {**charger_params_xgb(mode), **(params or {})}
+
+    if mode == MODE_ONEHOT:
+        # On utilise un pré-processeur pour normaliser nos données.
+        preprocessor = ColumnTransformer(
+            transformers=[
+                ('num', StandardScaler(), num_cols),
+                ('cat', OneHotEncoder(handle_unknown='ignore'), cat_cols)
+            ],
+            remainder='drop'
+        )
+        regressor = XGBRegressor(**params)
+
+    elif mode == MODE_NATIVE:
+        # Pas de mise à l'échelle : les arbres sont invariants aux transformations monotones.
+        preprocessor = EncodeurCategoriel(num_cols=num_cols, cat_cols=cat_cols)
+        regressor = XGBRegressor(
+            tree_method='hist',
+            enable_categorical=True,
+            max_cat_to_onehot=max_cat_to_onehot,
+            **params
+        )
+
+    else:
+        raise ValueError(f"Mode d'encodage inconnu: '{mode}' (attendu: {', '.join(MODES)})")
+
+    return Pipeline(steps=[('preprocessor', preprocessor), ('regressor', regressor)])
+
+
+def evaluer(model, X_test, y_test):
+    """Affiche les métriques d'erreur sur le jeu de test et retourne le RMSE."""
+    y_pred = model.predict(X_test)
+
+    # On évalue l'erreur.
+    mse = mean_squared_error(y_test, y_pred)
+    print(f"\n--- Évaluation du Modèle ---")
+    print(f"Erreur quadratique moyenne (MSE): {mse:,.2f}")
+    print(f"L'écart de prix moyen (RMSE) est : {sqrt(mse):,.2f} €")
+    print(f"Taille moyenne des prédictions (pour contexte): {y_pred.mean():,.2f} €")
+    print(f"--------------------------")
+    return sqrt(mse)
+
+
+def entrainer_quantiles(model, X_train, y_train, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT):
+    """
+    Entraîne un XGBoost multi-quantile (objectif 'reg:quantileerror') qui sort
+    tous les QUANTILES d'un coup. Il réutilise le pré-processeur déjà ajusté du
+    modèle ponctuel : une prédiction n'a qu'un seul pré-traitement à faire.
+    """
+    regressor = construire_modele(mode, max_cat_to_onehot, params={
+        'objective': 'reg:quantileerror',
+        'quantile_alpha': np.array(QUANTILES),
+    }).named_steps['regressor']
+    print(f"Entraînement du modèle d'intervalles (quantiles {QUANTILES})...")
+    with metriques.chronometre('modele_entrainement_secondes', modele='quantiles'):
+        regressor.fit(model.named_steps['preprocessor'].transform(X_train), y_train)
+    return regressor
+
+
+def predire_lot(model, X, modele_quantiles=None):
+    """
+    Prédit un lot de véhicules : prix ponctuel et, si disponible, les quantiles.
+    Le lot est pré-traité une seule fois, puis chaque modèle fait une seule
+    passe vectorisée sur la même matrice.
+    """
+    debut = time.perf_counter()
+    X_transforme = model.named_steps['preprocessor'].transform(X)
+    resultats = pd.DataFrame({'prix': model.named_steps['regressor'].predict(X_transforme)}, index=X.index)
+
+    if modele_quantiles is not None:
+        # Tri par ligne : garantit bas <= médiane <= haut même si les quantiles se croisent
+        bornes = np.sort(modele_quantiles.predict(X_transforme).reshape(len(X), -1), axis=1)
+        for i, alpha in enumerate(QUANTILES):
+            resultats[f'q{int(alpha * 100)}'] = bornes[:, i]
+
+    metriques.observer('modele_prediction_secondes', time.perf_counter() - debut,
+                       lot='unitaire' if len(X) == 1 else 'lot')
+    metriques.incrementer('modele_lignes_predites_total', len(X))
+    return resultats
+
+
+def preparer_config(car_config, colonnes, medianes):
+    """
+    DataFrame d'une ligne, dans l'ordre de `colonnes`, pour la configuration `car_config` (dict) :
+    les numériques absents ou vides prennent la médiane d'entraînement (`medianes`).
+    """
     car_df = pd.DataFrame(car_config, index=[0])
-    
+
     # 1. Imputation Robuste: Gérer les colonnes manquantes dans car_config.json
-    for col in X_train.columns:
+    for col in colonnes:
         if col not in car_df.columns:
             if col in num_cols:
                  # La médiane est un float, ce qui résout l'erreur de conversion.
-                 car_df[col] = X_train[col].median()
+                 car_df[col] = medianes[col]
             # Utiliser 'manquant' si c'est une colonne catégorielle
             elif col in cat_cols:
                  car_df[col] = 'manquant'
             else:
                  car_df[col] = '' # Pour les autres colonnes ignorées
-        
+
         # 2. Assurer le format numérique (si la valeur existe mais est NaN ou None)
         elif col in num_cols and pd.isna(car_df.loc[0, col]):
-            car_df.loc[0, col] = X_train[col].median()
-            
+            car_df.loc[0, col] = medianes[col]
+
         # 3. Uniformiser les chaînes (minuscules)
         elif col in cat_cols:
             car_df[col] = car_df[col].astype(str).str.lower().str.strip()
 
+    return car_df[list(colonnes)] # Réordonner les colonnes
+
+
+def predire_config(model, colonnes, medianes, chemin=CAR_CONFIG, modele_quantiles=None, index_comparables=None):
+    """
+    Prédit le prix (et son intervalle si le modèle de quantiles est fourni) de la voiture décrite dans car_config.json,
+    puis affiche les annonces réelles les plus proches si l'index des comparables est fourni.
+    `medianes` sont celles de l'entraînement (sauvegardées dans meta.json), comme pour `predict`.
+    """
+    # --- PRÉDICTION FINALE AVEC CORRECTION D'IMPUTATION ---
+    try:
+        with open(chemin, 'r') as fichier_json:
+            car_config = json.load(fichier_json)
+
+        car_df = preparer_config(car_config, colonnes, medianes)
+
+        prediction = predire_lot(model, car_df, modele_quantiles).iloc[0]
+        prix_predit = int(prediction['prix'])
+
+        intervalle = None
+        if modele_quantiles is not None:
+            intervalle = [[int(QUANTILES[0] * 100), prediction.iloc[1]], [int(QUANTILES[-1] * 100), prediction.iloc[-1]]]
+        afficher_prediction(car_config, {'prix': prix_predit, 'intervalle': intervalle})
+        if index_comparables is not None:
+            if __package__:
+                from .comparables import afficher_comparables
+            else:
+                from car_price_predictor.models.comparables import afficher_comparables
+            afficher_comparables(index_comparables, car_config)
+        return prix_predit
+
+    except FileNotFoundError:
+        print("\n⚠️ Fichier car_config.json manquant ou mal situé (attendu dans le répertoire parent). Impossible d'effectuer la prédiction finale.")
+    except Exception as e:
+        # Affiche l'erreur si elle n'est pas due à un fichier manquant
+        print(f"\n❌ Erreur lors de la prédiction du car_config: {e}")
+    return None
+
+
+# --- SAUVEGARDE DU MODÈLE ---
+
+def sauvegarder_modele(model, meta, empreintes, modele_quantiles=None):
+    """
+    Sauvegarde le pipeline entraîné, ses métadonnées (paramètres, médianes
+    d'imputation, RMSE de référence), les empreintes des lignes déjà vues et,
+    s'il est fourni, le modèle de quantiles.
+    """
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    joblib.dump(model, PIPELINE_JOBLIB)
+    if modele_quantiles is not None:
+        joblib.dump(modele_quantiles, QUANTILES_JOBLIB)
+    np.save(LIGNES_VUES_NPY, empreintes)
+    with open(META_JSON, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2, ensure_ascii=False)
+    print(f"💾 Modèle sauvegardé dans {ARTIFACTS_DIR}")
+
+
+def charger_modele():
+    """Recharge (pipeline, meta, empreintes des lignes vues), ou None si aucun modèle n'a été sauvegardé."""
+    if not all(os.path.exists(f) for f in (PIPELINE_JOBLIB, META_JSON, LIGNES_VUES_NPY)):
+        return None
+    with open(META_JSON, 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    return joblib.load(PIPELINE_JOBLIB), meta, np.load(LIGNES_VUES_NPY)
+
+
+def charger_modele_quantiles():
+    """Recharge le modèle de quantiles sauvegardé, ou None s'il n'a pas été entraîné."""
+    if not os.path.exists(QUANTILES_JOBLIB):
+        return None
+    return joblib.load(QUANTILES_JOBLIB)
+
+
+def entrainer_complet(df, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT, intervalles=True):
+    """
+    Entraînement complet sur tout le dataset, évaluation et sauvegarde du modèle.
+    Retourne (pipeline, X_train, modèle de quantiles ou None, médianes d'imputation).
+    """
+    X_train, X_test, y_train, y_test, medianes = preparer_entrainement(df)
+    model = construire_modele(mode, max_cat_to_onehot)
+
+    # Entraînement
+    print(f"\nDébut de l'entraînement du modèle XGBoost (encodage '{mode}')...")
+    with metriques.chronometre('modele_entrainement_secondes', modele='prix'):
+        model.fit(X_train, y_train)
+    print("Entraînement terminé.")
+
+    rmse = evaluer(model, X_test, y_test)
+
+    modele_quantiles = None
+    if intervalles:
+        modele_quantiles = entrainer_quantiles(model, X_train, y_train, mode, max_cat_to_onehot)
+        bornes = predire_lot(model, X_test, modele_quantiles)
+        couverture = ((y_test >= bornes.iloc[:, 1]) & (y_test <= bornes.iloc[:, -1])).mean()
+        print(f"Couverture de l'intervalle {int(QUANTILES[0] * 100)}%-{int(QUANTILES[-1] * 100)}% "
+              f"sur le test : {couverture:.1%} (attendu: {QUANTILES[-1] - QUANTILES[0]:.0%})")
+
+    regressor = model.named_steps['regressor']
+    sauvegarder_modele(model, {
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'mode': mode,
+        'max_cat_to_onehot': max_cat_to_onehot,
+        'params': charger_params_xgb(mode),
+        'nb_arbres': regressor.get_booster().num_boosted_rounds(),
+        'medianes': medianes.to_dict(),
+        # RMSE de l'entraînement complet : référence du garde-fou de refresh.py
+        'rmse_reference': rmse,
+        'rmse_dernier': rmse,
+        'nb_refresh': 0,
+        'quantiles': QUANTILES if intervalles else None,
+    }, empreintes_lignes(df), modele_quantiles)
+    return model, X_train, modele_quantiles, medianes
+
+
+# --- BENCHMARK DES MODES D'ENCODAGE ---
+
+def pic_memoire_mo():
+    """Pic de mémoire résidente (RSS) du processus courant, en Mo."""
+    pic = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss est en octets sur macOS et en kilo-octets sur Linux
+    return pic / (1024 * 1024) if sys.platform == 'darwin' else pic / 1024
+
+
+def _mesurer_entrainement(df, mode, max_cat_to_onehot):
+    """Entraîne un modèle et mesure temps, pic mémoire et RMSE (exécuté dans un processus dédié)."""
+    X_train, X_test, y_train, y_test = separer_et_imputer(df)
+    model = construire_modele(mode, max_cat_to_onehot)
+
+    memoire_avant = pic_memoire_mo()
+    debut = time.perf_counter()
+    model.fit(X_train, y_train)
+    duree = time.perf_counter() - debut
+    memoire_pic = pic_memoire_mo()
+
+    y_pred = model.predict(X_test)
+    rmse = sqrt(mean_squared_error(y_test, y_pred))
+
+    # Nombre de colonnes effectivement vues par XGBoost
+    nb_features = model.named_steps['regressor'].get_booster().num_features()
+
+    return {
+        'mode': mode,
+        'temps_entrainement_s': duree,
+        'pic_memoire_mo': memoire_pic,
+        'surcout_memoire_mo': memoire_pic - memoire_avant,
+        'rmse': rmse,
+        'nb_features': nb_features,
+    }
+
+
+def comparer_encodages(df, max_cat_to_onehot=MAX_CAT_TO_ONEHOT):
+    """
+    Compare l'encodage one-hot et l'encodage catégoriel natif sur le même split.
+    Chaque mode tourne dans un processus neuf pour que le pic RSS mesuré
+    ne soit pas pollué par l'entraînement précédent.
+    """
+    resultats = []
+    for mode in MODES:
+        print(f"\n⏱️ Benchmark du mode '{mode}'...")
+        with ProcessPoolExecutor(max_workers=1) as executor:
+            resultats.append(executor.submit(_mesurer_entrainement, df, mode, max_cat_to_onehot).result())
+
+    print(f"\n--- Comparaison des encodages (max_cat_to_onehot={max_cat_to_onehot}) ---")
+    print(f"{'mode':<8} {'features':>9} {'temps (s)':>10} {'pic RSS (Mo)':>13} {'+fit (Mo)':>10} {'RMSE (€)':>11}")
+    for r in resultats:
+        print(f"{r['mode']:<8} {r['nb_features']:>9} {r['temps_entrainement_s']:>10.2f} "
+              f"{r['pic_memoire_mo']:>13.1f} {r['surcout_memoire_mo']:>10.1f} {r['rmse']:>11,.2f}")
+    print(f"--------------------------")
+    return resultats
+
+
+def rapport_memoire(chemin=DATASET_CSV):
+    """
+    Empreinte mémoire (memory_usage(deep=True)) du dataset lu avec les types par défaut
+    (ceux de read_csv, ou de la base pour un stockage) puis avec TYPES_DATASET, et celle
+    des jeux train/test : copies de train_test_split contre tranches du tampon unique
+    de preparer_entrainement.
+    """
+    avant = lire_stockage(chemin) if est_stockage(chemin) else pd.read_csv(chemin)
+    apres = charger_dataset(chemin)
+
+    print(f"\n--- Mémoire du dataset ({len(avant):,} lignes, memory_usage(deep=True)) ---")
+    print(f"{'colonne':<20} {'type avant':>10} {'type après':>10} {'avant (Mo)':>11} {'après (Mo)':>11}")
+    memoire_avant, memoire_apres = avant.memory_usage(deep=True), apres.memory_usage(deep=True)
+    for col in avant.columns:
+        type_apres = str(apres[col].dtype) if col in apres else '-'
+        print(f"{col:<20} {str(avant[col].dtype):>10} {type_apres:>10} "
+              f"{memoire_avant[col] / 1e6:>11.2f} {memoire_apres.get(col, 0) / 1e6:>11.2f}")
+    print(f"{'total':<20} {'':>10} {'':>10} {memoire_mo(avant):>11.2f} {memoire_mo(apres):>11.2f}")
+
+    # Split historique : X_train et X_test copiés par train_test_split depuis X = df.drop(...)
+    split_avant = train_test_split(avant.drop('prix_ttc_eur', axis=1), avant['prix_ttc_eur'], test_size=0.2, random_state=42)
+    split_apres = preparer_entrainement(apres)[:4]
+    print(f"{'split train/test':<20} {'copies':>10} {'vues':>10} "
+          f"{sum(map(memoire_mo, split_avant)):>11.2f} {sum(map(memoire_mo, split_apres)):>11.2f}")
+    print(f"--------------------------")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Entraînement du modèle XGBoost de prédiction de prix.")
+    parser.add_argument('--mode', choices=MODES, default=MODE_ONEHOT,
+                        help="Encodage des colonnes catégorielles (défaut: onehot).")
+    parser.add_argument('--max-cat-to-onehot', type=int, default=MAX_CAT_TO_ONEHOT,
+                        help="Mode 'native' : nombre de modalités en dessous duquel XGBoost fait un split one-hot.")
+    parser.add_argument('--sans-intervalles', action='store_true',
+                        help="N'entraîne pas le modèle de quantiles (prix ponctuel uniquement).")
+    parser.add_argument('--benchmark', action='store_true',
+                        help="Compare les deux modes d'encodage (temps, pic mémoire, RMSE) au lieu d'entraîner.")
+    parser.add_argument('--source', default=DATASET_CSV,
+                        help="dataset.csv (défaut) ou stockage à lire directement : sqlite:///chemin.db, mysql://base.")
+    parser.add_argument('--memoire', action='store_true',
+                        help="Affiche l'empreinte mémoire du dataset (types par défaut / compacts, split) au lieu d'entraîner.")
+    parser.add_argument('--hors-memoire', type=int, nargs='?', const=100_000, metavar='TAILLE_BLOC',
+                        help="Entraîne en lisant le CSV par blocs de TAILLE_BLOC lignes (défaut: 100 000), "
+                             "sans le charger en mémoire (voir hors_memoire.py).")
+    parser.add_argument('--metriques', metavar='FICHIER',
+                        help="Active l'instrumentation et l'écrit dans FICHIER (.json, sinon texte Prometheus).")
+    parser.add_argument('--profile', nargs='?', const='profils', metavar='DOSSIER',
+                        help="Profile l'entraînement (pstats, piles pour flamegraph, tracemalloc) dans DOSSIER (défaut: profils/).")
+    args = parser.parse_args(argv)
+
+    if args.metriques:
+        metriques.activer()
+
+    if lire_reglage(args.mode):
+        print(f"ℹ️ Hyperparamètres chargés depuis {BEST_PARAMS_JSON}")
+
+    if args.memoire:
+        rapport_memoire(args.source)
+        return
+
+    if args.hors_memoire:
+        if est_stockage(args.source):
+            parser.error("--hors-memoire lit un CSV par blocs : --source doit être un fichier CSV, pas un stockage")
+        if __package__:
+            from .hors_memoire import entrainer_et_sauvegarder
+        else:
+            from car_price_predictor.models.hors_memoire import entrainer_et_sauvegarder
+        try:
+            with profilage.profiler('entrainement', args.profile) if args.profile else nullcontext():
+                entrainer_et_sauvegarder(args.source, args.mode, args.max_cat_to_onehot,
+                                         intervalles=not args.sans_intervalles, taille_bloc=args.hors_memoire)
+        except ValueError as e:
+            print(f"❌ Erreur: {e}")
+            sys.exit(1)
+        if args.metriques:
+            metriques.ecrire(args.metriques)
+        return
+
+    # Lecture du dataset
+    df = charger_dataset(args.source)
+    if df is None:
+        sys.exit(1)
+
+    if args.benchmark:
+        comparer_encodages(df, args.max_cat_to_onehot)
+        return
+
+    # Import local : comparables.py importe lui-même ce module
+    if __package__:
+        from . import comparables
+    else:
+        from car_price_predictor.models import comparables
+
+    with profilage.profiler('entrainement', args.profile) if args.profile else nullcontext():
+        model, X_train, modele_quantiles, medianes = entrainer_complet(
+            df, args.mode, args.max_cat_to_onehot, intervalles=not args.sans_intervalles
+        )
+        index = comparables.construire_index(df)
+        predire_config(model, X_train.columns, medianes, modele_quantiles=modele_quantiles, index_comparables=index)
 
-    car_df = car_df[X_train.columns] # Réordonner les colonnes
-    
-    prix_predit = model.predict(car_df)
-    prix_predit = int(prix_predit[0])
+    if args.metriques:
+        metriques.ecrire(args.metriques)
 
-    print(f"Le prix prédit pour la {car_config.get('marque', 'Véhicule Inconnu')} {car_config.get('modele', '')} est de : {prix_predit:,}€")
 
-except FileNotFoundError:
-    print("\n⚠️ Fichier car_config.json manquant ou mal situé (attendu dans le répertoire parent). Impossible d'effectuer la prédiction finale.")
-except Exception as e:
-    # Affiche l'erreur si elle n'est pas due à un fichier manquant
-    print(f"\n❌ Erreur lors de la prédiction du car_config: {e}")
\ No newline at end of file
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+"""
+Prédiction du prix d'une configuration avec le dernier modèle sauvegardé.
+
+Le module n'importe que la bibliothèque standard : le modèle (et donc pandas,
+scikit-learn et XGBoost, plus d'une seconde d'import) n'est chargé que si la
+prédiction n'est pas déjà en cache. Le cache associe l'empreinte de
+artifacts/meta.json (réécrit à chaque entraînement et à chaque refresh) et de
+la configuration au résultat : après un nouvel entraînement, les anciennes
+entrées ne sont simplement plus lues.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor predict
+    python -m car_price_predictor predict --config ma_voiture.json --comparables
+    python -m car_price_predictor predict --stockage sqlite:///annonces.db
+"""
+import argparse
+import hashlib
+import json
+import os
+import sys
+
+if __package__:
+    from .. import metriques
+else:  # lancé comme script : python3 models/prediction.py
+    sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..'))
+    from car_price_predictor import metriques
+
+# Mêmes emplacements que model.py, redéclarés pour ne pas importer le modèle
+MODELS_DIR = os.path.dirname(os.path.abspath(__file__))
+CAR_CONFIG = os.path.join(MODELS_DIR, '..', '..', 'to_predict', 'car_config.json')
+ARTIFACTS_DIR = os.path.join(MODELS_DIR, 'artifacts')
+META_JSON = os.path.join(ARTIFACTS_DIR, 'meta.json')
+PREDICTIONS_DIR = os.path.join(ARTIFACTS_DIR, 'predictions')
+
+
+def afficher_prediction(car_config, resultat):
+    """Affiche le prix prédit (et son intervalle) tel que calculé par predire()."""
+    print(f"Le prix prédit pour la {car_config.get('marque', 'Véhicule Inconnu')} {car_config.get('modele', '')} "
+          f"est de : {resultat['prix']:,}€")
+    if resultat.get('intervalle'):
+        (q_bas, bas), (q_haut, haut) = resultat['intervalle']
+        print(f"Intervalle de prix ({q_bas}%-{q_haut}%) : {int(bas):,}€ - {int(haut):,}€")
+
+
+def cle_prediction(car_config, chemin_meta=META_JSON):
+    """Clé de cache : empreinte des métadonnées du modèle et de la configuration, ou None sans modèle sauvegardé."""
+    try:
+        with open(chemin_meta, 'rb') as f:
+            meta = f.read()
+    except FileNotFoundError:
+        return None
+    h = hashlib.sha256(meta)
+    h.update(json.dumps(car_config, sort_keys=True, ensure_ascii=False).encode('utf-8'))
+    return h.hexdigest()
+
+
+def _predire_sans_cache(car_config):
+    """Charge le modèle sauvegardé et prédit la configuration (imports lourds)."""
+    import pandas as pd
+
+    if __package__:
+        from . import model
+    else:
+        from car_price_predictor.models import model
+
+    charge = model.charger_modele()
+    if charge is None:
+        return None
+    pipeline, meta, _ = charge
+    modele_quantiles = model.charger_modele_quantiles() if meta.get('quantiles') else None
+
+    # Colonnes vues à l'entraînement (pré-processeur sklearn), sinon celles lues par EncodeurCategoriel
+    colonnes = getattr(pipeline, 'feature_names_in_', None)
+    if colonnes is None:
+        colonnes = model.num_cols + model.cat_cols
+    car_df = model.preparer_config(car_config, colonnes, pd.Series(meta['medianes']))
+    prediction = model.predire_lot(pipeline, car_df, modele_quantiles).iloc[0]
+
+    resultat = {'prix': int(prediction['prix']), 'intervalle': None}
+    if modele_quantiles is not None:
+        resultat['intervalle'] = [
+            [int(meta['quantiles'][0] * 100), float(prediction.iloc[1])],
+            [int(meta['quantiles'][-1] * 100), float(prediction.iloc[-1])],
+        ]
+    return resultat
+
+
+def predire(car_config, cache=True):
+    """
+    Prix prédit de `car_config` : {'prix': int, 'intervalle': [[q, bas], [q, haut]] ou None}.
+    Retourne None si aucun modèle n'a été sauvegardé.
+    """
+    cle = cle_prediction(car_config)
+    if cle is None:
+        return None
+    chemin = os.path.join(PREDICTIONS_DIR, f'{cle}.json')
+    if cache and os.path.exists(chemin):
+        metriques.incrementer('modele_predictions_cache_total', resultat='succes')
+        with open(chemin, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    metriques.incrementer('modele_predictions_cache_total', resultat='echec')
+    resultat = _predire_sans_cache(car_config)
+    if resultat is not None and cache:
+        os.makedirs(PREDICTIONS_DIR, exist_ok=True)
+        temporaire = f'{chemin}.{os.getpid()}.tmp'
+        with open(temporaire, 'w', encoding='utf-8') as f:
+            json.dump(resultat, f)
+        os.replace(temporaire, chemin)
+    return resultat
+
+
+def afficher_depuis_stockage(url, car_config, k):
+    """
+    Statistiques de la tranche et k annonces comparables de `car_config`, lues dans le stockage `url` (requetes.py).
+    Lecture seule : les agrégats sont ceux du dernier chargement (load ou requetes.py les tiennent à jour).
+    """
+    if __package__:
+        from ..database import requetes
+        from ..database.database import ouvrir_base
+    else:
+        from car_price_predictor.database import requetes
+        from car_price_predictor.database.database import ouvrir_base
+
+    # Une base SQLite absente ne doit pas être créée (vide) par une simple lecture
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        print(f"⚠️ Base {url} introuvable : pas de statistiques ni d'annonces comparables.")
+        return
+    stockage = ouvrir_base(url)
+    try:
+        if not stockage.table_existe('Vehicule'):
+            print(f"⚠️ Aucune annonce chargée dans {url} : pas de statistiques ni d'annonces comparables.")
+            return
+        if not stockage.table_existe('StatsPrix'):
+            print("ℹ️ Statistiques de prix non calculées dans ce stockage (lancer le chargement ou requetes.py).")
+        requetes.afficher_comparables(stockage, car_config, k)
+    finally:
+        stockage.fermer()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Prédit le prix d'une configuration avec le dernier modèle entraîné.")
+    parser.add_argument('--config', default=CAR_CONFIG, help="Configuration du véhicule (défaut: car_config.json).")
+    parser.add_argument('--sans-cache', action='store_true', help="Recharge le modèle même si la prédiction est en cache.")
+    parser.add_argument('--comparables', type=int, nargs='?', const=10, metavar='K',
+                        help="Affiche aussi les K annonces comparables (défaut: 10) depuis l'index sauvegardé.")
+    parser.add_argument('--stockage', metavar='URL',
+                        help="sqlite:///chemin.db ou mysql://base : statistiques de prix de la tranche (StatsPrix) "
+                             "et annonces comparables lues dans le stockage plutôt que dans l'index.")
+    args = parser.parse_args(argv)
+
+    try:
+        with open(args.config, 'r', encoding='utf-8') as f:
+            car_config = json.load(f)
+    except FileNotFoundError:
+        print(f"❌ Configuration introuvable : {args.config}")
+        return 1
+
+    resultat = predire(car_config, cache=not args.sans_cache)
+    if resultat is None:
+        print("❌ Aucun modèle sauvegardé : lancer d'abord l'entraînement (python -m car_price_predictor train).")
+        return 1
+    afficher_prediction(car_config, resultat)
+
+    if args.stockage:
+        afficher_depuis_stockage(args.stockage, car_config, args.comparables or 10)
+    elif args.comparables:
+        if __package__:
+            from .comparables import IndexComparables, afficher_comparables
+        else:
+            from car_price_predictor.models.comparables import IndexComparables, afficher_comparables
+
+        index = IndexComparables.charger()
+        if index is None:
+            print("⚠️ Index des comparables introuvable : il est construit par l'entraînement, "
+                  "seulement si le dataset a une colonne 'url' (voir les avertissements de l'entraînement).")
+        else:
+            afficher_comparables(index, car_config, args.comparables)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,164 @@
+"""
+Rafraîchissement incrémental du modèle après un nouveau scraping.
+
+Au lieu de réentraîner les 1000 arbres sur tout dataset.csv, on recharge le
+dernier pipeline sauvegardé par model.py et on continue le boosting
+(xgb_model=) sur les nouvelles lignes plus un échantillon de rejeu des
+anciennes. Le modèle de quantiles, s'il existe, est prolongé de la même façon
+sur les mêmes lignes, pour que l'intervalle reste cohérent avec le prix ponctuel.
+Le pré-processeur et les médianes d'imputation restent ceux de l'entraînement
+complet.
+
+Garde-fou : si le RMSE de validation dérive de plus de SEUIL_DERIVE par rapport
+au RMSE de référence du dernier entraînement complet, on relance un
+entraînement complet.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor refresh [--source sqlite:///annonces.db] [--complet]
+"""
+import argparse
+import sys
+import time
+from datetime import datetime
+from math import sqrt
+
+import numpy as np
+import pandas as pd
+from sklearn.metrics import mean_squared_error
+
+from .model import (
+    DATASET_CSV, QUANTILES, appliquer_imputation, charger_dataset, charger_modele, charger_modele_quantiles,
+    empreintes_lignes, entrainer_complet, predire_lot, sauvegarder_modele
+)
+
+# Arbres ajoutés à chaque refresh : le coût est alors proportionnel au nombre de lignes du delta
+ARBRES_PAR_REFRESH = 100
+
+# Nombre de lignes anciennes rejouées par nouvelle ligne (limite l'oubli des anciens segments)
+RATIO_REJEU = 1.0
+
+# Part des nouvelles lignes réservée à la validation du garde-fou
+PART_VALIDATION = 0.2
+
+# Dérive relative du RMSE tolérée avant de forcer un entraînement complet
+SEUIL_DERIVE = 0.15
+
+
+def separer_delta(df, lignes_vues, seed=42):
+    """
+    Sépare le dataset en (entraînement du refresh, validation, nouvelles empreintes).
+    L'entraînement contient les nouvelles lignes et un rejeu d'anciennes lignes ;
+    la validation ne contient que des nouvelles lignes mises de côté : le booster
+    n'a vu aucune d'elles, comme le test de l'entraînement complet qui donne
+    rmse_reference.
+    """
+    empreintes = empreintes_lignes(df)
+    est_nouvelle = ~np.isin(empreintes, lignes_vues)
+    nouvelles = df[est_nouvelle].sample(frac=1.0, random_state=seed)
+    anciennes = df[~est_nouvelle].sample(frac=1.0, random_state=seed)
+
+    nb_val = max(1, int(len(nouvelles) * PART_VALIDATION))
+    nb_rejeu = min(len(anciennes), int(len(nouvelles) * RATIO_REJEU))
+
+    entrainement = pd.concat([nouvelles.iloc[nb_val:], anciennes.iloc[:nb_rejeu]])
+    validation = nouvelles.iloc[:nb_val]
+    return entrainement, validation, empreintes[est_nouvelle]
+
+
+def options_entrainement(meta):
+    """Mode d'encodage et intervalles du dernier entraînement complet, à reprendre pour le suivant."""
+    return {
+        'mode': meta['mode'],
+        'max_cat_to_onehot': meta['max_cat_to_onehot'],
+        'intervalles': bool(meta.get('quantiles')),
+    }
+
+
+def preparer(df, medianes):
+    """Sépare X/y et impute avec les médianes de l'entraînement complet."""
+    X = df.drop('prix_ttc_eur', axis=1)
+    appliquer_imputation(X, pd.Series(medianes))
+    return X, df['prix_ttc_eur']
+
+
+def rafraichir(df):
+    """
+    Continue le boosting du dernier modèle sur le delta du jour et retourne le pipeline.
+    Bascule sur un entraînement complet si aucun modèle n'existe ou si le garde-fou se déclenche.
+    """
+    sauvegarde = charger_modele()
+    if sauvegarde is None:
+        print("⚠️ Aucun modèle sauvegardé : entraînement complet.")
+        return entrainer_complet(df)[0]
+    model, meta, lignes_vues = sauvegarde
+    # Sans modèle de quantiles sauvegardé (entraîné avec --sans-intervalles), seul le prix ponctuel est prolongé
+    modele_quantiles = charger_modele_quantiles() if meta.get('quantiles') else None
+
+    entrainement, validation, nouvelles_empreintes = separer_delta(df, lignes_vues)
+    if len(nouvelles_empreintes) == 0:
+        print("✅ Aucune nouvelle annonce depuis le dernier entraînement, rien à faire.")
+        return model
+
+    print(f"🔄 Refresh sur {len(nouvelles_empreintes)} nouvelles lignes "
+          f"({len(entrainement)} lignes d'entraînement avec le rejeu, {len(validation)} de validation)")
+
+    X_refresh, y_refresh = preparer(entrainement, meta['medianes'])
+    X_val, y_val = preparer(validation, meta['medianes'])
+
+    preprocessor = model.named_steps['preprocessor']
+    regressor = model.named_steps['regressor']
+    booster = regressor.get_booster()
+
+    debut = time.perf_counter()
+    X_refresh_transforme = preprocessor.transform(X_refresh)
+    regressor.set_params(n_estimators=ARBRES_PAR_REFRESH)
+    regressor.fit(X_refresh_transforme, y_refresh, xgb_model=booster)
+    if modele_quantiles is not None:
+        modele_quantiles.set_params(n_estimators=ARBRES_PAR_REFRESH)
+        modele_quantiles.fit(X_refresh_transforme, y_refresh, xgb_model=modele_quantiles.get_booster())
+    duree = time.perf_counter() - debut
+
+    rmse = sqrt(mean_squared_error(y_val, model.predict(X_val)))
+    derive = rmse / meta['rmse_reference'] - 1
+    print(f"⏱️ {ARBRES_PAR_REFRESH} arbres ajoutés en {duree:.2f}s — RMSE validation {rmse:,.2f} € "
+          f"(référence {meta['rmse_reference']:,.2f} €, dérive {derive:+.1%})")
+    if modele_quantiles is not None:
+        bornes = predire_lot(model, X_val, modele_quantiles)
+        couverture = ((y_val >= bornes.iloc[:, 1]) & (y_val <= bornes.iloc[:, -1])).mean()
+        print(f"Couverture de l'intervalle {int(QUANTILES[0] * 100)}%-{int(QUANTILES[-1] * 100)}% "
+              f"sur la validation : {couverture:.1%}")
+
+    if derive > SEUIL_DERIVE:
+        print(f"🛑 Dérive supérieure à {SEUIL_DERIVE:.0%} : entraînement complet.")
+        return entrainer_complet(df, **options_entrainement(meta))[0]
+
+    sauvegarder_modele(model, {
+        **meta,
+        'date': datetime.now().isoformat(timespec='seconds'),
+        'nb_arbres': regressor.get_booster().num_boosted_rounds(),
+        'rmse_dernier': rmse,
+        'nb_refresh': meta['nb_refresh'] + 1,
+    }, np.concatenate([lignes_vues, nouvelles_empreintes]), modele_quantiles)
+    return model
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Rafraîchit le modèle sauvegardé avec les nouvelles annonces.")
+    parser.add_argument('--complet', action='store_true', help="Force un entraînement complet.")
+    parser.add_argument('--source', default=DATASET_CSV,
+                        help="dataset.csv (défaut) ou stockage à lire directement (sqlite:///annonces.db, mysql://base).")
+    args = parser.parse_args(argv)
+
+    df = charger_dataset(args.source)
+    if df is None:
+        sys.exit(1)
+
+    if args.complet:
+        sauvegarde = charger_modele()
+        entrainer_complet(df, **(options_entrainement(sauvegarde[1]) if sauvegarde else {}))
+    else:
+        rafraichir(df)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Modèles par segment (type de véhicule ou marque) entraînés en parallèle, avec routeur.
+
+Un seul XGBoost doit apprendre à la fois la décote d'une citadine et celle d'un
+SUV premium. Ce mode entraîne, sur le même split que model.py, un modèle par
+valeur de la colonne de segmentation (`--par type_vehicule` ou `--par marque`)
+et le modèle global. Les segments qui ont moins de `--min-lignes` lignes
+d'entraînement n'ont pas de modèle propre : le modèle global les prend en charge.
+
+Le modèle global est d'abord entraîné seul, avec tous les CPU : son temps est
+celui d'un entraînement classique. Les segments tournent ensuite dans un pool
+de processus, les plus gros d'abord. Chaque worker reçoit une part égale des
+CPU, imposée à XGBoost (n_jobs) et aux pools de threads natifs (threadpoolctl,
+installé avec scikit-learn) pour éviter la sursouscription.
+
+RouteurSegments envoie chaque ligne d'un lot au modèle de son segment : une
+seule prédiction vectorisée par segment présent dans le lot. Le routeur est
+sauvegardé dans artifacts/ et sert à prédire car_config.json (--predire).
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor.models.segments --par type_vehicule
+    python -m car_price_predictor.models.segments --par marque --min-lignes 500 --workers 4
+    python -m car_price_predictor.models.segments --par marque --predire
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from threadpoolctl import threadpool_limits
+
+from .. import metriques
+from .model import (
+    ARTIFACTS_DIR, CAR_CONFIG, DATASET_CSV, MAX_CAT_TO_ONEHOT, MODES, MODE_ONEHOT, charger_dataset,
+    construire_modele, predire_lot, preparer_config, preparer_entrainement
+)
+from .prediction import afficher_prediction
+
+# Colonnes de segmentation proposées
+SEGMENTATIONS = ['type_vehicule', 'marque']
+
+# En dessous de ce nombre de lignes d'entraînement, le segment est confié au modèle global
+MIN_LIGNES_SEGMENT = 200
+
+# Nom du modèle global dans les rapports
+GLOBAL = '(global)'
+
+# Plafond de threads natifs d'un worker du pool (gardé pour toute la durée du processus)
+_LIMITE_THREADS = None
+
+
+def chemin_routeur(colonne):
+    """Fichier du routeur sauvegardé pour une colonne de segmentation."""
+    return os.path.join(ARTIFACTS_DIR, f'segments_{colonne}.joblib')
+
+
+def cles_segment(X, colonne):
+    """Segment de chaque ligne : valeur de `colonne` en minuscules (convertit les seules modalités si 'category')."""
+    return X[colonne].astype(str).str.lower().str.strip().to_numpy()
+
+
+class RouteurSegments:
+    """
+    Prédit chaque ligne avec le modèle de son segment, ou avec le modèle global si
+    le segment n'a pas de modèle propre (segment rare ou inconnu à l'entraînement).
+    """
+
+    def __init__(self, colonne, modeles, modele_global):
+        self.colonne = colonne
+        self.modeles = modeles
+        self.modele_global = modele_global
+
+    def modele(self, segment):
+        return self.modeles.get(segment, self.modele_global)
+
+    def predire(self, X):
+        """Prix prédits (ndarray, dans l'ordre de X) : un predict par segment présent dans le lot."""
+        debut = time.perf_counter()
+        prix = np.empty(len(X))
+        cles = cles_segment(X, self.colonne)
+        # Lignes routées vers le global regroupées : un seul appel pour tous les segments sans modèle
+        cles = np.where(np.isin(cles, list(self.modeles)), cles, GLOBAL)
+        for segment, lignes in pd.Series(cles).groupby(cles).indices.items():
+            prix[lignes] = self.modele(segment).predict(X.iloc[lignes])
+        metriques.observer('modele_prediction_secondes', time.perf_counter() - debut,
+                           lot='unitaire' if len(X) == 1 else 'lot')
+        metriques.incrementer('modele_lignes_predites_total', len(X))
+        return prix
+
+
+def _limiter_threads(n_jobs):
+    """Initialisation d'un worker : plafonne les pools de threads natifs (OpenMP, BLAS) du processus."""
+    global _LIMITE_THREADS
+    _LIMITE_THREADS = threadpool_limits(limits=n_jobs)
+
+
+def _entrainer_segment(segment, X, y, mode, max_cat_to_onehot, params):
+    """Entraîne le pipeline d'un segment (exécuté dans un worker) : (segment, pipeline, durée)."""
+    debut = time.perf_counter()
+    pipeline = construire_modele(mode, max_cat_to_onehot, params=params)
+    pipeline.fit(X, y)
+    return segment, pipeline, time.perf_counter() - debut
+
+
+def entrainer_segments(X_train, y_train, colonne, mode=MODE_ONEHOT, max_cat_to_onehot=MAX_CAT_TO_ONEHOT,
+                       min_lignes=MIN_LIGNES_SEGMENT, workers=None, arbres=None):
+    """
+    Entraîne le modèle global seul, puis un modèle par segment d'au moins `min_lignes` lignes, en parallèle.
+    Retourne (routeur, durées d'entraînement par segment et du global, durée du pool des segments).
+    """
+    cles = cles_segment(X_train, colonne)
+    effectifs = pd.Series(cles).value_counts()
+    retenus = effectifs[effectifs >= min_lignes]
+    # Les plus gros entraînements d'abord : le dernier worker libéré n'attend pas un gros segment
+    taches = [(segment, np.flatnonzero(cles == segment)) for segment in retenus.index]
+    params_arbres = {'n_estimators': arbres} if arbres else {}
+
+    # Modèle global hors du pool, avec tous les threads : la référence d'un entraînement unique
+    _, modele_global, duree = _entrainer_segment(GLOBAL, X_train, y_train, mode, max_cat_to_onehot, params_arbres)
+    durees = {GLOBAL: duree}
+    metriques.observer('modele_entrainement_secondes', duree, modele=f'segment:{GLOBAL}')
+    print(f"  ✅ {GLOBAL} : {len(X_train):,} lignes, {duree:.1f}s")
+
+    nb_cpu = os.cpu_count() or 1
+    nb_workers = max(1, min(workers or nb_cpu, len(taches)))
+    n_jobs = max(1, nb_cpu // nb_workers)
+    params = {'n_jobs': n_jobs, **params_arbres}
+    print(f"🧩 {len(retenus)} segments '{colonne}' d'au moins {min_lignes} lignes : "
+          f"{nb_workers} workers x {n_jobs} threads")
+
+    debut = time.perf_counter()
+    modeles = {}
+    with ProcessPoolExecutor(max_workers=nb_workers, initializer=_limiter_threads, initargs=(n_jobs,)) as executor:
+        futures = [
+            executor.submit(_entrainer_segment, segment, X_train.iloc[lignes], y_train.iloc[lignes],
+                            mode, max_cat_to_onehot, params)
+            for segment, lignes in taches
+        ]
+        for future in futures:
+            segment, pipeline, duree = future.result()
+            # Le modèle sauvegardé prédit avec tous les threads disponibles
+            pipeline.named_steps['regressor'].set_params(n_jobs=None)
+            modeles[segment] = pipeline
+            durees[segment] = duree
+            metriques.observer('modele_entrainement_secondes', duree, modele=f'segment:{segment}')
+            print(f"  ✅ {segment} : {retenus[segment]:,} lignes, {duree:.1f}s")
+    total = time.perf_counter() - debut
+
+    return RouteurSegments(colonne, modeles, modele_global), durees, total
+
+
+def rapport_segments(routeur, X_test, y_test, durees, effectifs_train):
+    """RMSE par segment du modèle de segment et du modèle global, sur les mêmes lignes de test."""
+    y = y_test.to_numpy(dtype=np.float64)
+    pred_routeur = routeur.predire(X_test)
+    pred_global = routeur.modele_global.predict(X_test)
+    cles = cles_segment(X_test, routeur.colonne)
+
+    lignes = []
+    for segment in pd.unique(cles):
+        masque = cles == segment
+        lignes.append({
+            'segment': segment,
+            'modele': 'segment' if segment in routeur.modeles else 'global',
+            'lignes_train': int(effectifs_train.get(segment, 0)),
+            'lignes_test': int(masque.sum()),
+            'rmse_segment': float(np.sqrt(np.mean((pred_routeur[masque] - y[masque]) ** 2))),
+            'rmse_global': float(np.sqrt(np.mean((pred_global[masque] - y[masque]) ** 2))),
+            'duree_s': durees.get(segment),
+        })
+    par_segment = pd.DataFrame(lignes).sort_values('lignes_train', ascending=False)
+    rmse = float(np.sqrt(np.mean((pred_routeur - y) ** 2)))
+    rmse_global = float(np.sqrt(np.mean((pred_global - y) ** 2)))
+    return par_segment, rmse, rmse_global
+
+
+def afficher_rapport(par_segment, rmse, rmse_global, durees, total):
+    print(f"\n--- Modèles par segment ---")
+    print(f"{'segment':<22} {'modèle':>8} {'train':>8} {'test':>7} {'RMSE seg.':>10} {'RMSE glob.':>11} {'temps (s)':>10}")
+    for r in par_segment.itertuples():
+        duree = f"{r.duree_s:>10.1f}" if r.modele == 'segment' else f"{'-':>10}"
+        print(f"{r.segment[:22]:<22} {r.modele:>8} {r.lignes_train:>8,} {r.lignes_test:>7,} "
+              f"{r.rmse_segment:>10,.0f} {r.rmse_global:>11,.0f} {duree}")
+    print(f"RMSE global : routeur {rmse:,.2f} € / modèle unique {rmse_global:,.2f} €")
+    print(f"Temps : modèle unique {durees[GLOBAL]:.1f}s, somme des entraînements des segments "
+          f"{sum(d for s, d in durees.items() if s != GLOBAL):.1f}s, pool des segments {total:.1f}s")
+    print(f"--------------------------")
+
+
+def predire_config(routeur, colonnes, medianes, chemin=CAR_CONFIG):
+    """Prédit car_config.json avec le modèle de son segment (et affiche le prix du modèle global)."""
+    try:
+        with open(chemin, 'r', encoding='utf-8') as f:
+            car_config = json.load(f)
+    except FileNotFoundError:
+        print("\n⚠️ Fichier car_config.json manquant ou mal situé. Impossible d'effectuer la prédiction finale.")
+        return None
+
+    car_df = preparer_config(car_config, colonnes, medianes)
+    segment = cles_segment(car_df, routeur.colonne)[0]
+    prix = int(routeur.predire(car_df)[0])
+    afficher_prediction(car_config, {'prix': prix, 'intervalle': None})
+    modele = 'segment' if segment in routeur.modeles else 'global (segment sans modèle)'
+    print(f"Modèle utilisé : {modele} '{segment}' ; modèle global seul : "
+          f"{int(predire_lot(routeur.modele_global, car_df)['prix'].iloc[0]):,}€")
+    return prix
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Un modèle par segment (type de véhicule ou marque), avec routeur.")
+    parser.add_argument('--par', choices=SEGMENTATIONS, default='type_vehicule', help="Colonne de segmentation.")
+    parser.add_argument('--min-lignes', type=int, default=MIN_LIGNES_SEGMENT,
+                        help=f"Lignes d'entraînement minimales pour un modèle propre (défaut: {MIN_LIGNES_SEGMENT}).")
+    parser.add_argument('--workers', type=int, default=None, help="Taille du pool (défaut: nombre de CPU).")
+    parser.add_argument('--mode', choices=MODES, default=MODE_ONEHOT)
+    parser.add_argument('--max-cat-to-onehot', type=int, default=MAX_CAT_TO_ONEHOT)
+    parser.add_argument('--arbres', type=int, default=None, help="Nombre d'arbres par modèle (défaut: celui de model.py).")
+    parser.add_argument('--source', default=DATASET_CSV,
+                        help="dataset.csv (défaut) ou stockage à lire directement : sqlite:///chemin.db, mysql://base.")
+    parser.add_argument('--predire', action='store_true',
+                        help="Prédit car_config.json avec le routeur sauvegardé au lieu d'entraîner.")
+    args = parser.parse_args(argv)
+
+    if args.predire:
+        if not os.path.exists(chemin_routeur(args.par)):
+            print(f"❌ Aucun routeur '{args.par}' sauvegardé : lancez d'abord l'entraînement par segment.")
+            return 1
+        sauvegarde = joblib.load(chemin_routeur(args.par))
+        predire_config(sauvegarde['routeur'], sauvegarde['colonnes'], pd.Series(sauvegarde['medianes']))
+        return 0
+
+    df = charger_dataset(args.source)
+    if df is None:
+        return 1
+    X_train, X_test, y_train, y_test, medianes = preparer_entrainement(df)
+    del df
+
+    routeur, durees, total = entrainer_segments(X_train, y_train, args.par, args.mode, args.max_cat_to_onehot,
+                                                args.min_lignes, args.workers, args.arbres)
+    effectifs_train = pd.Series(cles_segment(X_train, args.par)).value_counts()
+    par_segment, rmse, rmse_global = rapport_segments(routeur, X_test, y_test, durees, effectifs_train)
+    afficher_rapport(par_segment, rmse, rmse_global, durees, total)
+
+    os.makedirs(ARTIFACTS_DIR, exist_ok=True)
+    joblib.dump({'routeur': routeur, 'colonnes': list(X_train.columns), 'medianes': medianes.to_dict()},
+                chemin_routeur(args.par))
+    print(f"💾 Routeur sauvegardé dans {chemin_routeur(args.par)}")
+    predire_config(routeur, X_train.columns, medianes)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
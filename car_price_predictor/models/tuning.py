@@ -0,0 +1,233 @@
+"""
+Recherche d'hyperparamètres XGBoost par successive halving.
+
+Les configurations sont tirées aléatoirement dans ESPACE_RECHERCHE puis évaluées
+par paliers de budget (nombre d'arbres) croissant : à chaque palier, seul le
+meilleur tiers est promu. Chaque essai s'arrête tôt sur un jeu de validation.
+
+Les essais tournent dans un pool de processus dimensionné sur le nombre de CPU,
+et chaque essai reçoit une part égale des threads. Tous les résultats sont
+ajoutés dans tuning/resultats.jsonl : une relance réutilise les essais déjà
+calculés au lieu de tout recommencer.
+
+Usage (depuis la racine du dépôt) :
+    python -m car_price_predictor.models.tuning --essais 27
+"""
+import argparse
+import hashlib
+import json
+import math
+import os
+import random
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from sklearn.model_selection import train_test_split
+
+from .model import (
+    BEST_PARAMS_JSON, DATASET_CSV, MODELS_DIR, MODES, MODE_ONEHOT, MAX_CAT_TO_ONEHOT, PARAMS_XGB,
+    charger_dataset, construire_modele, empreinte_source, separer_et_imputer
+)
+
+TUNING_DIR = os.path.join(MODELS_DIR, 'tuning')
+RESULTATS_JSONL = os.path.join(TUNING_DIR, 'resultats.jsonl')
+
+# Espace de recherche : (type de tirage, borne basse, borne haute)
+ESPACE_RECHERCHE = {
+    'learning_rate': ('log', 0.01, 0.3),
+    'max_depth': ('int', 3, 10),
+    'min_child_weight': ('log', 1.0, 20.0),
+    'subsample': ('uniform', 0.5, 1.0),
+    'colsample_bytree': ('uniform', 0.4, 1.0),
+    'reg_lambda': ('log', 0.1, 10.0),
+    'gamma': ('uniform', 0.0, 5.0),
+}
+
+# Budget maximal (en arbres) du dernier palier, et facteur de réduction entre paliers
+BUDGET_MAX = 2000
+ETA = 3
+EARLY_STOPPING_ROUNDS = 50
+
+
+def tirer_configuration(rng):
+    """Tire une configuration aléatoire dans ESPACE_RECHERCHE."""
+    config = {}
+    for nom, (loi, bas, haut) in ESPACE_RECHERCHE.items():
+        if loi == 'int':
+            config[nom] = rng.randint(bas, haut)
+        elif loi == 'log':
+            config[nom] = round(math.exp(rng.uniform(math.log(bas), math.log(haut))), 6)
+        else:
+            config[nom] = round(rng.uniform(bas, haut), 6)
+    return config
+
+
+def cle_essai(params, budget, contexte):
+    """Clé stable d'un essai : configuration + budget + données/mode utilisés."""
+    brut = json.dumps({'params': params, 'budget': budget, **contexte}, sort_keys=True)
+    return hashlib.sha1(brut.encode('utf-8')).hexdigest()
+
+
+def charger_resultats(chemin=RESULTATS_JSONL):
+    """Relit les essais déjà calculés, indexés par clé."""
+    resultats = {}
+    if os.path.exists(chemin):
+        with open(chemin, 'r', encoding='utf-8') as f:
+            for ligne in f:
+                if ligne.strip():
+                    essai = json.loads(ligne)
+                    resultats[essai['cle']] = essai
+    return resultats
+
+
+def enregistrer_resultat(essai, chemin=RESULTATS_JSONL):
+    """Ajoute un essai au store (une ligne JSON, écrite dès la fin de l'essai)."""
+    os.makedirs(os.path.dirname(chemin), exist_ok=True)
+    with open(chemin, 'a', encoding='utf-8') as f:
+        f.write(json.dumps(essai, ensure_ascii=False) + '\n')
+
+
+def _evaluer_essai(params, budget, n_jobs, mode, max_cat_to_onehot, donnees):
+    """Entraîne un XGBoost avec early stopping sur la validation (exécuté dans un worker)."""
+    X_fit, y_fit, X_val, y_val = donnees
+    regressor = construire_modele(mode, max_cat_to_onehot, params={
+        **params,
+        'n_estimators': budget,
+        'early_stopping_rounds': EARLY_STOPPING_ROUNDS,
+        'n_jobs': n_jobs,
+    }).named_steps['regressor']
+
+    debut = time.perf_counter()
+    regressor.fit(X_fit, y_fit, eval_set=[(X_val, y_val)], verbose=False)
+    return {
+        'rmse_validation': float(regressor.best_score),
+        'meilleure_iteration': int(regressor.best_iteration),
+        'duree_s': time.perf_counter() - debut,
+    }
+
+
+def preparer_donnees(df, mode, max_cat_to_onehot):
+    """
+    Découpe le training set en fit/validation et applique le pré-processeur une
+    seule fois : les workers reçoivent directement les matrices transformées.
+    """
+    X_train, _, y_train, _ = separer_et_imputer(df)
+    X_fit, X_val, y_fit, y_val = train_test_split(X_train, y_train, test_size=0.2, random_state=42)
+
+    preprocessor = construire_modele(mode, max_cat_to_onehot).named_steps['preprocessor']
+    X_fit = preprocessor.fit_transform(X_fit)
+    X_val = preprocessor.transform(X_val)
+    return X_fit, y_fit.to_numpy(), X_val, y_val.to_numpy()
+
+
+def successive_halving(donnees, n_essais, contexte, mode, max_cat_to_onehot, seed=42, workers=None):
+    """
+    Lance la recherche et retourne le meilleur essai du dernier palier atteint.
+    Les essais présents dans le store ne sont pas recalculés.
+    """
+    rng = random.Random(seed)
+    candidats = [tirer_configuration(rng) for _ in range(n_essais)]
+    deja_calcules = charger_resultats()
+
+    nb_paliers = max(1, int(math.log(n_essais, ETA)) + 1)
+    nb_cpu = os.cpu_count() or 1
+
+    for palier in range(nb_paliers):
+        budget = max(EARLY_STOPPING_ROUNDS, int(BUDGET_MAX / ETA ** (nb_paliers - 1 - palier)))
+        nb_workers = min(workers or nb_cpu, len(candidats))
+        # Chaque essai reçoit une part égale des CPU pour éviter la sursouscription
+        n_jobs = max(1, nb_cpu // nb_workers)
+        print(f"\n🎯 Palier {palier + 1}/{nb_paliers}: {len(candidats)} configurations, "
+              f"budget {budget} arbres, {nb_workers} workers x {n_jobs} threads")
+
+        essais = []
+        a_calculer = {}
+        for params in candidats:
+            cle = cle_essai(params, budget, contexte)
+            if cle in deja_calcules:
+                essais.append(deja_calcules[cle])
+            else:
+                a_calculer[cle] = params
+        if essais:
+            print(f"♻️ {len(essais)} essais repris depuis {RESULTATS_JSONL}")
+
+        if a_calculer:
+            with ProcessPoolExecutor(max_workers=nb_workers) as executor:
+                futures = {
+                    executor.submit(_evaluer_essai, params, budget, n_jobs, mode, max_cat_to_onehot, donnees): cle
+                    for cle, params in a_calculer.items()
+                }
+                for future in as_completed(futures):
+                    cle = futures[future]
+                    essai = {
+                        'cle': cle,
+                        'palier': palier,
+                        'budget': budget,
+                        'params': a_calculer[cle],
+                        **contexte,
+                        **future.result(),
+                    }
+                    enregistrer_resultat(essai)
+                    deja_calcules[cle] = essai
+                    essais.append(essai)
+                    print(f"  ✅ RMSE validation {essai['rmse_validation']:,.2f} € "
+                          f"({essai['meilleure_iteration'] + 1} arbres, {essai['duree_s']:.1f}s)")
+
+        essais.sort(key=lambda e: e['rmse_validation'])
+        if palier == nb_paliers - 1:
+            return essais[0]
+        candidats = [e['params'] for e in essais[:max(1, len(essais) // ETA)]]
+
+
+def emettre_meilleure_config(essai, chemin=BEST_PARAMS_JSON):
+    """Écrit la meilleure configuration, lue par model.py comme paramètres par défaut."""
+    params = {
+        **essai['params'],
+        # Le nombre d'arbres retenu est celui trouvé par l'early stopping
+        'n_estimators': essai['meilleure_iteration'] + 1,
+        'random_state': PARAMS_XGB['random_state'],
+    }
+    with open(chemin, 'w', encoding='utf-8') as f:
+        json.dump({
+            'params': params,
+            'rmse_validation': essai['rmse_validation'],
+            'mode': essai['mode'],
+            'dataset': essai['dataset'],
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\n💾 Meilleure configuration écrite dans {chemin}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Recherche d'hyperparamètres XGBoost (successive halving).")
+    parser.add_argument('--essais', type=int, default=27, help="Nombre de configurations tirées au premier palier.")
+    parser.add_argument('--seed', type=int, default=42, help="Graine du tirage (même graine = reprise possible).")
+    parser.add_argument('--workers', type=int, default=None, help="Taille du pool (défaut: nombre de CPU).")
+    parser.add_argument('--mode', choices=MODES, default=MODE_ONEHOT)
+    parser.add_argument('--max-cat-to-onehot', type=int, default=MAX_CAT_TO_ONEHOT)
+    parser.add_argument('--source', default=DATASET_CSV,
+                        help="dataset.csv (défaut) ou stockage à lire directement : sqlite:///chemin.db, mysql://base.")
+    args = parser.parse_args(argv)
+
+    df = charger_dataset(args.source)
+    if df is None:
+        sys.exit(1)
+
+    contexte = {
+        'dataset': empreinte_source(df, args.source),
+        'mode': args.mode,
+        'max_cat_to_onehot': args.max_cat_to_onehot,
+    }
+    donnees = preparer_donnees(df, args.mode, args.max_cat_to_onehot)
+
+    meilleur = successive_halving(donnees, args.essais, contexte, args.mode, args.max_cat_to_onehot,
+                                  seed=args.seed, workers=args.workers)
+
+    print(f"\n🏆 Meilleure configuration: RMSE validation {meilleur['rmse_validation']:,.2f} €")
+    for nom, valeur in meilleur['params'].items():
+        print(f"  {nom}: {valeur}")
+    emettre_meilleure_config(meilleur)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+Cache des sorties d'étapes, adressé par le contenu.
+
+La clé d'une étape est l'empreinte de :
+  - ses entrées (contenu des fichiers, ou de tous les fichiers d'un dossier),
+  - son code (le module de la fonction et les fichiers déclarés dans Etape.code),
+  - ses paramètres.
+Si une entrée de cache existe pour cette clé, les sorties sauvegardées sont
+restaurées et l'étape n'est pas exécutée.
+
+Une base de données ('sqlite:///chemin.db', 'mysql://base') n'est jamais
+copiée ni restaurée : d'autres écrivains (EcritureBddPipeline pendant un crawl)
+peuvent l'avoir modifiée entre deux exécutions. Son filigrane (nombre de
+véhicules, dernier num_chargement) est noté à l'enregistrement ; l'entrée n'est
+valide que si la base a toujours ce filigrane.
+
+Seuls les chemins déclarés dans Etape.sorties sont restaurés : une étape qui écrit
+dans un dossier partagé avec d'autres outils déclare ses fichiers un par un.
+L'empreinte de chaque sortie laissée par le pipeline (exécution ou restauration)
+est notée dans ETAT ; une sortie modifiée depuis par un autre outil (refresh.py
+prolonge pipeline.joblib) est conservée plutôt qu'écrasée par une version en cache.
+
+Les entrées les moins récemment utilisées sont supprimées dès que la taille
+totale du cache dépasse la limite.
+"""
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+CACHE_DIR = os.path.join(BASE_DIR, '.cache', 'pipeline')
+TAILLE_MAX_MO = 2048
+
+MANIFESTE = 'manifest.json'
+ETAT = 'etat.json'
+
+
+def est_pseudo_ressource(chemin):
+    return '://' in chemin
+
+
+def est_base(chemin):
+    return chemin.startswith(('sqlite:///', 'mysql://'))
+
+
+def filigrane_base(url):
+    """Filigrane actuel de la base `url` (Stockage.filigrane), None si elle est absente ou illisible."""
+    from ..database.database import ouvrir_base
+
+    # Une base SQLite absente ne doit pas être créée (vide) par la simple vérification
+    if url.startswith('sqlite:///') and not os.path.exists(url[len('sqlite:///'):]):
+        return None
+    try:
+        stockage = ouvrir_base(url)
+    except Exception:
+        return None
+    try:
+        return stockage.filigrane()
+    except Exception:
+        return None
+    finally:
+        stockage.fermer()
+
+
+def empreinte_chemin(chemin):
+    """Empreinte du contenu d'un fichier ou d'un dossier (récursif), 'absent' s'il n'existe pas."""
+    if est_pseudo_ressource(chemin):
+        return chemin
+    if not os.path.exists(chemin):
+        return 'absent'
+
+    h = hashlib.sha256()
+    if os.path.isfile(chemin):
+        fichiers = [(os.path.basename(chemin), chemin)]
+    else:
+        fichiers = sorted(
+            (os.path.relpath(os.path.join(racine, nom), chemin), os.path.join(racine, nom))
+            for racine, _, noms in os.walk(chemin) for nom in noms
+        )
+    for relatif, complet in fichiers:
+        h.update(relatif.encode('utf-8'))
+        with open(complet, 'rb') as f:
+            for bloc in iter(lambda: f.read(1 << 20), b''):
+                h.update(bloc)
+    return h.hexdigest()
+
+
+def _taille(chemin):
+    if os.path.isfile(chemin):
+        return os.path.getsize(chemin)
+    return sum(os.path.getsize(os.path.join(r, n)) for r, _, noms in os.walk(chemin) for n in noms)
+
+
+def _copier(source, destination):
+    if os.path.isdir(destination):
+        shutil.rmtree(destination)
+    os.makedirs(os.path.dirname(os.path.abspath(destination)), exist_ok=True)
+    if os.path.isdir(source):
+        shutil.copytree(source, destination)
+    else:
+        shutil.copy2(source, destination)
+
+
+class CacheEtapes:
+    """Stockage local des sorties d'étapes avec éviction LRU par taille."""
+
+    def __init__(self, dossier=CACHE_DIR, taille_max_mo=TAILLE_MAX_MO):
+        self.dossier = dossier
+        self.taille_max = taille_max_mo * 1024 * 1024
+        self.verrou = threading.Lock()
+
+    def cle(self, etape):
+        """Clé de l'étape : entrées, code et paramètres."""
+        code = [inspect.getsourcefile(etape.fonction)] + list(etape.code)
+        brut = json.dumps({
+            'etape': etape.nom,
+            'entrees': {e: empreinte_chemin(e) for e in etape.entrees},
+            'code': {os.path.basename(c): empreinte_chemin(c) for c in code},
+            'params': etape.params,
+        }, sort_keys=True, default=str)
+        return hashlib.sha256(brut.encode('utf-8')).hexdigest()
+
+    def _entree(self, etape, cle):
+        return os.path.join(self.dossier, etape.nom, cle)
+
+    def _lire_etat(self):
+        chemin = os.path.join(self.dossier, ETAT)
+        if not os.path.exists(chemin):
+            return {}
+        with open(chemin, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def _noter_etat(self, sorties):
+        """Note l'empreinte des sorties telles que le pipeline les laisse sur le disque."""
+        with self.verrou:
+            etat = self._lire_etat()
+            etat.update({s['chemin']: empreinte_chemin(s['chemin']) for s in sorties if not est_base(s['chemin'])})
+            os.makedirs(self.dossier, exist_ok=True)
+            temporaire = os.path.join(self.dossier, f"{ETAT}.tmp-{threading.get_ident()}")
+            with open(temporaire, 'w', encoding='utf-8') as f:
+                json.dump(etat, f, indent=2)
+            os.replace(temporaire, os.path.join(self.dossier, ETAT))
+
+    def restaurer(self, etape, cle):
+        """
+        Restaure les sorties en cache de l'étape. Retourne False si la clé est inconnue
+        ou si une base produite par l'étape a changé depuis (rien n'est alors restauré).
+        """
+        entree = self._entree(etape, cle)
+        manifeste = os.path.join(entree, MANIFESTE)
+        if not os.path.exists(manifeste):
+            return False
+
+        with open(manifeste, 'r', encoding='utf-8') as f:
+            sorties = json.load(f)['sorties']
+        for sortie in sorties:
+            if est_base(sortie['chemin']):
+                filigrane = sortie.get('filigrane')
+                if filigrane is None or filigrane_base(sortie['chemin']) != filigrane:
+                    print(f"🗄️ Base {sortie['chemin']} modifiée depuis la mise en cache : étape réexécutée")
+                    return False
+
+        # Sorties réécrites par un autre outil depuis le dernier passage du pipeline : conservées
+        etat = self._lire_etat()
+        modifiees = [s['chemin'] for s in sorties if not est_pseudo_ressource(s['chemin'])
+                     and s['chemin'] in etat and os.path.exists(s['chemin'])
+                     and empreinte_chemin(s['chemin']) != etat[s['chemin']]]
+        if modifiees:
+            print(f"⚠️ Étape '{etape.nom}' : {', '.join(os.path.basename(c) for c in modifiees)} modifié(s) "
+                  f"hors du pipeline, conservé(s) (--force {etape.nom} pour réexécuter l'étape)")
+            os.utime(manifeste)
+            return True
+
+        for i, sortie in enumerate(sorties):
+            if sortie['empreinte'] is None:
+                # Sortie absente à l'enregistrement : un fichier laissé par une exécution précédente
+                # de l'étape serait incohérent avec les autres sorties restaurées
+                if not est_pseudo_ressource(sortie['chemin']) and os.path.isfile(sortie['chemin']):
+                    os.remove(sortie['chemin'])
+                continue
+            # Sortie déjà à jour sur le disque : rien à copier
+            if empreinte_chemin(sortie['chemin']) != sortie['empreinte']:
+                _copier(os.path.join(entree, str(i)), sortie['chemin'])
+        self._noter_etat(sorties)
+
+        # Marque l'entrée comme récemment utilisée pour l'éviction
+        os.utime(manifeste)
+        return True
+
+    def enregistrer(self, etape, cle):
+        """Copie les sorties de l'étape dans le cache puis applique l'éviction."""
+        entree = self._entree(etape, cle)
+        temporaire = f"{entree}.tmp-{threading.get_ident()}"
+        shutil.rmtree(temporaire, ignore_errors=True)
+        os.makedirs(temporaire)
+
+        sorties = []
+        for i, chemin in enumerate(etape.sorties):
+            if est_base(chemin):
+                sorties.append({'chemin': chemin, 'empreinte': None, 'filigrane': filigrane_base(chemin)})
+                continue
+            if est_pseudo_ressource(chemin) or not os.path.exists(chemin):
+                sorties.append({'chemin': chemin, 'empreinte': None})
+                continue
+            _copier(chemin, os.path.join(temporaire, str(i)))
+            sorties.append({'chemin': chemin, 'empreinte': empreinte_chemin(chemin)})
+
+        with open(os.path.join(temporaire, MANIFESTE), 'w', encoding='utf-8') as f:
+            json.dump({'etape': etape.nom, 'date': time.time(), 'sorties': sorties}, f, indent=2)
+
+        # Publication atomique de l'entrée complète
+        shutil.rmtree(entree, ignore_errors=True)
+        os.replace(temporaire, entree)
+        self._noter_etat(sorties)
+        self.evincer()
+
+    def evincer(self):
+        """Supprime les entrées les moins récemment utilisées tant que le cache dépasse sa taille maximale."""
+        with self.verrou:
+            entrees = []
+            for etape in os.listdir(self.dossier) if os.path.isdir(self.dossier) else []:
+                if not os.path.isdir(os.path.join(self.dossier, etape)):
+                    continue  # ETAT
+                for cle in os.listdir(os.path.join(self.dossier, etape)):
+                    if '.tmp-' in cle:
+                        continue  # entrée en cours d'écriture
+                    chemin = os.path.join(self.dossier, etape, cle)
+                    manifeste = os.path.join(chemin, MANIFESTE)
+                    if os.path.exists(manifeste):
+                        entrees.append((os.path.getmtime(manifeste), _taille(chemin), chemin))
+
+            total = sum(taille for _, taille, _ in entrees)
+            for _, taille, chemin in sorted(entrees):
+                if total <= self.taille_max:
+                    break
+                shutil.rmtree(chemin, ignore_errors=True)
+                total -= taille
+                print(f"🧹 Cache: entrée évincée {os.path.relpath(chemin, self.dossier)} ({taille / 1e6:.1f} Mo)")
@@ -0,0 +1,243 @@
+"""
+Petit orchestrateur de pipeline en DAG, exécuté dans le processus courant.
+
+Chaque étape déclare les ressources qu'elle lit (entrees) et celles qu'elle
+produit (sorties) : fichiers, dossiers ou pseudo-ressources comme
+'mysql://base'. Une étape dépend de toutes celles qui produisent l'une de ses
+entrées. Les étapes dont les dépendances sont satisfaites tournent en parallèle
+dans des threads nommés d'après l'étape, et leurs sorties console sont
+préfixées par ce nom et affichées au fil de l'eau.
+
+Avec un CacheEtapes, une étape dont la clé (entrées, code, paramètres) est
+inchangée n'est pas exécutée : ses sorties sont restaurées depuis le cache.
+
+Pour chaque étape on mesure le temps réel et le pic de mémoire résidente
+observé pendant son exécution. La RSS est celle du processus : quand deux
+étapes tournent en même temps, leurs pics se recouvrent.
+
+Avec un dossier de profils, chaque étape exécutée est profilée dans son
+thread (voir profilage.py).
+"""
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import traceback
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Callable
+
+from ..profilage import profiler
+
+# Période d'échantillonnage de la mémoire résidente
+PERIODE_ECHANTILLONNAGE_S = 0.05
+
+OK = 'ok'
+EN_CACHE = 'cache'
+ECHEC = 'echec'
+IGNOREE = 'ignoree'
+SUCCES = (OK, EN_CACHE)
+
+
+@dataclass
+class Etape:
+    """Une étape du pipeline : une fonction importable et ses entrées/sorties déclarées."""
+    nom: str
+    fonction: Callable[..., None]
+    entrees: list = field(default_factory=list)
+    sorties: list = field(default_factory=list)
+    params: dict = field(default_factory=dict)
+    # Fichiers source dont dépend l'étape (en plus du module de sa fonction), pour la clé de cache
+    code: list = field(default_factory=list)
+
+
+@dataclass
+class Resultat:
+    nom: str
+    statut: str
+    duree_s: float = 0.0
+    rss_debut_mo: float = 0.0
+    rss_pic_mo: float = 0.0
+    erreur: str = None
+
+
+def rss_courant_mo():
+    """Mémoire résidente actuelle du processus, en Mo."""
+    try:
+        # Linux : deuxième champ de statm = pages résidentes
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+    except (OSError, ValueError):
+        # Ailleurs (macOS) : on se rabat sur le pic depuis le démarrage, en octets
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1024 * 1024)
+
+
+class _SortiePrefixee:
+    """Remplace sys.stdout/stderr : préfixe chaque ligne par le nom du thread de l'étape."""
+
+    def __init__(self, flux, noms_etapes):
+        self.flux = flux
+        self.noms_etapes = noms_etapes
+        self.verrou = threading.Lock()
+        self.debut_de_ligne = {}
+
+    def write(self, texte):
+        nom = threading.current_thread().name
+        if nom not in self.noms_etapes:
+            return self.flux.write(texte)
+        with self.verrou:
+            for morceau in texte.splitlines(keepends=True):
+                if self.debut_de_ligne.get(nom, True):
+                    self.flux.write(f"[{nom}] ")
+                self.flux.write(morceau)
+                self.debut_de_ligne[nom] = morceau.endswith('\n')
+            self.flux.flush()
+        return len(texte)
+
+    def flush(self):
+        self.flux.flush()
+
+    def __getattr__(self, nom):
+        return getattr(self.flux, nom)
+
+
+class DAG:
+    """Ensemble d'étapes dont l'ordre d'exécution est déduit des entrées/sorties."""
+
+    def __init__(self, etapes):
+        self.etapes = {e.nom: e for e in etapes}
+        producteurs = {sortie: e.nom for e in etapes for sortie in e.sorties}
+        self.dependances = {
+            e.nom: {producteurs[entree] for entree in e.entrees if entree in producteurs} - {e.nom}
+            for e in etapes
+        }
+        # Ordre topologique : une étape n'y est examinée qu'après toutes ses dépendances
+        self.ordre = self._verifier_acyclique()
+
+    def _verifier_acyclique(self):
+        """Retourne les noms d'étapes en ordre topologique ; ValueError en cas de cycle."""
+        restantes = dict(self.dependances)
+        ordre = []
+        while restantes:
+            pretes = [nom for nom, deps in restantes.items() if not deps & restantes.keys()]
+            if not pretes:
+                raise ValueError(f"Cycle détecté entre les étapes: {', '.join(restantes)}")
+            for nom in pretes:
+                del restantes[nom]
+            ordre.extend(pretes)
+        return ordre
+
+    def executer(self, max_paralleles=None, cache=None, forcer=(), profil_dossier=None):
+        """
+        Exécute toutes les étapes en respectant les dépendances. Une étape dont
+        une dépendance a échoué est ignorée. Les étapes de `forcer` sont
+        exécutées même si le cache les connaît. Avec `profil_dossier`, chaque
+        étape exécutée y écrit ses fichiers de profil. Retourne la liste des Resultat.
+        """
+        inconnues = set(forcer) - self.etapes.keys()
+        if inconnues:
+            raise ValueError(f"Étape(s) inconnue(s): {', '.join(sorted(inconnues))}")
+
+        max_paralleles = max_paralleles or len(self.etapes)
+        resultats = {}
+        en_cours = {}
+        termines = []
+        condition = threading.Condition()
+
+        pics = {}
+        arret_echantillonnage = threading.Event()
+
+        def echantillonner():
+            while not arret_echantillonnage.wait(PERIODE_ECHANTILLONNAGE_S):
+                rss = rss_courant_mo()
+                with condition:
+                    for nom in en_cours:
+                        pics[nom] = max(pics.get(nom, 0.0), rss)
+
+        def lancer(etape):
+            rss_debut = rss_courant_mo()
+            pics[etape.nom] = rss_debut
+            debut = time.perf_counter()
+            try:
+                cle = cache.cle(etape) if cache else None
+                if cle and etape.nom not in forcer and cache.restaurer(etape, cle):
+                    print(f"♻️ Entrées, code et paramètres inchangés : sorties restaurées depuis le cache")
+                    resultat = Resultat(etape.nom, EN_CACHE)
+                else:
+                    with profiler(etape.nom, profil_dossier) if profil_dossier else nullcontext():
+                        etape.fonction(**etape.params)
+                    if cache:
+                        cache.enregistrer(etape, cle)
+                    resultat = Resultat(etape.nom, OK)
+            except Exception as e:
+                traceback.print_exc()
+                resultat = Resultat(etape.nom, ECHEC, erreur=f"{type(e).__name__}: {e}")
+            resultat.duree_s = time.perf_counter() - debut
+            resultat.rss_debut_mo = rss_debut
+            with condition:
+                resultat.rss_pic_mo = max(pics[etape.nom], rss_courant_mo())
+                termines.append(resultat)
+                condition.notify()
+
+        sortie_originale, erreur_originale = sys.stdout, sys.stderr
+        sys.stdout = _SortiePrefixee(sortie_originale, self.etapes.keys())
+        sys.stderr = _SortiePrefixee(erreur_originale, self.etapes.keys())
+        echantillonneur = threading.Thread(target=echantillonner, daemon=True)
+        echantillonneur.start()
+        try:
+            with condition:
+                while len(resultats) < len(self.etapes):
+                    # En ordre topologique, un échec se propage à toute sa descendance en un seul passage
+                    for nom in self.ordre:
+                        etape = self.etapes[nom]
+                        if nom in resultats or nom in en_cours:
+                            continue
+                        statuts = [resultats.get(dep) for dep in self.dependances[nom]]
+                        if any(s is not None and s.statut not in SUCCES for s in statuts):
+                            resultats[nom] = Resultat(nom, IGNOREE, erreur="dépendance en échec")
+                            print(f"⏭️ Étape '{nom}' ignorée (dépendance en échec)")
+                        elif all(s is not None for s in statuts) and len(en_cours) < max_paralleles:
+                            print(f"▶️ Démarrage de l'étape '{nom}'")
+                            en_cours[nom] = threading.Thread(target=lancer, args=(etape,), name=nom)
+                            en_cours[nom].start()
+
+                    if len(resultats) == len(self.etapes):
+                        break
+                    if not en_cours:
+                        # Rien ne tourne et rien n'a pu démarrer : attendre ne se terminerait jamais
+                        bloquees = ', '.join(nom for nom in self.ordre if nom not in resultats)
+                        raise RuntimeError(f"Étape(s) bloquée(s) sans étape en cours: {bloquees}")
+                    condition.wait_for(lambda: termines)
+                    for resultat in termines:
+                        en_cours.pop(resultat.nom).join()
+                        resultats[resultat.nom] = resultat
+                        symbole = {OK: '✅', EN_CACHE: '♻️'}.get(resultat.statut, '❌')
+                        print(f"{symbole} Étape '{resultat.nom}' terminée en {resultat.duree_s:.1f}s")
+                    termines.clear()
+        finally:
+            arret_echantillonnage.set()
+            sys.stdout, sys.stderr = sortie_originale, erreur_originale
+
+        return [resultats[nom] for nom in self.etapes]
+
+
+def afficher_resume(resultats):
+    print(f"\n--- Résumé du pipeline ---")
+    print(f"{'étape':<14} {'statut':<8} {'durée (s)':>10} {'RSS début (Mo)':>15} {'RSS pic (Mo)':>13}")
+    for r in resultats:
+        print(f"{r.nom:<14} {r.statut:<8} {r.duree_s:>10.2f} {r.rss_debut_mo:>15.1f} {r.rss_pic_mo:>13.1f}")
+        if r.erreur:
+            print(f"  ↳ {r.erreur}")
+    print(f"--------------------------")
+
+
+def enregistrer_execution(resultats, chemin):
+    """Ajoute les mesures de l'exécution (une ligne JSON) à l'historique des exécutions."""
+    with open(chemin, 'a', encoding='utf-8') as f:
+        f.write(json.dumps({
+            'date': datetime.now().isoformat(timespec='seconds'),
+            'etapes': [r.__dict__ for r in resultats],
+        }, ensure_ascii=False) + '\n')
@@ -0,0 +1,74 @@
+"""
+Étapes du pipeline de données et leur déclaration en DAG.
+
+La conversion JSON -> CSV et le chargement MySQL ne dépendent que des données
+brutes : ils tournent en parallèle. L'entraînement attend dataset.csv.
+Les modules lourds (pandas, xgboost, mysql) sont importés dans les étapes.
+"""
+import os
+
+from .dag import DAG, Etape
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Ressources échangées entre les étapes
+SCRAPPED_DIR = "scrapped/"
+AUTOSPHERE_JSON = "autosphere_data.json"
+DATASET_CSV = os.path.join(BASE_DIR, 'database', 'dataset.csv')
+MYSQL_BASE = "mysql://projet_scraping_cars"
+ARTIFACTS_DIR = os.path.join(BASE_DIR, 'models', 'artifacts')
+BEST_PARAMS_JSON = os.path.join(BASE_DIR, 'models', 'best_params.json')
+
+# Fichiers écrits par l'entraînement dans ARTIFACTS_DIR (le dossier contient aussi ceux
+# de refresh.py, segments.py, predictions/ ... qui ne doivent jamais être écrasés par le cache)
+SORTIES_ENTRAINEMENT = [os.path.join(ARTIFACTS_DIR, nom) for nom in
+                        ('pipeline.joblib', 'quantiles.joblib', 'meta.json', 'lignes_vues.npy', 'comparables')]
+
+# Noms des étapes de construire_pipeline (choix de --force), connus sans construire le DAG
+NOMS_ETAPES = ['conversion', 'chargement', 'entrainement']
+
+# Code source de chaque étape (pour la clé du cache)
+CODE_CONVERSION = [os.path.join(BASE_DIR, 'converter', 'JsonToCsv.py'), os.path.join(BASE_DIR, 'items.py')]
+CODE_CHARGEMENT = [os.path.join(BASE_DIR, 'database', 'database.py'), os.path.join(BASE_DIR, 'database', 'stockage.py'),
+                   os.path.join(BASE_DIR, 'database', 'requetes.py'), os.path.join(BASE_DIR, 'items.py')]
+CODE_ENTRAINEMENT = [os.path.join(BASE_DIR, 'models', 'model.py'), os.path.join(BASE_DIR, 'models', 'comparables.py'),
+                     os.path.join(BASE_DIR, 'models', 'prediction.py')]
+
+
+def etape_conversion():
+    """Conversion des JSON bruts de scrapped/ en dataset.csv."""
+    from ..converter import JsonToCsv
+
+    if JsonToCsv.convertir(SCRAPPED_DIR, DATASET_CSV) is None:
+        raise RuntimeError("aucune donnée conservée après nettoyage")
+
+
+def etape_chargement_bdd(stockage=MYSQL_BASE):
+    """Chargement du JSON du spider dans le stockage (MySQL ou SQLite)."""
+    from ..database import database
+
+    if not database.run_database_pipeline(stockage):
+        raise RuntimeError(f"connexion au stockage '{stockage}' impossible")
+
+
+def etape_entrainement(mode='onehot', intervalles=True):
+    """Entraînement complet du modèle, index des comparables, sauvegarde et prédiction de car_config.json."""
+    from ..models import comparables, model
+
+    df = model.charger_dataset(DATASET_CSV)
+    if df is None:
+        raise RuntimeError("dataset.csv introuvable")
+    pipeline, X_train, modele_quantiles, medianes = model.entrainer_complet(df, mode, intervalles=intervalles)
+    index = comparables.construire_index(df)
+    model.predire_config(pipeline, X_train.columns, medianes, modele_quantiles=modele_quantiles, index_comparables=index)
+
+
+def construire_pipeline(stockage=MYSQL_BASE):
+    return DAG([
+        Etape('conversion', etape_conversion, entrees=[SCRAPPED_DIR], sorties=[DATASET_CSV],
+              code=CODE_CONVERSION),
+        Etape('chargement', etape_chargement_bdd, entrees=[AUTOSPHERE_JSON], sorties=[stockage],
+              params={'stockage': stockage}, code=CODE_CHARGEMENT),
+        Etape('entrainement', etape_entrainement, entrees=[DATASET_CSV, BEST_PARAMS_JSON], sorties=SORTIES_ENTRAINEMENT,
+              code=CODE_ENTRAINEMENT),
+    ])
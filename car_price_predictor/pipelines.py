@@ -3,11 +3,255 @@
 # Don't forget to add your pipeline to the ITEM_PIPELINES setting
 # See: https://docs.scrapy.org/en/latest/topics/item-pipeline.html
 
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
 
-# useful for handling different item types with a single interface
-from itemadapter import ItemAdapter
+import numpy as np
+from scrapy.exceptions import DropItem, NotConfigured
+from twisted.internet.threads import deferToThread
 
+from . import metriques
+from .sites import identifiant_fiche
+
+# Empreintes des annonces déjà écrites lors des crawls précédents ('' : pas de mémoire entre deux crawls)
+FICHIER_EMPREINTES_DEFAUT = 'annonces_vues.npz'
+
+# Écriture en base pendant le crawl (EcritureBddPipeline) : lots, file bornée, délai max avant écriture d'un lot incomplet
+TAILLE_LOT_BDD = 200
+FILE_MAX_BDD = 2000
+DELAI_LOT_BDD_S = 2.0
+# Attente maximale d'un dépôt dans la file pleine avant de revérifier que l'écrivain tourne toujours
+ATTENTE_FILE_BDD_S = 0.5
+
+
+def empreinte_64(texte):
+    """Empreinte 64 bits (entier signé, stockable en int64) d'une chaîne."""
+    return int.from_bytes(hashlib.blake2b(texte.encode('utf-8'), digest_size=8).digest(), 'little', signed=True)
+
+
+def empreinte_champs(fiche):
+    """
+    Empreinte des valeurs de la fiche. L'URL est exclue : la même annonce
+    peut être servie sous /fiche et /fiche-mixte.
+    """
+    champs = fiche.en_dict()
+    champs.pop('url', None)
+    return empreinte_64(json.dumps(champs, sort_keys=True, ensure_ascii=False))
+
+
+class DedoublonnagePipeline:
+    """
+    Écarte les annonces déjà vues, identifiées par le suffixe de leur URL (…-037139, préfixé selon le site) :
+      - une annonce rencontrée une seconde fois pendant le crawl (autre offset de recherche, variante /fiche-mixte),
+      - une annonce déjà écrite par un crawl précédent et dont aucun champ n'a changé.
+    Identifiants et empreintes sont gardés en entiers 64 bits et persistés dans DEDOUBLONNAGE_FICHIER (.npz).
+    """
+
+    def __init__(self, fichier):
+        self.fichier = fichier
+        self.vues = set()
+        self.empreintes = {}
+        if fichier and os.path.exists(fichier):
+            with np.load(fichier) as archive:
+                self.empreintes = dict(zip(archive['identifiants'].tolist(), archive['empreintes'].tolist()))
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler.settings.get('DEDOUBLONNAGE_FICHIER', FICHIER_EMPREINTES_DEFAUT))
+
+    def process_item(self, item, spider):
+        identifiant = identifiant_fiche(item.url)
+        if identifiant is None:
+            return item
+        cle = empreinte_64(identifiant)
+
+        if cle in self.vues:
+            metriques.incrementer('spider_doublons_total', raison='crawl')
+            raise DropItem(f"Annonce {identifiant} déjà collectée pendant ce crawl")
+        self.vues.add(cle)
+
+        empreinte = empreinte_champs(item)
+        if self.empreintes.get(cle) == empreinte:
+            metriques.incrementer('spider_doublons_total', raison='inchangee')
+            raise DropItem(f"Annonce {identifiant} inchangée depuis le dernier crawl")
+        self.empreintes[cle] = empreinte
+        return item
+
+    def close_spider(self, spider):
+        if not self.fichier:
+            return
+        np.savez(self.fichier,
+                 identifiants=np.fromiter(self.empreintes.keys(), dtype=np.int64, count=len(self.empreintes)),
+                 empreintes=np.fromiter(self.empreintes.values(), dtype=np.int64, count=len(self.empreintes)))
+        spider.logger.info(f"🧮 {len(self.empreintes)} empreintes d'annonces sauvegardées dans {self.fichier}")
+
+
+class EcritureJsonPipeline:
+    """Écrit les fiches qui ont passé le dédoublonnage dans spider.output_file (liste JSON)."""
+
+    def open_spider(self, spider):
+        self.fichier = open(spider.output_file, 'w', encoding='utf-8')
+        self.fichier.write("[\n")
+        self.premier = True
 
-class CarPricePredictorPipeline:
     def process_item(self, item, spider):
+        if not self.premier:
+            self.fichier.write(",\n")
+        json.dump(item.en_dict(), self.fichier, ensure_ascii=False, indent=2)
+        self.premier = False
         return item
+
+    def close_spider(self, spider):
+        self.fichier.write("\n]")
+        self.fichier.close()
+        spider.logger.info(f"✅ Données sauvegardées dans {spider.output_file}")
+
+
+class EcritureBddPipeline:
+    """
+    Charge les fiches dans le stockage (-s STOCKAGE_BDD=sqlite:///annonces.db ou mysql://base)
+    pendant le crawl, sans attendre la fin du JSON ni bloquer le réacteur :
+      - process_item prépare le véhicule (database.preparer_vehicule) et le dépose dans une file bornée,
+      - un thread écrivain, seul propriétaire de la connexion, vide la file par lots de
+        STOCKAGE_BDD_TAILLE_LOT (ou après STOCKAGE_BDD_DELAI secondes) : un upsert et un commit
+        par lot, les annonces sont donc consultables pendant le crawl,
+      - file pleine : process_item retourne un Deferred qui ne se déclenche qu'une fois la fiche
+        déposée (ou l'écrivain arrêté sur erreur), ce qui ralentit Scrapy au lieu de faire grossir la mémoire,
+      - close_spider écrit le dernier lot puis rafraîchit les agrégats de prix (requetes.py).
+    Désactivé si STOCKAGE_BDD est vide (défaut) : le chargement reste alors fait par app.py.
+    """
+
+    FIN = object()
+
+    def __init__(self, url, taille_lot=TAILLE_LOT_BDD, file_max=FILE_MAX_BDD, delai=DELAI_LOT_BDD_S):
+        self.url = url
+        self.taille_lot = taille_lot
+        self.delai = delai
+        self.file = queue.Queue(maxsize=file_max)
+        self.pret = threading.Event()
+        self.erreur = None
+        self.ecrivain = None
+        self.totaux = {'inseres': 0, 'mis_a_jour': 0, 'erreurs': 0, 'lots': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        url = crawler.settings.get('STOCKAGE_BDD')
+        if not url:
+            raise NotConfigured("STOCKAGE_BDD non défini")
+        return cls(url,
+                   crawler.settings.getint('STOCKAGE_BDD_TAILLE_LOT', TAILLE_LOT_BDD),
+                   crawler.settings.getint('STOCKAGE_BDD_FILE_MAX', FILE_MAX_BDD),
+                   crawler.settings.getfloat('STOCKAGE_BDD_DELAI', DELAI_LOT_BDD_S))
+
+    def open_spider(self, spider):
+        self.logger = spider.logger
+        self.ecrivain = threading.Thread(target=self._ecrire, name='ecriture-bdd', daemon=True)
+        self.ecrivain.start()
+        # Connexion et schéma sont préparés dans le thread écrivain ; on attend hors du réacteur
+        return deferToThread(self._attendre_connexion)
+
+    def _attendre_connexion(self):
+        self.pret.wait()
+        if self.erreur is not None:
+            raise self.erreur
+
+    def process_item(self, item, spider):
+        from .database.database import preparer_vehicule
+
+        if self.erreur is not None or not item.url:
+            return item
+        vehicule = preparer_vehicule(item)
+        try:
+            self.file.put_nowait(vehicule)
+        except queue.Full:
+            # Contre-pression : la fiche suivante attend que l'écrivain ait libéré de la place
+            metriques.incrementer('spider_bdd_file_pleine_total')
+            return deferToThread(self._deposer, vehicule).addCallback(lambda _: item)
+        return item
+
+    def _deposer(self, element):
+        """
+        Dépose `element` dans la file, en attendant qu'elle se libère tant que l'écrivain tourne.
+        Retourne False si l'écrivain s'est arrêté : un thread du pool du réacteur ne reste jamais
+        bloqué sur une file que plus personne ne vide.
+        """
+        while self.erreur is None and self.ecrivain.is_alive():
+            try:
+                self.file.put(element, timeout=ATTENTE_FILE_BDD_S)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def close_spider(self, spider):
+        return deferToThread(self._terminer)
+
+    def _terminer(self):
+        if self._deposer(self.FIN):
+            self.ecrivain.join()
+        t = self.totaux
+        if self.erreur is not None:
+            self.logger.error(f"❌ Écriture dans {self.url} incomplète ({t['inseres'] + t['mis_a_jour']} véhicules écrits): {self.erreur}")
+            return
+        self.logger.info(f"🗄️ {t['inseres']} véhicules insérés, {t['mis_a_jour']} mis à jour, {t['erreurs']} en erreur "
+                         f"({t['lots']} lots) dans {self.url}")
+
+    def _ecrire(self):
+        """Boucle du thread écrivain : la connexion est créée, utilisée et fermée dans ce thread."""
+        from .database import requetes
+        from .database.database import ouvrir_base
+
+        try:
+            stockage = ouvrir_base(self.url)
+            stockage.creer_schema()
+            requetes.preparer(stockage)
+        except Exception as e:
+            self.erreur = e
+            self.pret.set()
+            return
+        self.pret.set()
+
+        try:
+            fin = False
+            while not fin:
+                lot = []
+                limite = time.monotonic() + self.delai
+                while len(lot) < self.taille_lot:
+                    try:
+                        vehicule = self.file.get(timeout=max(0.0, limite - time.monotonic()))
+                    except queue.Empty:
+                        break
+                    if vehicule is self.FIN:
+                        fin = True
+                        break
+                    lot.append(vehicule)
+                if lot:
+                    self._ecrire_lot(stockage, lot)
+            requetes.rafraichir_agregats(stockage)
+        except Exception as e:
+            self.logger.error(f"❌ Écriture en base interrompue: {e}")
+            self.erreur = e
+            # Les fiches restantes ne seront pas écrites : on libère la mémoire ; les producteurs
+            # en attente voient self.erreur au plus tard après ATTENTE_FILE_BDD_S (_deposer)
+            while True:
+                try:
+                    self.file.get_nowait()
+                except queue.Empty:
+                    break
+        finally:
+            stockage.fermer()
+
+    def _ecrire_lot(self, stockage, lot):
+        with metriques.chronometre('spider_bdd_lot_secondes'):
+            inseres, mis_a_jour, erreurs = stockage.upsert_vehicules(lot, taille_lot=len(lot))
+        metriques.incrementer('bdd_vehicules_inseres_total', inseres)
+        metriques.incrementer('bdd_vehicules_mis_a_jour_total', mis_a_jour)
+        metriques.incrementer('bdd_lignes_en_erreur_total', erreurs)
+        self.totaux['inseres'] += inseres
+        self.totaux['mis_a_jour'] += mis_a_jour
+        self.totaux['erreurs'] += erreurs
+        self.totaux['lots'] += 1
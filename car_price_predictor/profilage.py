@@ -0,0 +1,176 @@
+"""
+Profilage à la demande d'une étape du pipeline.
+
+Pour une étape `nom`, un Profileur écrit dans le dossier choisi :
+  - nom.pstats          : profil cProfile (python -m pstats, snakeviz...),
+  - nom.collapsed       : piles échantillonnées au format "a;b;c N", prêtes
+                          pour flamegraph.pl ou speedscope,
+  - nom.tracemalloc     : instantané tracemalloc (tracemalloc.Snapshot.load),
+  - nom_allocations.txt : lignes qui ont le plus alloué pendant l'étape.
+
+L'échantillonnage ne suit que le thread qui a démarré le Profileur. Pour
+cProfile, cela dépend de la version de Python :
+  - jusqu'à 3.11, le profil ne suit que ce thread (sys.setprofile) : deux
+    étapes parallèles ont chacune leur profil ;
+  - à partir de 3.12, cProfile passe par sys.monitoring, qui est global au
+    processus : un seul profil cProfile à la fois, qui compte les appels de
+    tous les threads. La première étape le garde, les étapes parallèles
+    suivantes n'ont que leurs piles échantillonnées, et un avertissement
+    signale les étapes dont le profil inclut celles qui tournaient en même temps.
+tracemalloc est global au processus : avec des étapes parallèles, leurs
+allocations se mêlent.
+Les callbacks async du spider tournent dans le thread de la boucle asyncio,
+qui est celui qui démarre le Profileur : leurs coroutines apparaissent dans
+les piles à chaque reprise.
+"""
+import cProfile
+import os
+import sys
+import threading
+import tracemalloc
+from collections import Counter
+from contextlib import contextmanager
+
+PERIODE_ECHANTILLONNAGE_S = 0.005
+NB_CADRES_TRACEMALLOC = 10
+NB_LIGNES_ALLOCATIONS = 30
+
+# Python >= 3.12 : cProfile s'appuie sur sys.monitoring, un seul profileur actif par processus, tous threads confondus
+CPROFILE_PAR_THREAD = sys.version_info < (3, 12)
+
+# tracemalloc est partagé : on ne l'arrête qu'à la fin du dernier Profileur
+_verrou = threading.Lock()
+_utilisateurs_tracemalloc = 0
+# Profileurs en cours, et (si cProfile est global au processus) celui qui détient cProfile
+_actifs = []
+_detenteur_cprofile = None
+
+
+def _etiquette(code):
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profileur:
+    def __init__(self, nom, dossier, periode_s=PERIODE_ECHANTILLONNAGE_S):
+        self.nom = nom
+        self.dossier = dossier
+        self.periode_s = periode_s
+        self.piles = Counter()
+        self.profil = None
+        self._arret = threading.Event()
+        self._echantillonneur = None
+        self._instantane_debut = None
+        # Étapes lancées pendant que ce Profileur détenait un cProfile global au processus
+        self.etapes_incluses = set()
+
+    def demarrer(self):
+        """Démarre le profilage du thread courant."""
+        global _utilisateurs_tracemalloc, _detenteur_cprofile
+        os.makedirs(self.dossier, exist_ok=True)
+
+        with _verrou:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start(NB_CADRES_TRACEMALLOC)
+            _utilisateurs_tracemalloc += 1
+            detenteur = _detenteur_cprofile
+            if CPROFILE_PAR_THREAD or detenteur is None:
+                self.profil = cProfile.Profile()
+                if not CPROFILE_PAR_THREAD:
+                    _detenteur_cprofile = self
+                    # Les étapes déjà en cours figureront aussi dans ce profil
+                    self.etapes_incluses.update(p.nom for p in _actifs)
+            else:
+                detenteur.etapes_incluses.add(self.nom)
+            _actifs.append(self)
+        self._instantane_debut = tracemalloc.take_snapshot()
+
+        cible = threading.get_ident()
+        self._echantillonneur = threading.Thread(target=self._echantillonner, args=(cible,),
+                                                 name=f"profil-{self.nom}", daemon=True)
+        self._echantillonneur.start()
+
+        if self.profil is None:
+            print(f"⚠️ cProfile indisponible pour '{self.nom}' : sous Python {sys.version_info.major}.{sys.version_info.minor}, "
+                  f"il est global au processus et déjà utilisé par '{detenteur.nom}'. Seules les piles échantillonnées seront écrites.")
+            return
+        try:
+            self.profil.enable()
+        except ValueError as e:
+            # Profileur extérieur au pipeline (python -m cProfile...) déjà actif : échantillonnage seul
+            print(f"⚠️ cProfile indisponible pour '{self.nom}' ({e}) : seules les piles échantillonnées seront écrites.")
+            self._liberer_cprofile()
+            self.profil = None
+
+    def _liberer_cprofile(self):
+        global _detenteur_cprofile
+        with _verrou:
+            if _detenteur_cprofile is self:
+                _detenteur_cprofile = None
+
+    def _echantillonner(self, cible):
+        while not self._arret.wait(self.periode_s):
+            frame = sys._current_frames().get(cible)
+            pile = []
+            while frame is not None:
+                pile.append(_etiquette(frame.f_code))
+                frame = frame.f_back
+            if pile:
+                self.piles[';'.join(reversed(pile))] += 1
+
+    def arreter(self):
+        """Arrête le profilage et écrit les fichiers. Retourne leurs chemins."""
+        global _utilisateurs_tracemalloc
+        if self.profil is not None:
+            self.profil.disable()
+        self._liberer_cprofile()
+        with _verrou:
+            _actifs.remove(self)
+        self._arret.set()
+        self._echantillonneur.join()
+
+        # Les allocations du profileur lui-même (piles échantillonnées) ne sont pas celles de l'étape
+        sans_profileur = [tracemalloc.Filter(False, __file__), tracemalloc.Filter(False, tracemalloc.__file__)]
+        instantane = tracemalloc.take_snapshot().filter_traces(sans_profileur)
+        _, pic = tracemalloc.get_traced_memory()
+        with _verrou:
+            _utilisateurs_tracemalloc -= 1
+            if _utilisateurs_tracemalloc == 0 and tracemalloc.is_tracing():
+                tracemalloc.stop()
+
+        base = os.path.join(self.dossier, self.nom)
+        fichiers = []
+        if self.profil is not None:
+            self.profil.dump_stats(base + '.pstats')
+            fichiers.append(base + '.pstats')
+            if self.etapes_incluses:
+                print(f"⚠️ {base}.pstats inclut aussi les appels de {', '.join(sorted(self.etapes_incluses))} "
+                      f"(cProfile suit tous les threads à partir de Python 3.12 ; --sequentiel pour des profils séparés).")
+
+        with open(base + '.collapsed', 'w', encoding='utf-8') as f:
+            for pile, nombre in self.piles.most_common():
+                f.write(f"{pile} {nombre}\n")
+        fichiers.append(base + '.collapsed')
+
+        instantane.dump(base + '.tracemalloc')
+        fichiers.append(base + '.tracemalloc')
+
+        ecarts = instantane.compare_to(self._instantane_debut.filter_traces(sans_profileur), 'lineno')
+        with open(base + '_allocations.txt', 'w', encoding='utf-8') as f:
+            f.write(f"# Allocations pendant '{self.nom}' (pic tracé depuis le démarrage de tracemalloc : {pic / 1024 / 1024:.1f} Mo)\n")
+            for ecart in ecarts[:NB_LIGNES_ALLOCATIONS]:
+                f.write(f"{ecart}\n")
+        fichiers.append(base + '_allocations.txt')
+
+        print(f"🔬 Profil de '{self.nom}' ({sum(self.piles.values())} échantillons) écrit dans {self.dossier}")
+        return fichiers
+
+
+@contextmanager
+def profiler(nom, dossier):
+    """Profile le bloc (thread courant) et écrit les fichiers de profil de `nom` dans `dossier`."""
+    profileur = Profileur(nom, dossier)
+    profileur.demarrer()
+    try:
+        yield profileur
+    finally:
+        profileur.arreter()
@@ -0,0 +1,159 @@
+"""
+Adaptateurs de sites : tout ce qui distingue un site d'annonces d'un autre,
+décrit par des données plutôt que par du code de spider.
+
+Un AdaptateurSite donne :
+  - le gabarit d'URL des pages de recherche ({offset} et/ou {page}) et le nombre
+    d'annonces par page,
+  - le sélecteur XPath des liens vers les fiches,
+  - les sélecteurs des champs lus directement (titre, prix...),
+  - la structure des listes libellé/valeur de la fiche (sections, lignes) et le
+    dictionnaire qui ramène chaque libellé normalisé à un champ de FicheVehicule,
+  - la concurrence maximale vers son domaine.
+
+SitesSpider (spiders/quotes_spider.py) crawle plusieurs adaptateurs à la fois,
+et extraire_fiche / extraire_liens s'utilisent aussi sans Scrapy ni navigateur
+(archive.py, benchmarks). Pour ajouter un site : déclarer son adaptateur et
+l'enregistrer dans ADAPTATEURS.
+"""
+import re
+from dataclasses import dataclass, field
+from urllib.parse import urlparse
+
+from .items import CHAMPS_PAR_LIBELLE, SECTION_PRIORITAIRE, FicheVehicule, identifiant_annonce
+
+
+@dataclass(frozen=True, slots=True)
+class AdaptateurSite:
+    """Description déclarative d'un site d'annonces (voir le docstring du module)."""
+    nom: str
+    # Page de recherche n : format(offset=n * annonces_par_page, page=n + 1)
+    url_recherche: str
+    annonces_par_page: int
+    # Éléments <a> des fiches sur une page de recherche (attendus par Playwright, puis leur @href)
+    selecteur_liens: str
+    # Élément attendu par Playwright avant d'extraire une fiche
+    selecteur_fiche: str
+    # Champ de FicheVehicule -> XPaths essayés dans l'ordre (premier texte non vide)
+    champs: dict
+    # Libellé normalisé -> champ de FicheVehicule, pour les listes libellé/valeur
+    libelles: dict = field(default_factory=dict)
+    # Listes libellé/valeur : titres de section, puis, relativement à chaque titre, lignes, libellé et valeur
+    selecteur_sections: str = None
+    selecteur_lignes: str = None
+    selecteur_libelle: str = None
+    selecteur_valeur: str = None
+    section_prioritaire: str = SECTION_PRIORITAIRE
+    # Valeurs des champs que la page ne fournit pas
+    defauts: dict = field(default_factory=dict)
+    max_pages: int = 100
+    # Requêtes simultanées vers le domaine, et délai entre deux requêtes (s)
+    concurrence: int = 8
+    delai: float = 0.0
+    # False : pages statiques, téléchargées sans navigateur
+    playwright: bool = True
+    attente_recherche_ms: int = 20000
+    attente_fiche_ms: int = 12000
+    # Préfixe des identifiants d'annonce, pour que deux sites ne partagent pas un identifiant
+    prefixe_identifiant: str = ''
+
+    @property
+    def domaine(self):
+        return urlparse(self.url_recherche).hostname
+
+    def url_page(self, page_index):
+        """URL de la page de recherche `page_index` (0 pour la première)."""
+        return self.url_recherche.format(offset=page_index * self.annonces_par_page, page=page_index + 1)
+
+    def identifiant(self, url):
+        """Identifiant de l'annonce (préfixé par le site), ou None si l'URL n'en porte pas."""
+        identifiant = identifiant_annonce(url)
+        return f"{self.prefixe_identifiant}{identifiant}" if identifiant else None
+
+
+AUTOSPHERE = AdaptateurSite(
+    nom='autosphere',
+    # Pagination par offset : 23 fiches par page (from=0, from=23...)
+    url_recherche='https://www.autosphere.fr/recherche?from={offset}',
+    annonces_par_page=23,
+    selecteur_liens='//a[starts-with(@href, "/fiche") and @tabindex="-1"]',
+    selecteur_fiche='h2',
+    champs={
+        'nom_complet_vehicule': ['//p[@data-testid="firstParagraph"]//strong/text()'],
+        'prix_ttc_eur': ['//meta[@name="product:price:amount"]/@content', '//p[contains(text(),"au prix de")]/strong/text()'],
+    },
+    libelles=CHAMPS_PAR_LIBELLE,
+    selecteur_sections='//h2',
+    selecteur_lignes='./following::div[contains(@class, "grid")][1]//li',
+    selecteur_libelle='.//span[1]//text()',
+    selecteur_valeur='.//span[contains(@class,"font-semibold")]/text()',
+    defauts={'nom_complet_vehicule': "Titre non trouvé"},
+)
+
+# Adaptateurs connus, par nom (-a sites=autosphere,...)
+ADAPTATEURS = {adaptateur.nom: adaptateur for adaptateur in [AUTOSPHERE]}
+
+
+def adaptateur_pour_url(url):
+    """Adaptateur du site qui sert `url`, ou None."""
+    hote = urlparse(url).hostname
+    for adaptateur in ADAPTATEURS.values():
+        if adaptateur.domaine == hote:
+            return adaptateur
+    return None
+
+
+def identifiant_fiche(url):
+    """Identifiant d'annonce de `url` selon son site (identifiant_annonce pour un site inconnu)."""
+    adaptateur = adaptateur_pour_url(url)
+    return adaptateur.identifiant(url) if adaptateur else identifiant_annonce(url)
+
+
+def normaliser_libelle(texte):
+    """Libellé affiché -> clé : minuscules, sans ':', espaces en '_', sans accents."""
+    if not texte: return None
+    texte = texte.lower().replace(':', '').strip()
+    texte = re.sub(r'[\s\u202f\xa0]+', '_', texte)
+    texte = texte.replace('é', 'e').replace('è', 'e').replace('à', 'a').replace('ô', 'o').replace('î', 'i')
+    return texte
+
+
+def nettoyer_valeur(texte):
+    """Valeur affichée sans espaces de bord ni espaces insécables."""
+    if texte:
+        return texte.strip().replace('\u202f', ' ').replace('\xa0', ' ')
+    return None
+
+
+def prix_entier(texte):
+    """'24 990 €' -> 24990 ; None si le texte ne contient pas de chiffre."""
+    chiffres = re.sub(r'\D', '', texte or '')
+    return int(chiffres) if chiffres else None
+
+
+def extraire_liens(adaptateur, response):
+    """Liens (tels qu'écrits dans la page) des fiches d'une page de recherche rendue, sans doublons."""
+    return list(set(response.xpath(f'{adaptateur.selecteur_liens}/@href').getall()))
+
+
+def extraire_fiche(adaptateur, response):
+    """FicheVehicule extraite du HTML final d'une fiche (sans navigateur)."""
+    fiche = FicheVehicule(url=response.url)
+    for champ, selecteurs in adaptateur.champs.items():
+        brut = next((v for v in (response.xpath(s).get() for s in selecteurs) if v), None)
+        valeur = prix_entier(brut) if champ == 'prix_ttc_eur' else nettoyer_valeur(brut)
+        setattr(fiche, champ, valeur if valeur is not None else adaptateur.defauts.get(champ))
+
+    if adaptateur.selecteur_sections:
+        for section in response.xpath(adaptateur.selecteur_sections):
+            titre_section = section.xpath('.//text()').get()
+            if not titre_section: continue
+            cle_section = normaliser_libelle(titre_section.strip())
+            for ligne in section.xpath(adaptateur.selecteur_lignes):
+                label = ligne.xpath(adaptateur.selecteur_libelle).get()
+                valeur = ligne.xpath(adaptateur.selecteur_valeur).get()
+                if label and valeur:
+                    # Libellé résolu une fois ici vers le champ canonique
+                    fiche.renseigner(cle_section, normaliser_libelle(label), nettoyer_valeur(valeur),
+                                     adaptateur.libelles, adaptateur.section_prioritaire)
+    return fiche
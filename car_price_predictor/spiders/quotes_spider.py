@@ -1,30 +1,29 @@
 import scrapy
-import re
-import asyncio
-import json
-import os
-from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+import time
+from collections import deque
 
-class AutosphereSpider(scrapy.Spider):
-    name = 'autosphere'
-    
-    # 1. On utilise la liste pour l'index, mais on vide start_urls
-    MAX_PAGES = 100
-    
-    # --- MODIFICATION URL DE PAGINATION ---
-    # L'ancienne URL était: f'...&page={page}&'
-    # La nouvelle structure utilise 'from=' (un offset)
-    # Les logs montraient 23 fiches par page, donc on utilise 23 comme multiplicateur.
-    ITEMS_PER_PAGE = 23
-    page_urls = [
-        f'https://www.autosphere.fr/recherche?from={page_num * 23}'
-        for page_num in range(0, MAX_PAGES) # page_num 0 -> from=0, page_num 1 -> from=23, etc.
-    ]
-    # --- FIN MODIFICATION ---
-    
-    # IMPORTANT: On vide start_urls pour empêcher Scrapy de tout lancer en parallèle
+from scrapy.settings import SETTINGS_PRIORITIES
+
+from .. import metriques
+from ..archive import ArchivePages, TYPE_FICHE, TYPE_RECHERCHE
+from ..profilage import Profileur
+from ..sites import ADAPTATEURS, adaptateur_pour_url, extraire_fiche, extraire_liens
+
+class SitesSpider(scrapy.Spider):
+    """
+    Crawle les sites de sites.ADAPTATEURS (ou ceux de -a sites=autosphere,...) dans le même
+    réacteur : chaque site a sa propre pagination et au plus `concurrence` fiches en cours,
+    et la file de requêtes sert en priorité le domaine le moins occupé.
+    """
+    name = 'sites'
+
+    # Noms des adaptateurs crawlés par défaut
+    sites = list(ADAPTATEURS)
+
+    # IMPORTANT: On vide start_urls : chaque site ne lance qu'une page de recherche à la fois
     start_urls = [] 
 
+    # Nom historique, lu par database.py et l'orchestrateur, quel que soit le nombre de sites
     output_file = "autosphere_data.json"
 
     custom_settings = {
@@ -38,113 +37,241 @@ class AutosphereSpider(scrapy.Spider):
         'PLAYWRIGHT_DEFAULT_NAVIGATION_TIMEOUT': 60000, 
         'DOWNLOAD_TIMEOUT': 180, 
         'LOG_LEVEL': 'INFO',
-        'CONCURRENT_REQUESTS': 8, 
+        # CONCURRENT_REQUESTS et DOWNLOAD_SLOTS sont déduits des adaptateurs (update_settings).
+        # La file sert d'abord le domaine qui a le moins de téléchargements en cours : un site lent
+        # n'accapare pas les emplacements libérés par les autres.
+        'SCHEDULER_PRIORITY_QUEUE': 'scrapy.pqueues.DownloaderAwarePriorityQueue',
+        # Dédoublonnage par identifiant d'annonce, écriture de output_file, puis en base si -s STOCKAGE_BDD=...
+        'ITEM_PIPELINES': {
+            'car_price_predictor.pipelines.DedoublonnagePipeline': 100,
+            'car_price_predictor.pipelines.EcritureJsonPipeline': 800,
+            'car_price_predictor.pipelines.EcritureBddPipeline': 900,
+        },
+        # Les doublons écartés sont attendus : pas d'avertissement par annonce
+        'DEFAULT_DROPITEM_LOG_LEVEL': 'INFO',
+        # Sans effet hors du mode rejeu (-a rejeu=DOSSIER)
+        'DOWNLOADER_MIDDLEWARES': {
+            'car_price_predictor.middlewares.ArchiveRejeuMiddleware': 50,
+        },
     }
 
-    def __init__(self, *args, **kwargs):
+    def __init__(self, *args, sites=None, metriques_fichier=None, profil_dossier=None, archive=None, rejeu=None, **kwargs):
         super().__init__(*args, **kwargs)
-        if os.path.exists(self.output_file):
-            os.remove(self.output_file)
-        with open(self.output_file, "w", encoding="utf-8") as f:
-            f.write("[\n")
-        self.first_item = True
+        # -a sites=autosphere,... : sous-ensemble des adaptateurs connus
+        noms = sites.split(',') if isinstance(sites, str) else (sites or self.sites)
+        inconnus = [nom for nom in noms if nom not in ADAPTATEURS]
+        if inconnus:
+            raise ValueError(f"Sites inconnus : {', '.join(inconnus)} (connus : {', '.join(ADAPTATEURS)})")
+        self.adaptateurs = {nom: ADAPTATEURS[nom] for nom in noms}
+        # -a archive=DOSSIER : archive le HTML rendu de chaque page ; -a rejeu=DOSSIER : rejoue une archive sans navigateur
+        self.archive = ArchivePages(archive) if archive else None
+        self.archive_rejeu = ArchivePages(rejeu) if rejeu else None
+        if rejeu and 'output_file' not in kwargs:
+            # Un rejeu n'écrase pas les données du dernier vrai crawl
+            self.output_file = 'autosphere_rejeu.json'
+        # -a profil_dossier=profils : profile le thread du réacteur, donc aussi les callbacks async Playwright
+        self.profileur = None
+        if profil_dossier:
+            self.profileur = Profileur('spider', profil_dossier)
+            self.profileur.demarrer()
+        # -a metriques_fichier=spider.prom : active l'instrumentation et l'exporte à la fermeture
+        self.metriques_fichier = metriques_fichier
+        if metriques_fichier:
+            metriques.activer()
+        self.debut = time.perf_counter()
+        self.nb_fiches = 0
+        # Annonces déjà demandées : une fiche listée sur plusieurs offsets (ou en /fiche-mixte) n'est chargée qu'une fois
+        self.annonces_demandees = set()
         
+        # Fiches restantes par (site, index de page de recherche), et page de recherche courante par site
         self.page_counters = {} 
-        self.current_page_index = 0 # Commencera à l'index 0 (from=0)
+        self.current_page_index = {nom: 0 for nom in self.adaptateurs}
+        # Fiches à lancer et fiches en cours, par site. Le spider borne lui-même les fiches en cours :
+        # un emplacement de DOWNLOAD_SLOTS est libéré dès la fin du téléchargement, alors que la page
+        # Playwright reste ouverte jusqu'à la fin de parse_fiche_technique.
+        self.fiches_en_attente = {nom: deque() for nom in self.adaptateurs}
+        self.fiches_en_cours = {nom: 0 for nom in self.adaptateurs}
+
+    @classmethod
+    def update_settings(cls, settings):
+        """
+        Un emplacement de téléchargement par domaine, à la concurrence et au délai de son adaptateur
+        (un DOWNLOAD_SLOTS passé avec -s l'emporte pour son domaine). Appliqué comme custom_settings,
+        avant le gel des réglages, quelle que soit la version de Scrapy : ce sont donc les sites de
+        la classe, -a sites=... n'étant connu qu'à la création du spider. Les domaines écartés ne
+        reçoivent aucune requête, et le spider borne lui-même les fiches en cours par site.
+        """
+        super().update_settings(settings)
+        adaptateurs = [ADAPTATEURS[nom] for nom in cls.sites]
+        slots = settings.getdict('DOWNLOAD_SLOTS')
+        for adaptateur in adaptateurs:
+            slots.setdefault(adaptateur.domaine, {'concurrency': adaptateur.concurrence, 'delay': adaptateur.delai})
+        # Fusionné avec un éventuel -s DOWNLOAD_SLOTS=... : écrit à sa priorité s'il est plus élevé
+        priorite = max(settings.getpriority('DOWNLOAD_SLOTS') or 0, SETTINGS_PRIORITIES['spider'])
+        settings.set('DOWNLOAD_SLOTS', slots, priority=priorite)
+        settings.set('CONCURRENT_REQUESTS', sum(a.concurrence for a in adaptateurs), priority='spider')
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        if spider.archive_rejeu is not None:
+            # Réglages qui dépendent d'un argument du spider : modifiables ici depuis Scrapy 2.11 seulement
+            if crawler.settings.frozen:
+                raise RuntimeError("-a rejeu=... nécessite Scrapy >= 2.11")
+            # Pages servies par ArchiveRejeuMiddleware : gestionnaires de téléchargement par défaut, sans Playwright
+            crawler.settings.set('DOWNLOAD_HANDLERS', {}, priority='spider')
+            # Le rejeu ne doit ni écarter les fiches inchangées ni modifier les empreintes du dernier vrai crawl
+            crawler.settings.set('DEDOUBLONNAGE_FICHIER', '', priority='spider')
+        return spider
 
     def close(self, reason):
-        """Ferme proprement le JSON"""
-        with open(self.output_file, "a", encoding="utf-8") as f:
-            f.write("\n]")
-        self.logger.info(f"✅ Données sauvegardées dans {self.output_file}")
-
-    def save_item(self, item):
-        """Sauvegarde un item JSON proprement"""
-        with open(self.output_file, "a", encoding="utf-8") as f:
-            if not self.first_item:
-                f.write(",\n")
-            json.dump(item, f, ensure_ascii=False, indent=2)
-            self.first_item = False
-
-    def normalize_key(self, text):
-        """Nettoie les clés de dictionnaire"""
-        if not text: return None
-        text = text.lower().replace(':', '').strip()
-        text = re.sub(r'[\s\u202f\xa0]+', '_', text)
-        text = text.replace('é', 'e').replace('è', 'e').replace('à', 'a').replace('ô', 'o').replace('î', 'i')
-        return text
-
-    def clean_value(self, text):
-        """Nettoie les valeurs extraites"""
-        if text:
-            return text.strip().replace('\u202f', ' ').replace('\xa0', ' ')
-        return None
+        """Exporte les métriques et le profil ; le JSON est fermé par EcritureJsonPipeline."""
+        if self.archive:
+            self.archive.fermer()
+        duree = time.perf_counter() - self.debut
+        metriques.definir('spider_duree_secondes', duree)
+        metriques.definir('spider_fiches_par_seconde', self.nb_fiches / duree)
+        if self.metriques_fichier:
+            metriques.ecrire(self.metriques_fichier)
+        if self.profileur:
+            self.profileur.arreter()
+
+    def adaptateur(self, url):
+        """Adaptateur du site de `url` (le premier crawlé si le domaine n'est pas reconnu)."""
+        return adaptateur_pour_url(url) or next(iter(self.adaptateurs.values()))
+
+    async def rendre(self, response, page, selecteur, timeout, type_page):
+        """
+        Réponse portant le HTML final de la page : attendu dans Playwright (et archivé
+        avec -a archive=...), tel que téléchargé pour un site sans navigateur, ou tel
+        que servi par l'archive en mode rejeu.
+        """
+        if self.archive_rejeu is not None:
+            return response
+        if page is None:
+            final_body = response.text
+        else:
+            with metriques.chronometre('spider_attente_selecteur_secondes', type_page=type_page):
+                await page.wait_for_selector(selecteur, timeout=timeout)
+            final_body = await page.content()
+        if self.archive is not None:
+            # Clé = URL demandée : c'est elle que le rejeu cherchera
+            self.archive.enregistrer(response.request.url, final_body, type_page)
+        return response.replace(body=final_body.encode('utf-8'))
+
+    def extraire_liens(self, response):
+        """Liens (relatifs) des fiches présents sur une page de recherche rendue, sans doublons."""
+        return extraire_liens(self.adaptateur(response.url), response)
+
+    def extraire_fiche(self, response):
+        """Extrait une FicheVehicule à partir du HTML final d'une fiche (sans Playwright)."""
+        return extraire_fiche(self.adaptateur(response.url), response)
+
+    def meta_playwright(self, adaptateur, wait_until):
+        """Meta d'une requête : page Playwright gardée ouverte pour rendre(), ou téléchargement simple."""
+        if not adaptateur.playwright:
+            return {"playwright": False}
+        return {
+            "playwright": True,
+            "playwright_page_kwargs": {"wait_until": wait_until},
+            "playwright_include_page": True,
+        }
+
+    def page_manquante(self, adaptateur, page, response):
+        """Vrai (et journalisé) si la page Playwright attendue pour rendre `response` est absente."""
+        if page or not adaptateur.playwright or self.archive_rejeu is not None:
+            return False
+        self.logger.error(f"❌ Pas de page Playwright trouvée pour {response.url}")
+        return True
+
+    async def start(self):
+        """Point d'entrée de Scrapy >= 2.13, qui n'appelle plus start_requests."""
+        for requete in self.start_requests():
+            yield requete
 
     def start_requests(self):
-        """ 3. MODIFIÉ: Ne lance QUE la première page. """
-        if self.current_page_index < len(self.page_urls):
-            url = self.page_urls[self.current_page_index]
-            # Log mis à jour pour refléter l'offset
-            self.logger.info(f"▶️ Lancement de la Page {self.current_page_index + 1} (Offset {self.current_page_index * self.ITEMS_PER_PAGE})")
-            yield scrapy.Request(
-                url,
-                callback=self.extract_links,
-                meta={
-                    "playwright": True,
-                    "playwright_page_kwargs": {"wait_until": "networkidle"},
-                    "playwright_include_page": True, 
-                    "page_index": self.current_page_index # On passe l'index
-                }
-            )
+        """ 3. Ne lance QUE la première page de chaque site : les sites avancent ensuite en parallèle. """
+        for site in self.adaptateurs:
+            yield from self.requete_recherche(site)
+
+    def requete_recherche(self, site):
+        """Requête de la page de recherche courante de `site`, s'il en reste."""
+        adaptateur = self.adaptateurs[site]
+        page_index = self.current_page_index[site]
+        if page_index >= adaptateur.max_pages:
+            self.logger.info(f"🏁 [{site}] Pagination terminée. Toutes les pages ont été lancées.")
+            return
+        url = adaptateur.url_page(page_index)
+        self.logger.info(f"▶️ [{site}] Lancement de la Page {page_index + 1} ({url})")
+        yield scrapy.Request(
+            url,
+            callback=self.extract_links,
+            errback=self.recherche_en_erreur,
+            meta={
+                **self.meta_playwright(adaptateur, "networkidle"),
+                "site": site,
+                "page_index": page_index # On passe l'index
+            }
+        )
 
     async def extract_links(self, response):
         """ 4. CORRIGÉ: Toute la logique est DANS le 'try' """
-        page_index = response.meta["page_index"]
+        site, page_index = response.meta["site"], response.meta["page_index"]
+        adaptateur = self.adaptateurs[site]
         page = response.meta.get("playwright_page") 
 
-        if not page:
-            self.logger.error(f"❌ Pas de page Playwright trouvée pour {response.url}")
+        if self.page_manquante(adaptateur, page, response):
             return
 
+        metriques.observer('spider_chargement_page_secondes', response.meta.get('download_latency', 0), type_page='recherche')
         try:
             # Attend que les liens des fiches soient chargés
-            await page.wait_for_selector('//a[starts-with(@href, "/fiche") and @tabindex="-1"]', timeout=20000)
-            final_body = await page.content()
-            response = response.replace(body=final_body.encode('utf-8'))
+            response = await self.rendre(response, page, adaptateur.selecteur_liens, adaptateur.attente_recherche_ms,
+                                         TYPE_RECHERCHE)
         
-            fiche_links = response.xpath('//a[starts-with(@href, "/fiche") and @tabindex="-1"]/@href').getall()
-            fiche_links = list(set(fiche_links))
-            
+            fiche_links = extraire_liens(adaptateur, response)
+            nouveaux_liens = []
+            for link in fiche_links:
+                identifiant = adaptateur.identifiant(link) or link
+                if identifiant not in self.annonces_demandees:
+                    self.annonces_demandees.add(identifiant)
+                    nouveaux_liens.append(link)
+            metriques.incrementer('spider_doublons_total', len(fiche_links) - len(nouveaux_liens), raison='lien')
+            fiche_links = nouveaux_liens
+
             num_fiches = len(fiche_links)
-            self.logger.info(f"📄 Page {page_index + 1}: {num_fiches} fiches trouvées sur {response.url}")
+            self.logger.info(f"📄 [{site}] Page {page_index + 1}: {num_fiches} nouvelles fiches trouvées sur {response.url}")
 
             if num_fiches == 0:
-                self.logger.warning(f"⚠️ Page {page_index + 1} vide. Passage à la suivante (ou fin).")
+                self.logger.warning(f"⚠️ [{site}] Page {page_index + 1} vide. Passage à la suivante (ou fin).")
                 # Si 0 fiches, on lance la page suivante manuellement
-                for req in self.launch_next_page(): 
+                for req in self.launch_next_page(site): 
                     yield req
                 return
 
             # 5. INITIALISATION DU COMPTEUR
-            self.page_counters[page_index] = num_fiches
+            self.page_counters[site, page_index] = num_fiches
 
             for link in fiche_links:
                 full_url = response.urljoin(link)
-                yield scrapy.Request(
+                self.fiches_en_attente[site].append(scrapy.Request(
                     url=full_url,
                     callback=self.parse_fiche_technique,
+                    errback=self.fiche_en_erreur,
                     meta={
-                        "playwright": True,
-                        "playwright_page_kwargs": {"wait_until": "domcontentloaded"},
-                        "playwright_include_page": True,
+                        **self.meta_playwright(adaptateur, "domcontentloaded"),
+                        "site": site,
                         "page_index": page_index # On passe l'index aux fiches
                     }
-                )
+                ))
+            for req in self.lancer_fiches(site):
+                yield req
         
         except Exception as e:
             self.logger.error(f"❌ Erreur Playwright ou Timeout sur la page de recherche {response.url}: {e}")
+            metriques.incrementer('spider_erreurs_total', type_page='recherche', site=site)
             # Si la page de recherche échoue, on tente de lancer la suivante
-            for req in self.launch_next_page():
+            for req in self.launch_next_page(site):
                 yield req
             return
         
@@ -156,64 +283,42 @@ class AutosphereSpider(scrapy.Spider):
         """
         6. CORRIGÉ: Toute la logique est DANS le 'try'
         """
-        page_index = response.meta["page_index"] # Récupère l'index de la page parente
+        site, page_index = response.meta["site"], response.meta["page_index"] # Index de la page parente
+        adaptateur = self.adaptateurs[site]
         page = response.meta.get("playwright_page")
-        car_data = {}
 
-        if not page:
-            self.logger.error(f"❌ Pas de page Playwright trouvée pour {response.url}")
+        if self.page_manquante(adaptateur, page, response):
             # On décrémente même en cas d'erreur pour ne pas bloquer la file
-            for req in self.decrement_and_launch_next(page_index):
+            for req in self.fiche_terminee(site, page_index):
                 yield req
             return
 
+        metriques.observer('spider_chargement_page_secondes', response.meta.get('download_latency', 0), type_page='fiche')
         try:
-            await page.wait_for_selector("h2", timeout=12000)
-            final_body = await page.content()
-            response = response.replace(body=final_body.encode('utf-8'))
+            response = await self.rendre(response, page, adaptateur.selecteur_fiche, adaptateur.attente_fiche_ms,
+                                         TYPE_FICHE)
 
             # === Extraction (déplacée DANS le try) ===
-            title = response.css('p[data-testid="firstParagraph"] strong::text').get()
-            car_data["nom_complet_vehicule"] = self.clean_value(title) if title else "Titre non trouvé"
-            
-            price_raw = response.xpath('//meta[@name="product:price:amount"]/@content').get()
-            if not price_raw:
-                price_raw = response.xpath('//p[contains(text(),"au prix de")]/strong/text()').get()
-            if price_raw:
-                try:
-                    car_data["prix_ttc_eur"] = int(re.sub(r'\D', '', price_raw))
-                except ValueError:
-                    pass
-
-            for section in response.xpath('//h2'):
-                titre_section = section.xpath('.//text()').get()
-                if not titre_section: continue
-                titre_section = titre_section.strip()
-                div_suivant = section.xpath('./following::div[contains(@class, "grid")][1]')
-                for li in div_suivant.xpath('.//li'):
-                    label = li.xpath('.//span[1]//text()').get()
-                    valeur = li.xpath('.//span[contains(@class,"font-semibold")]/text()').get()
-                    if label and valeur:
-                        cle = self.normalize_key(f"{titre_section}_{label}")
-                        car_data[cle] = self.clean_value(valeur)
-
-            car_data["url"] = response.url
-            self.save_item(car_data)
+            with metriques.chronometre('spider_extraction_secondes'):
+                car_data = extraire_fiche(adaptateur, response)
+            self.nb_fiches += 1
+            metriques.incrementer('spider_fiches_total', site=site)
             
             # 7. LOG ET DÉCOMPTE (DANS le try)
-            items_restants = self.page_counters.get(page_index, 1) - 1
-            self.logger.info(f"✅ Fiche de Page {page_index + 1} sauvegardée. ({items_restants} restantes sur cette page)")
+            items_restants = self.page_counters.get((site, page_index), 1) - 1
+            self.logger.info(f"✅ [{site}] Fiche de Page {page_index + 1} extraite. ({items_restants} restantes sur cette page)")
             
-            for req in self.decrement_and_launch_next(page_index):
+            for req in self.fiche_terminee(site, page_index):
                 yield req
             
             yield car_data
 
         except Exception as e:
             self.logger.error(f"❌ Erreur Playwright ou Timeout sur {response.url}: {e}")
+            metriques.incrementer('spider_erreurs_total', type_page='fiche', site=site)
             
             # On décrémente même en cas d'erreur pour ne pas bloquer la file
-            for req in self.decrement_and_launch_next(page_index):
+            for req in self.fiche_terminee(site, page_index):
                 yield req
                 
             return # Ne pas yield l'item
@@ -221,40 +326,57 @@ class AutosphereSpider(scrapy.Spider):
             if page:
                 await page.close() # Ferme la page de FICHE
 
-    def decrement_and_launch_next(self, page_index):
+    def fiche_en_erreur(self, failure):
+        """Téléchargement d'une fiche en échec (ou fiche absente de l'archive) : elle est quand même décomptée."""
+        self.logger.error(f"❌ Échec du téléchargement de {failure.request.url}: {failure.value}")
+        meta = failure.request.meta
+        metriques.incrementer('spider_erreurs_total', type_page='fiche', site=meta["site"])
+        yield from self.fiche_terminee(meta["site"], meta["page_index"])
+
+    def recherche_en_erreur(self, failure):
+        """Téléchargement d'une page de recherche en échec : on passe à la suivante du même site."""
+        self.logger.error(f"❌ Échec du téléchargement de {failure.request.url}: {failure.value}")
+        site = failure.request.meta["site"]
+        metriques.incrementer('spider_erreurs_total', type_page='recherche', site=site)
+        yield from self.launch_next_page(site)
+
+    def lancer_fiches(self, site):
+        """Lance les fiches en attente de `site` dans la limite de sa concurrence."""
+        attente = self.fiches_en_attente[site]
+        while attente and self.fiches_en_cours[site] < self.adaptateurs[site].concurrence:
+            self.fiches_en_cours[site] += 1
+            yield attente.popleft()
+
+    def fiche_terminee(self, site, page_index):
+        """Une fiche de `site` est traitée (extraite ou en erreur) : place à la suivante, et à la page suivante si c'était la dernière."""
+        self.fiches_en_cours[site] -= 1
+        yield from self.lancer_fiches(site)
+        yield from self.decrement_and_launch_next(site, page_index)
+
+    def decrement_and_launch_next(self, site, page_index):
         """
-        8. Fonction clé: Décrémente et lance la page suivante si le compteur est à 0.
+        8. Fonction clé: Décrémente et lance la page suivante du site si le compteur est à 0.
         """
-        if page_index not in self.page_counters:
+        cle = (site, page_index)
+        if cle not in self.page_counters:
             return
 
-        self.page_counters[page_index] -= 1
+        self.page_counters[cle] -= 1
         
-        if self.page_counters[page_index] == 0:
-            self.logger.info(f"--- 🛑 PAGE {page_index + 1} COMPLÈTEMENT TERMINÉE ---")
-            del self.page_counters[page_index] # Nettoyage
-            yield from self.launch_next_page() # Lance la page suivante
+        if self.page_counters[cle] == 0:
+            self.logger.info(f"--- 🛑 [{site}] PAGE {page_index + 1} COMPLÈTEMENT TERMINÉE ---")
+            del self.page_counters[cle] # Nettoyage
+            yield from self.launch_next_page(site) # Lance la page suivante
 
-    def launch_next_page(self):
+    def launch_next_page(self, site):
         """
-        9. Fonction Helper: Lance la requête pour la page suivante dans la liste.
+        9. Fonction Helper: Lance la requête pour la page suivante de `site`.
         """
-        self.current_page_index += 1 # On passe à la page suivante
-        
-        if self.current_page_index < len(self.page_urls):
-            url = self.page_urls[self.current_page_index]
-            # Log mis à jour pour refléter l'offset
-            self.logger.info(f"▶️ Lancement de la Page {self.current_page_index + 1} (Offset {self.current_page_index * self.ITEMS_PER_PAGE})")
-            yield scrapy.Request(
-                url,
-                callback=self.extract_links,
-                meta={
-                    "playwright": True,
-                    "playwright_page_kwargs": {"wait_until": "networkidle"},
-                    "playwright_include_page": True, 
-                    "page_index": self.current_page_index
-                }
-            )
-        else:
-            self.logger.info("🏁 Pagination terminée. Toutes les pages ont été lancées.")
+        self.current_page_index[site] += 1 # On passe à la page suivante
+        yield from self.requete_recherche(site)
 
+
+class AutosphereSpider(SitesSpider):
+    """Le crawl historique : `scrapy crawl autosphere`, soit `scrapy crawl sites -a sites=autosphere`."""
+    name = 'autosphere'
+    sites = ['autosphere']
@@ -0,0 +1,136 @@
+import os
+
+from car_price_predictor.database.database import ouvrir_base, preparer_vehicule
+from car_price_predictor.items import FicheVehicule
+from car_price_predictor.orchestrator.cache import CacheEtapes
+from car_price_predictor.orchestrator.dag import Etape
+
+
+def produire(entree, sortie):
+    with open(entree) as f, open(sortie, 'w') as g:
+        g.write(f.read().upper())
+
+
+def charger(url, n):
+    stockage = ouvrir_base(url)
+    try:
+        stockage.creer_schema()
+        stockage.upsert_vehicules([
+            preparer_vehicule(FicheVehicule(url=f'https://www.autosphere.fr/fiche/auto-occasion-peugeot-208-{i:06d}',
+                                            nom_complet_vehicule='PEUGEOT 208', prix_ttc_eur=10000 + i))
+            for i in range(n)
+        ])
+    finally:
+        stockage.fermer()
+
+
+def test_cle_depend_des_entrees_et_des_parametres(tmp_path):
+    entree = tmp_path / 'a.txt'
+    entree.write_text('a')
+    cache = CacheEtapes(str(tmp_path / 'cache'))
+    etape = Etape('maj', produire, entrees=[str(entree)], params={'entree': str(entree), 'sortie': 'x'})
+    cle = cache.cle(etape)
+
+    assert cache.cle(etape) == cle
+    entree.write_text('b')
+    assert cache.cle(etape) != cle
+    entree.write_text('a')
+    etape.params['sortie'] = 'y'
+    assert cache.cle(etape) != cle
+
+
+def test_restaure_les_fichiers_de_sortie(tmp_path):
+    entree, sortie = tmp_path / 'a.txt', tmp_path / 'b.txt'
+    entree.write_text('abc')
+    cache = CacheEtapes(str(tmp_path / 'cache'))
+    etape = Etape('maj', produire, entrees=[str(entree)], sorties=[str(sortie)],
+                  params={'entree': str(entree), 'sortie': str(sortie)})
+    cle = cache.cle(etape)
+    assert not cache.restaurer(etape, cle)
+
+    produire(str(entree), str(sortie))
+    cache.enregistrer(etape, cle)
+    sortie.unlink()
+    assert cache.restaurer(etape, cle)
+    assert sortie.read_text() == 'ABC'
+
+
+def test_ne_restaure_que_les_sorties_declarees(tmp_path):
+    entree, dossier = tmp_path / 'a.txt', tmp_path / 'artifacts'
+    sortie, autre = dossier / 'pipeline.txt', dossier / 'segments.txt'
+    entree.write_text('abc')
+    dossier.mkdir()
+    cache = CacheEtapes(str(tmp_path / 'cache'))
+    etape = Etape('maj', produire, entrees=[str(entree)], sorties=[str(sortie), str(dossier / 'quantiles.txt')],
+                  params={'entree': str(entree), 'sortie': str(sortie)})
+    cle = cache.cle(etape)
+    produire(str(entree), str(sortie))
+    cache.enregistrer(etape, cle)
+
+    # Une autre exécution de l'étape a laissé ses propres sorties : elles sont remplacées
+    sortie.write_text('autre dataset')
+    (dossier / 'quantiles.txt').write_text('autre dataset')
+    cache._noter_etat([{'chemin': str(sortie)}, {'chemin': str(dossier / 'quantiles.txt')}])
+    autre.write_text('segments')
+    assert cache.restaurer(etape, cle)
+    assert sortie.read_text() == 'ABC'
+    assert autre.read_text() == 'segments'
+    assert not (dossier / 'quantiles.txt').exists()
+
+    # Un autre outil (refresh.py) a prolongé le modèle : il n'est pas écrasé
+    sortie.write_text('rafraîchi')
+    assert cache.restaurer(etape, cle)
+    assert sortie.read_text() == 'rafraîchi'
+
+
+def test_base_modifiee_depuis_la_mise_en_cache_n_est_pas_restauree(tmp_path):
+    chemin = tmp_path / 'annonces.db'
+    url = f'sqlite:///{chemin}'
+    cache = CacheEtapes(str(tmp_path / 'cache'))
+    etape = Etape('chargement', charger, sorties=[url], params={'url': url, 'n': 3})
+    cle = cache.cle(etape)
+
+    charger(url, 3)
+    cache.enregistrer(etape, cle)
+    assert cache.restaurer(etape, cle)
+
+    # Écriture par un autre chargement (crawl avec STOCKAGE_BDD) : nouveau num_chargement
+    charger(url, 3)
+    assert not cache.restaurer(etape, cle)
+
+    # Base recréée : le cache ne doit ni la considérer à jour ni la remplacer
+    cache.enregistrer(etape, cle)
+    os.remove(chemin)
+    charger(url, 1)
+    taille = os.path.getsize(chemin)
+    assert not cache.restaurer(etape, cle)
+    assert os.path.getsize(chemin) == taille
+    stockage = ouvrir_base(url)
+    try:
+        assert stockage.compter_vehicules() == 1
+    finally:
+        stockage.fermer()
+
+
+def test_base_absente_n_est_pas_creee(tmp_path):
+    chemin = tmp_path / 'annonces.db'
+    url = f'sqlite:///{chemin}'
+    cache = CacheEtapes(str(tmp_path / 'cache'))
+    etape = Etape('chargement', charger, sorties=[url], params={'url': url, 'n': 2})
+    cle = cache.cle(etape)
+    charger(url, 2)
+    cache.enregistrer(etape, cle)
+
+    os.remove(chemin)
+    assert not cache.restaurer(etape, cle)
+    assert not chemin.exists()
+
+
+def test_eviction_des_entrees_les_plus_anciennes(tmp_path):
+    cache = CacheEtapes(str(tmp_path / 'cache'), taille_max_mo=0)
+    sortie = tmp_path / 'b.txt'
+    sortie.write_text('x' * 1000)
+    etape = Etape('maj', produire, sorties=[str(sortie)])
+    cache.enregistrer(etape, 'cle')
+    # Taille maximale nulle : l'entrée est évincée dès son enregistrement
+    assert not cache.restaurer(etape, 'cle')
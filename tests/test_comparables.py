@@ -0,0 +1,46 @@
+import pandas as pd
+
+from car_price_predictor.models.comparables import IndexComparables, construire_index
+from car_price_predictor.models.model import charger_dataset
+
+from test_hors_memoire import ecrire_dataset
+
+
+def test_index_construit_puis_interroge(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 300)
+    df = charger_dataset(str(chemin))
+    index = construire_index(df, str(tmp_path / 'comparables'))
+
+    config = df.iloc[0].to_dict()
+    resultats = index.rechercher(config, 5)
+    assert len(resultats) == 5
+    assert resultats['url'].iloc[0] == config['url']
+    assert IndexComparables.charger(str(tmp_path / 'comparables')) is not None
+
+
+def test_annonces_sans_prix_ignorees_et_prix_arrondis(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 100)
+    df = charger_dataset(str(chemin))
+    df['prix_ttc_eur'] = df['prix_ttc_eur'].astype(float)
+    df.loc[0, 'prix_ttc_eur'] = None
+    df.loc[1, 'prix_ttc_eur'] = 12345.6
+    index = construire_index(df, str(tmp_path / 'comparables'))
+
+    assert len(index.prix) == 99
+    resultats = index.rechercher(df.iloc[1].to_dict(), 1)
+    assert resultats['prix_ttc_eur'].iloc[0] == 12346
+
+
+def test_dataset_sans_url_signale_et_supprime_l_ancien_index(tmp_path, capsys):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 100)
+    dossier = str(tmp_path / 'comparables')
+    construire_index(charger_dataset(str(chemin)), dossier)
+
+    pd.read_csv(chemin).drop(columns='url').to_csv(chemin, index=False)
+    assert construire_index(charger_dataset(str(chemin)), dossier) is None
+    sortie = capsys.readouterr().out
+    assert "NON construit" in sortie and "'url'" in sortie
+    assert IndexComparables.charger(dossier) is None
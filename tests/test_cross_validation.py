@@ -0,0 +1,28 @@
+from car_price_predictor.models import cross_validation
+from car_price_predictor.models.cross_validation import cle_plis, empreinte_source, preparer_plis
+from car_price_predictor.models.model import charger_dataset
+
+from test_hors_memoire import ecrire_dataset
+
+
+def test_cle_depend_du_pretraitement(monkeypatch):
+    cle = cle_plis('abc', 5, 42, 'onehot', 4)
+    assert cle_plis('abc', 5, 42, 'onehot', 4) == cle
+    monkeypatch.setattr(cross_validation, 'version_pretraitement', lambda: 'autre')
+    assert cle_plis('abc', 5, 42, 'onehot', 4) != cle
+
+
+def test_empreinte_de_la_source_reellement_lue(tmp_path, monkeypatch):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 60)
+    df = charger_dataset(str(chemin))
+
+    # Même contenu lu depuis une base : empreinte du DataFrame, pas de DATASET_CSV
+    url = f"sqlite:///{tmp_path / 'annonces.db'}"
+    assert empreinte_source(df, url) == empreinte_source(df.copy(), url)
+    assert empreinte_source(df, url) != empreinte_source(df.iloc[1:], url)
+    assert empreinte_source(df, str(chemin)) != empreinte_source(df, url)
+
+    monkeypatch.setattr(cross_validation, 'CV_CACHE_DIR', str(tmp_path / 'cv'))
+    fichiers = preparer_plis(df, n_plis=2, source=str(chemin))
+    assert fichiers != preparer_plis(df.iloc[1:], n_plis=2, source=url)
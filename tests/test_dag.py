@@ -0,0 +1,77 @@
+import threading
+
+import pytest
+
+from car_price_predictor.orchestrator.dag import DAG, ECHEC, IGNOREE, OK, Etape
+
+
+def executer_avec_delai(dag, delai=10, **kwargs):
+    """dag.executer dans un thread : un blocage fait échouer le test au lieu de le figer."""
+    sortie = {}
+    thread = threading.Thread(target=lambda: sortie.update(resultats=dag.executer(**kwargs)), daemon=True)
+    thread.start()
+    thread.join(timeout=delai)
+    assert not thread.is_alive(), "DAG.executer bloqué"
+    return {r.nom: r.statut for r in sortie['resultats']}
+
+
+def echec():
+    raise RuntimeError("boum")
+
+
+def test_echec_propage_quel_que_soit_l_ordre_de_declaration():
+    # Chaîne A -> B -> C, déclarée avec C avant B
+    etapes = [
+        Etape('C', lambda: None, entrees=['b.out'], sorties=['c.out']),
+        Etape('B', lambda: None, entrees=['a.out'], sorties=['b.out']),
+        Etape('A', echec, sorties=['a.out']),
+    ]
+    statuts = executer_avec_delai(DAG(etapes))
+    assert statuts == {'A': ECHEC, 'B': IGNOREE, 'C': IGNOREE}
+
+
+def test_dependances_executees_avant():
+    ordre = []
+    verrou = threading.Lock()
+
+    def noter(nom):
+        with verrou:
+            ordre.append(nom)
+
+    etapes = [
+        Etape('entrainement', noter, entrees=['dataset.csv'], params={'nom': 'entrainement'}),
+        Etape('conversion', noter, entrees=['scrapped'], sorties=['dataset.csv'], params={'nom': 'conversion'}),
+        Etape('chargement', noter, entrees=['scrapped'], params={'nom': 'chargement'}),
+    ]
+    statuts = executer_avec_delai(DAG(etapes), max_paralleles=1)
+    assert set(statuts.values()) == {OK}
+    assert ordre.index('conversion') < ordre.index('entrainement')
+
+
+def test_branche_independante_executee_malgre_un_echec():
+    etapes = [
+        Etape('A', echec, sorties=['a.out']),
+        Etape('B', lambda: None, entrees=['a.out']),
+        Etape('X', lambda: None),
+    ]
+    assert executer_avec_delai(DAG(etapes)) == {'A': ECHEC, 'B': IGNOREE, 'X': OK}
+
+
+def test_cycle_refuse():
+    etapes = [
+        Etape('A', lambda: None, entrees=['b.out'], sorties=['a.out']),
+        Etape('B', lambda: None, entrees=['a.out'], sorties=['b.out']),
+    ]
+    with pytest.raises(ValueError, match="Cycle"):
+        DAG(etapes)
+
+
+def test_etape_forcee_inconnue():
+    with pytest.raises(ValueError, match="inconnue"):
+        DAG([Etape('A', lambda: None)]).executer(forcer=['Z'])
+
+
+def test_noms_des_etapes_du_pipeline():
+    from car_price_predictor.orchestrator.stages import NOMS_ETAPES, construire_pipeline
+
+    assert list(construire_pipeline().etapes) == NOMS_ETAPES
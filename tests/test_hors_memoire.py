@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from car_price_predictor.models import model
+from car_price_predictor.models.hors_memoire import evaluer_par_blocs, lire_blocs, masque_test, premiere_passe
+from car_price_predictor.models.model import TYPES_DATASET, cat_cols, charger_dataset, empreintes_lignes
+
+
+def ecrire_dataset(chemin, n):
+    rng = np.random.default_rng(0)
+    df = pd.DataFrame({
+        'prix_ttc_eur': rng.integers(5000, 40000, n),
+        'url': [f'https://www.autosphere.fr/fiche/auto-occasion-x-{i:06d}' for i in range(n)],
+        'energie': rng.choice(['diesel', 'essence', None], n),
+        'boite_de_vitesses': rng.choice(['manuelle', 'automatique'], n),
+        'couleur': rng.choice(['gris', 'noir'], n),
+        'type_vehicule': rng.choice(['citadine', 'suv'], n),
+        'provenance': 'france',
+        'premiere_main': rng.choice(['oui', 'non'], n),
+        'kilometrage': rng.integers(0, 200000, n).astype(float),
+        'puissance_fiscale': 5.0,
+        'puissance_reelle': rng.choice([90.0, 110.0, np.nan], n),
+        'portes': 5,
+        'places': 5,
+        'age_ans': rng.random(n) * 10,
+        'marque': rng.choice(['peugeot', 'renault'], n),
+        'modele': rng.choice(['208', 'clio'], n),
+    })
+    df.to_csv(chemin, index=False)
+
+
+def test_empreintes_par_blocs_identiques_a_celles_du_dataset_charge(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 250)
+    types = {col: str if col in cat_cols else type_ for col, type_ in TYPES_DATASET.items()}
+
+    par_blocs = np.concatenate([empreintes_lignes(bloc) for _, bloc in lire_blocs(str(chemin), 64, types)])
+    assert (par_blocs == empreintes_lignes(charger_dataset(str(chemin)))).all()
+
+
+def test_echantillon_sans_url(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 100)
+    _, modalites, echantillon = premiere_passe(str(chemin), 30, 50)
+    assert 'url' not in echantillon.columns
+    assert len(echantillon) == 50
+    assert 'manquant' in modalites['energie']
+
+
+def test_csv_sans_ligne(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 0)
+    with pytest.raises(ValueError, match="aucune ligne d'entraînement"):
+        premiere_passe(str(chemin))
+
+
+def test_evaluation_sans_ligne_de_test(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 0)
+    with pytest.raises(ValueError, match="aucune ligne de test"):
+        evaluer_par_blocs(str(chemin), TYPES_DATASET, None, None, None)
+
+
+def test_hors_memoire_refuse_un_stockage(capsys):
+    with pytest.raises(SystemExit):
+        model.main(['--hors-memoire', '--source', 'sqlite:///annonces.db'])
+    assert "--source doit être un fichier CSV" in capsys.readouterr().err
+
+
+def test_masque_test_deterministe_et_independant_du_decoupage():
+    entier = masque_test(0, 10_000)
+    assert (np.concatenate([masque_test(0, 3_000), masque_test(3_000, 7_000)]) == entier).all()
+    assert 0.18 < entier.mean() < 0.22
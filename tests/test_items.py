@@ -0,0 +1,32 @@
+from car_price_predictor.items import FicheVehicule, identifiant_annonce
+
+
+def test_depuis_dict_ancien_format_a_sections():
+    fiche = FicheVehicule.depuis_dict({
+        'url': 'https://www.autosphere.fr/fiche/auto-occasion-peugeot-208-nanteuil-les-meaux-037139',
+        'prix_ttc_eur': 12000,
+        'bonnes_affaires_kilometrage': '46 000 km',
+        'menu_kilometrage': '45 000 km',
+        'menu_categorie': 'Citadine',
+        'menu_date_de_mise_en_circulation': '27/03/2019',
+        'acheter_couleur': 'Gris',
+        'menu_libelle_inconnu': 'ignoré',
+    })
+    # La section 'menu' l'emporte, les autres ne comblent que les champs vides
+    assert fiche.kilometrage == '45 000 km'
+    assert fiche.couleur == 'Gris'
+    # Libellés du site résolus vers les champs canoniques
+    assert fiche.type_vehicule == 'Citadine'
+    assert fiche.date_mise_en_circulation == '27/03/2019'
+    assert fiche.prix_ttc_eur == 12000
+
+
+def test_depuis_dict_nouveau_format_aller_retour():
+    fiche = FicheVehicule(url='https://www.autosphere.fr/fiche/auto-occasion-x-cr307106', prix_ttc_eur=9000, energie='Diesel')
+    assert FicheVehicule.depuis_dict(fiche.en_dict()) == fiche
+    assert fiche.en_dict() == {'url': fiche.url, 'prix_ttc_eur': 9000, 'energie': 'Diesel'}
+
+
+def test_identifiant_annonce():
+    assert identifiant_annonce('https://www.autosphere.fr/fiche-mixte/auto-occasion-x-dizy-cr307106?ref=1') == 'cr307106'
+    assert identifiant_annonce(None) is None
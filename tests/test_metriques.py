@@ -0,0 +1,56 @@
+import json
+
+import pytest
+
+from car_price_predictor import metriques
+
+
+@pytest.fixture
+def registre():
+    metriques.reinitialiser()
+    metriques.activer()
+    yield
+    metriques.desactiver()
+    metriques.reinitialiser()
+
+
+def test_inactif_n_enregistre_rien():
+    metriques.reinitialiser()
+    metriques.incrementer('x_total')
+    with metriques.chronometre('x_secondes'):
+        pass
+    assert metriques.exporter_json() == {'compteurs': [], 'jauges': [], 'histogrammes': []}
+
+
+def test_export_prometheus(registre):
+    metriques.incrementer('doublons_total', raison='crawl')
+    metriques.incrementer('doublons_total', 2, raison='crawl')
+    metriques.definir('lignes_par_seconde', 12.5, fichier='a "b".json')
+    metriques.observer('duree_secondes', 0.003)
+    metriques.observer('duree_secondes', 2)
+
+    lignes = metriques.exporter_prometheus().splitlines()
+    assert '# TYPE car_price_doublons_total counter' in lignes
+    assert 'car_price_doublons_total{raison="crawl"} 3' in lignes
+    assert 'car_price_lignes_par_seconde{fichier="a \\"b\\".json"} 12.5' in lignes
+    # Histogramme cumulatif
+    assert 'car_price_duree_secondes_bucket{le="0.001"} 0' in lignes
+    assert 'car_price_duree_secondes_bucket{le="0.005"} 1' in lignes
+    assert 'car_price_duree_secondes_bucket{le="5"} 2' in lignes
+    assert 'car_price_duree_secondes_bucket{le="+Inf"} 2' in lignes
+    assert 'car_price_duree_secondes_count 2' in lignes
+
+
+def test_export_json_selon_l_extension(registre, tmp_path):
+    metriques.incrementer('lignes_total', 5)
+    metriques.observer('duree_secondes', 0.5)
+    metriques.observer('duree_secondes', 1.5)
+
+    metriques.ecrire(str(tmp_path / 'm.json'))
+    instantane = json.loads((tmp_path / 'm.json').read_text(encoding='utf-8'))
+    assert instantane['compteurs'] == [{'nom': 'lignes_total', 'etiquettes': {}, 'valeur': 5}]
+    histogramme = instantane['histogrammes'][0]
+    assert (histogramme['nombre'], histogramme['moyenne'], histogramme['min'], histogramme['max']) == (2, 1.0, 0.5, 1.5)
+
+    metriques.ecrire(str(tmp_path / 'm.prom'))
+    assert (tmp_path / 'm.prom').read_text(encoding='utf-8').startswith('# TYPE car_price_lignes_total counter')
@@ -0,0 +1,65 @@
+import json
+
+import numpy as np
+import pandas as pd
+
+from car_price_predictor.models import prediction
+from car_price_predictor.models.model import (
+    MODE_NATIVE, MODE_ONEHOT, PARAMS_XGB, EncodeurCategoriel, cat_cols, charger_dataset, charger_params_xgb,
+    construire_modele, entrainer_complet, num_cols, predire_config, preparer_entrainement
+)
+
+from test_hors_memoire import ecrire_dataset
+from test_refresh import rediriger_artefacts
+
+
+def test_encodeur_categoriel_fige_les_modalites():
+    X = pd.DataFrame({'kilometrage': [1.0, 2.0, 3.0], 'energie': pd.Categorical(['diesel', 'essence', 'diesel'])})
+    encodeur = EncodeurCategoriel(num_cols=['kilometrage'], cat_cols=['energie']).fit(X)
+
+    # Modalité inconnue (et entrée en str plutôt qu'en category) : manquante, sans décaler les codes
+    transforme = encodeur.transform(pd.DataFrame({'kilometrage': [4], 'energie': ['electrique']}))
+    assert transforme['kilometrage'].dtype == np.float32
+    assert list(transforme['energie'].cat.categories) == ['diesel', 'essence']
+    assert transforme['energie'].isna().all()
+    assert encodeur.transform(X)['energie'].cat.codes.tolist() == [0, 1, 0]
+
+
+def test_mode_natif_entraine_sur_les_categories(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 200)
+    X_train, X_test, y_train, y_test, _ = preparer_entrainement(charger_dataset(str(chemin)))
+
+    modele = construire_modele(MODE_NATIVE, params={'n_estimators': 20, 'early_stopping_rounds': None})
+    modele.fit(X_train, y_train)
+
+    regresseur = modele.named_steps['regressor']
+    assert regresseur.enable_categorical and regresseur.tree_method == 'hist'
+    # Pas de matrice one-hot : une colonne par variable
+    assert list(modele.named_steps['preprocessor'].transform(X_test).columns) == num_cols + cat_cols
+    X_inconnu = X_test.head(1).copy()
+    X_inconnu['marque'] = 'marque-inconnue'
+    assert np.isfinite(modele.predict(X_inconnu)).all()
+
+
+def test_prediction_apres_entrainement_identique_a_predict(tmp_path, monkeypatch):
+    rediriger_artefacts(monkeypatch, tmp_path / 'artifacts')
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 200)
+    model, X_train, modele_quantiles, medianes = entrainer_complet(charger_dataset(str(chemin)), intervalles=False)
+
+    # Numériques absents : imputés avec les médianes de l'entraînement dans les deux cas
+    car_config = {'marque': 'peugeot', 'modele': '208', 'energie': 'diesel', 'portes': 5, 'places': 5}
+    config = tmp_path / 'car_config.json'
+    config.write_text(json.dumps(car_config))
+    prix = predire_config(model, X_train.columns, medianes, chemin=str(config))
+    assert prix == prediction._predire_sans_cache(car_config)['prix']
+
+
+def test_reglage_ignore_pour_un_autre_mode(tmp_path, capsys):
+    chemin = tmp_path / 'best_params.json'
+    chemin.write_text(json.dumps({'params': {'max_depth': 3}, 'mode': MODE_NATIVE}))
+
+    assert charger_params_xgb(MODE_NATIVE, str(chemin))['max_depth'] == 3
+    assert charger_params_xgb(MODE_ONEHOT, str(chemin)) == PARAMS_XGB
+    assert "ignoré en mode 'onehot'" in capsys.readouterr().out
@@ -0,0 +1,96 @@
+import logging
+import threading
+
+from car_price_predictor.pipelines import EcritureBddPipeline
+
+
+def demarrer_ecrivain(pipeline):
+    """Ce que fait open_spider, sans réacteur : thread écrivain lancé, connexion prête."""
+    pipeline.logger = logging.getLogger('test')
+    pipeline.ecrivain = threading.Thread(target=pipeline._ecrire, daemon=True)
+    pipeline.ecrivain.start()
+    pipeline._attendre_connexion()
+
+
+def test_ecriture_bdd_en_erreur_ne_bloque_pas_les_producteurs(tmp_path, monkeypatch):
+    pipeline = EcritureBddPipeline(f"sqlite:///{tmp_path / 'annonces.db'}", taille_lot=2, file_max=2, delai=0.05)
+
+    def lot_en_erreur(stockage, lot):
+        raise RuntimeError("base indisponible")
+
+    monkeypatch.setattr(pipeline, '_ecrire_lot', lot_en_erreur)
+    demarrer_ecrivain(pipeline)
+
+    # Plus de producteurs que de places dans la file : certains attendent quand l'écrivain échoue
+    resultats = []
+    producteurs = [threading.Thread(target=lambda i=i: resultats.append(pipeline._deposer({'url': f'u{i}'})))
+                   for i in range(10)]
+    for producteur in producteurs:
+        producteur.start()
+    for producteur in producteurs:
+        producteur.join(timeout=5)
+
+    assert not any(producteur.is_alive() for producteur in producteurs)
+    assert isinstance(pipeline.erreur, RuntimeError)
+    assert False in resultats
+
+    fin = threading.Thread(target=pipeline._terminer, daemon=True)
+    fin.start()
+    fin.join(timeout=5)
+    assert not fin.is_alive()
+
+
+def test_ecriture_bdd_ecrit_tous_les_vehicules(tmp_path):
+    from car_price_predictor.database.database import ouvrir_base, preparer_vehicule
+    from car_price_predictor.items import FicheVehicule
+
+    url = f"sqlite:///{tmp_path / 'annonces.db'}"
+    pipeline = EcritureBddPipeline(url, taille_lot=3, file_max=2, delai=0.05)
+    demarrer_ecrivain(pipeline)
+    vehicules = [preparer_vehicule(FicheVehicule(url=f'https://www.autosphere.fr/fiche/auto-occasion-peugeot-208-{i:06d}',
+                                                 nom_complet_vehicule='PEUGEOT 208 1.2 PureTech', prix_ttc_eur=10000 + i))
+                 for i in range(7)]
+    assert all(pipeline._deposer(vehicule) for vehicule in vehicules)
+    pipeline._terminer()
+
+    assert pipeline.erreur is None
+    assert pipeline.totaux['inseres'] == 7
+    stockage = ouvrir_base(url)
+    try:
+        assert stockage.compter_vehicules() == 7
+    finally:
+        stockage.fermer()
+
+
+def test_dedoublonnage_pendant_le_crawl_et_entre_deux_crawls(tmp_path):
+    import pytest
+    from scrapy.exceptions import DropItem
+
+    from car_price_predictor.items import FicheVehicule
+    from car_price_predictor.pipelines import DedoublonnagePipeline
+
+    class Spider:
+        logger = logging.getLogger('test')
+
+    fichier = str(tmp_path / 'annonces_vues.npz')
+    fiche = FicheVehicule(url='https://www.autosphere.fr/fiche/auto-occasion-peugeot-208-nanteuil-les-meaux-037139',
+                          nom_complet_vehicule='PEUGEOT 208', prix_ttc_eur=12000)
+    autre = FicheVehicule(url='https://www.autosphere.fr/fiche/auto-occasion-renault-clio-dizy-cr307106',
+                          nom_complet_vehicule='RENAULT CLIO', prix_ttc_eur=9000)
+
+    pipeline = DedoublonnagePipeline(fichier)
+    assert pipeline.process_item(fiche, Spider()) is fiche
+    assert pipeline.process_item(autre, Spider()) is autre
+    # Même annonce servie sous /fiche-mixte pendant le même crawl
+    variante = FicheVehicule(url=fiche.url.replace('/fiche/', '/fiche-mixte/'), nom_complet_vehicule='PEUGEOT 208', prix_ttc_eur=12000)
+    with pytest.raises(DropItem, match="déjà collectée"):
+        pipeline.process_item(variante, Spider())
+    pipeline.close_spider(Spider())
+
+    # Crawl suivant : l'annonce inchangée est écartée, celle dont le prix a baissé passe
+    suivant = DedoublonnagePipeline(fichier)
+    assert len(suivant.empreintes) == 2
+    with pytest.raises(DropItem, match="inchangée"):
+        suivant.process_item(fiche, Spider())
+    baisse = FicheVehicule(url=autre.url, nom_complet_vehicule='RENAULT CLIO', prix_ttc_eur=8500)
+    assert suivant.process_item(baisse, Spider()) is baisse
@@ -0,0 +1,31 @@
+import threading
+
+from car_price_predictor import profilage
+from car_price_predictor.profilage import Profileur
+
+
+def test_cprofile_global_au_processus_un_seul_profil(tmp_path, monkeypatch, capsys):
+    # Comportement de Python >= 3.12, simulé quelle que soit la version qui exécute le test
+    monkeypatch.setattr(profilage, 'CPROFILE_PAR_THREAD', False)
+    premier, second = Profileur('conversion', str(tmp_path)), Profileur('chargement', str(tmp_path))
+
+    premier.demarrer()
+    thread = threading.Thread(target=lambda: (second.demarrer(), second.arreter()))
+    thread.start()
+    thread.join(timeout=10)
+    fichiers = premier.arreter()
+
+    assert premier.profil is not None and second.profil is None
+    assert premier.etapes_incluses == {'chargement'}
+    assert str(tmp_path / 'conversion.pstats') in fichiers
+    assert not (tmp_path / 'chargement.pstats').exists()
+    assert (tmp_path / 'chargement.collapsed').exists()
+    sortie = capsys.readouterr().out
+    assert "déjà utilisé par 'conversion'" in sortie
+    assert "inclut aussi les appels de chargement" in sortie
+
+    # cProfile libéré : l'étape suivante a de nouveau son profil
+    suivant = Profileur('entrainement', str(tmp_path))
+    suivant.demarrer()
+    suivant.arreter()
+    assert (tmp_path / 'entrainement.pstats').exists()
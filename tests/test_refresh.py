@@ -0,0 +1,50 @@
+import numpy as np
+
+from car_price_predictor.models import model, refresh
+from car_price_predictor.models.model import MODE_NATIVE, charger_dataset, charger_modele, empreintes_lignes
+
+from test_hors_memoire import ecrire_dataset
+
+
+def rediriger_artefacts(monkeypatch, dossier):
+    """Artefacts du modèle dans `dossier`, et 20 arbres au lieu de 1000."""
+    for nom, fichier in [('ARTIFACTS_DIR', ''), ('PIPELINE_JOBLIB', 'pipeline.joblib'), ('META_JSON', 'meta.json'),
+                         ('LIGNES_VUES_NPY', 'lignes_vues.npy'), ('QUANTILES_JOBLIB', 'quantiles.joblib')]:
+        monkeypatch.setattr(model, nom, str(dossier / fichier))
+    monkeypatch.setattr(model, 'charger_params_xgb', lambda mode=None: {**model.PARAMS_XGB, 'n_estimators': 20})
+
+
+def test_validation_sur_des_nouvelles_lignes_seulement(tmp_path):
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 300)
+    df = charger_dataset(str(chemin))
+    empreintes = empreintes_lignes(df)
+
+    entrainement, validation, nouvelles = refresh.separer_delta(df, empreintes[:200])
+
+    assert len(nouvelles) == 100
+    assert np.isin(empreintes_lignes(validation), nouvelles).all()
+    assert len(validation) == int(100 * refresh.PART_VALIDATION)
+    # Nouvelles lignes restantes plus autant d'anciennes rejouées, sans recouvrement avec la validation
+    assert len(entrainement) == 80 + 100
+    assert not set(entrainement.index) & set(validation.index)
+
+
+def test_derive_relance_un_entrainement_complet(tmp_path, monkeypatch):
+    rediriger_artefacts(monkeypatch, tmp_path / 'artifacts')
+    monkeypatch.setattr(refresh, 'ARBRES_PAR_REFRESH', 5)
+
+    chemin = tmp_path / 'dataset.csv'
+    ecrire_dataset(chemin, 300)
+    df = charger_dataset(str(chemin))
+    model.entrainer_complet(df.iloc[:200], MODE_NATIVE, intervalles=False)
+
+    # Toute dérive déclenche le garde-fou
+    monkeypatch.setattr(refresh, 'SEUIL_DERIVE', -1.0)
+    refresh.rafraichir(df)
+
+    _, meta, lignes_vues = charger_modele()
+    assert meta['nb_refresh'] == 0
+    assert len(lignes_vues) == 300
+    # Le réentraînement reprend le mode et l'absence d'intervalles du modèle remplacé
+    assert meta['mode'] == MODE_NATIVE and meta['quantiles'] is None
@@ -0,0 +1,25 @@
+import numpy as np
+import pandas as pd
+
+from car_price_predictor.models.segments import RouteurSegments
+
+
+class ModeleConstant:
+    def __init__(self, prix):
+        self.prix = prix
+        self.appels = 0
+
+    def predict(self, X):
+        self.appels += 1
+        return np.full(len(X), self.prix, dtype=float)
+
+
+def test_routage_par_segment_et_repli_sur_le_global():
+    suv, citadine, global_ = ModeleConstant(30000), ModeleConstant(15000), ModeleConstant(20000)
+    routeur = RouteurSegments('type_vehicule', {'suv': suv, 'citadine': citadine}, global_)
+    X = pd.DataFrame({'type_vehicule': pd.Categorical(['SUV', 'citadine', 'berline', ' suv', 'cabriolet'])})
+
+    assert routeur.predire(X).tolist() == [30000, 15000, 20000, 30000, 20000]
+    # Un appel par segment présent, segments sans modèle regroupés sur le global
+    assert (suv.appels, citadine.appels, global_.appels) == (1, 1, 1)
+    assert routeur.modele('inconnu') is global_
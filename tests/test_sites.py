@@ -0,0 +1,88 @@
+import json
+import os
+
+from scrapy.http import HtmlResponse
+from scrapy.settings import Settings
+
+from car_price_predictor.benchmarks.run import FIXTURES_DIR
+from car_price_predictor.sites import ADAPTATEURS, AUTOSPHERE, AdaptateurSite
+from car_price_predictor.spiders.quotes_spider import SitesSpider
+
+# Site statique sans listes libellé/valeur : champs lus un par un
+EXEMPLE = AdaptateurSite(
+    nom='exemple',
+    url_recherche='https://www.exemple-annonces.fr/occasions?page={page}',
+    annonces_par_page=20,
+    selecteur_liens='//article/a[@class="annonce"]',
+    selecteur_fiche='h1',
+    champs={
+        'nom_complet_vehicule': ['//h1/text()'],
+        'prix_ttc_eur': ['//span[@class="prix"]/text()'],
+        'kilometrage': ['//dd[@id="km"]/text()'],
+    },
+    defauts={'nom_complet_vehicule': "Titre non trouvé"},
+    concurrence=2,
+    delai=1.0,
+    playwright=False,
+    prefixe_identifiant='ex-',
+)
+
+PAGE_EXEMPLE = """
+<html><body>
+  <h1> RENAULT CLIO 1.0 TCe </h1>
+  <span class="prix">12&#160;490 €</span>
+  <dl><dt>Kilométrage</dt><dd id="km">61 000 km</dd></dl>
+  <article><a class="annonce" href="/annonce/renault-clio-ab12">Clio</a></article>
+  <article><a class="annonce" href="/annonce/renault-clio-ab12">Clio</a></article>
+</body></html>
+"""
+
+
+def reponse(url, chemin=None, html=None):
+    if chemin:
+        with open(os.path.join(FIXTURES_DIR, chemin), 'rb') as f:
+            html = f.read()
+    return HtmlResponse(url=url, body=html, encoding='utf-8')
+
+
+def test_extraction_des_fixtures_autosphere():
+    with open(os.path.join(FIXTURES_DIR, 'urls.json'), encoding='utf-8') as f:
+        urls = json.load(f)
+    fiches = [SitesSpider(sites='autosphere').extraire_fiche(reponse(url, f'fiche_{i}.html')) for i, url in enumerate(urls)]
+
+    bmw = fiches[1]
+    assert (bmw.url, bmw.nom_complet_vehicule, bmw.prix_ttc_eur) == (urls[1], 'BMW SERIE 1 1.5 90ch Business', 20250)
+    assert (bmw.energie, bmw.kilometrage, bmw.type_vehicule, bmw.portes) == ('Diesel', '33 115 km', 'Berline', '3')
+    assert all(f.prix_ttc_eur and f.nom_complet_vehicule != "Titre non trouvé" for f in fiches)
+
+    liens = SitesSpider(sites='autosphere').extraire_liens(reponse(AUTOSPHERE.url_page(0), 'recherche.html'))
+    assert len(liens) == 23
+    assert all(lien.startswith(('/fiche/', '/fiche-mixte/')) for lien in liens)
+
+
+def test_chaque_url_extraite_avec_l_adaptateur_de_son_site(monkeypatch):
+    monkeypatch.setitem(ADAPTATEURS, 'exemple', EXEMPLE)
+    spider = SitesSpider(sites='autosphere,exemple')
+
+    fiche = spider.extraire_fiche(reponse('https://www.exemple-annonces.fr/annonce/renault-clio-ab12', html=PAGE_EXEMPLE))
+    assert (fiche.nom_complet_vehicule, fiche.prix_ttc_eur, fiche.kilometrage) == ('RENAULT CLIO 1.0 TCe', 12490, '61 000 km')
+    assert EXEMPLE.identifiant(fiche.url) == 'ex-ab12'
+    assert spider.extraire_liens(reponse(EXEMPLE.url_page(0), html=PAGE_EXEMPLE)) == ['/annonce/renault-clio-ab12']
+
+    # La fiche Autosphere garde ses sélecteurs : rien n'est lu avec ceux de l'autre site
+    autosphere = spider.extraire_fiche(reponse('https://www.autosphere.fr/fiche/x-000001', 'fiche_1.html'))
+    assert autosphere.prix_ttc_eur == 20250 and autosphere.energie == 'Diesel'
+
+
+def test_emplacements_de_telechargement_poses_avant_le_gel(monkeypatch):
+    monkeypatch.setitem(ADAPTATEURS, 'exemple', EXEMPLE)
+    monkeypatch.setattr(SitesSpider, 'sites', ['autosphere', 'exemple'])
+    settings = Settings()
+    settings.set('DOWNLOAD_SLOTS', {EXEMPLE.domaine: {'concurrency': 1}}, priority='cmdline')
+    SitesSpider.update_settings(settings)
+
+    slots = settings.getdict('DOWNLOAD_SLOTS')
+    # Le réglage de la ligne de commande l'emporte pour son domaine, les autres gardent ceux de l'adaptateur
+    assert slots[EXEMPLE.domaine] == {'concurrency': 1}
+    assert slots[AUTOSPHERE.domaine] == {'concurrency': AUTOSPHERE.concurrence, 'delay': AUTOSPHERE.delai}
+    assert settings.getint('CONCURRENT_REQUESTS') == AUTOSPHERE.concurrence + EXEMPLE.concurrence
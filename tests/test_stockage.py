@@ -0,0 +1,137 @@
+import sqlite3
+from datetime import datetime
+
+import pytest
+
+from car_price_predictor.database import requetes
+from car_price_predictor.database.database import ouvrir_base, preparer_vehicule
+from car_price_predictor.items import FicheVehicule
+
+
+def fiche(i, prix=10000, date='15/01/2020', nom='PEUGEOT 208 1.2 PureTech', **champs):
+    return FicheVehicule(url=f'https://www.autosphere.fr/fiche/auto-occasion-x-{i:06d}',
+                         nom_complet_vehicule=nom, prix_ttc_eur=prix,
+                         kilometrage='45 000 km', date_mise_en_circulation=date,
+                         puissance_fiscale='5 CV', puissance_reelle='100 ch', **champs)
+
+
+@pytest.fixture
+def stockage(tmp_path):
+    stockage = ouvrir_base(f"sqlite:///{tmp_path / 'annonces.db'}")
+    stockage.creer_schema()
+    yield stockage
+    stockage.fermer()
+
+
+def test_derivations_identiques_au_dataset():
+    vehicule = preparer_vehicule(fiche(0))
+    assert (vehicule['marque'], vehicule['modele']) == ('Peugeot', '208')
+    assert vehicule['portes'] == vehicule['places'] == 5
+    # Âge fractionnaire depuis aujourd'hui, comme JsonToCsv.py
+    attendu = (datetime.now() - datetime(2020, 1, 15)).days / 365.25
+    assert vehicule['age_ans'] == pytest.approx(attendu)
+    assert FicheVehicule(date_mise_en_circulation='31/02/2020').age_ans() is None
+
+
+def test_upsert_insere_puis_met_a_jour(stockage):
+    assert stockage.upsert_vehicules([preparer_vehicule(fiche(i)) for i in range(3)]) == (3, 0, 0)
+    assert stockage.upsert_vehicules([preparer_vehicule(fiche(i, prix=9000)) for i in range(2, 5)]) == (2, 1, 0)
+    df = stockage.lire_entrainement()
+    assert len(df) == 5
+    assert df.loc[df['url'].str.endswith('000002'), 'prix_ttc_eur'].item() == 9000
+    assert set(df['marque']) == {'peugeot'} and set(df['modele']) == {'208'}
+    assert stockage.filigrane() == [5, 2]
+
+    # Nom d'un seul mot : la marque est gardée, le modèle manque comme dans dataset.csv
+    stockage.upsert_vehicules([preparer_vehicule(fiche(9, nom='DACIA'))])
+    ligne = stockage.lire_entrainement().set_index('url').loc[fiche(9).url]
+    assert ligne['marque'] == 'dacia' and ligne['modele'] is None
+
+
+def test_comptes_de_l_upsert_insensibles_aux_autres_ecrivains(tmp_path, stockage):
+    # URL répétée dans un lot : une insertion puis une mise à jour
+    assert stockage.upsert_vehicules([preparer_vehicule(fiche(0)), preparer_vehicule(fiche(0))]) == (1, 1, 0)
+
+    autre = ouvrir_base(f"sqlite:///{tmp_path / 'annonces.db'}")
+    commit = stockage.commit
+
+    def commit_puis_ecriture_concurrente():
+        commit()
+        if autre.compter_vehicules() < 5:
+            autre.upsert_vehicules([preparer_vehicule(fiche(i)) for i in range(10, 13)])
+
+    stockage.commit = commit_puis_ecriture_concurrente
+    try:
+        # Lots d'une annonce : l'autre connexion écrit entre deux lots
+        assert stockage.upsert_vehicules([preparer_vehicule(fiche(i)) for i in range(1, 3)], taille_lot=1) == (2, 0, 0)
+    finally:
+        autre.fermer()
+    assert stockage.compter_vehicules() == 6
+
+
+def test_agregats_ne_recalculent_que_les_modeles_charges(stockage):
+    requetes.preparer(stockage)
+    stockage.upsert_vehicules([preparer_vehicule(fiche(i, prix=10000 + i)) for i in range(4)])
+    assert requetes.rafraichir_agregats(stockage) == 1
+    # Rien de nouveau depuis le dernier rafraîchissement
+    assert requetes.rafraichir_agregats(stockage) == 0
+
+    stats = requetes.statistiques(stockage, {'marque': 'peugeot', 'modele': '208', 'age_ans': 6.5, 'kilometrage': 45000})
+    assert stats['nb'] == 4
+    assert stats['prix_min'] == 10000
+
+    stockage.upsert_vehicules([preparer_vehicule(FicheVehicule(url='https://www.autosphere.fr/fiche/auto-occasion-y-000001',
+                                                               nom_complet_vehicule='RENAULT CLIO', prix_ttc_eur=8000))])
+    assert requetes.rafraichir_agregats(stockage) == 1
+    assert requetes.rafraichir_agregats(stockage, complet=True) == 2
+
+
+def test_schema_mysql_d_origine_renomme(tmp_path):
+    chemin = tmp_path / 'annonces.db'
+    conn = sqlite3.connect(chemin)
+    conn.execute("CREATE TABLE Vehicule (id INTEGER PRIMARY KEY, url TEXT NOT NULL UNIQUE, nom_complet TEXT, prix_tt_eur INT, "
+                 "age_ans INT, kilometrage INT, places INT, portes INT, puissance_fiscale INT, puissance_reelle INT, "
+                 "premiere_main BOOLEAN, id_modele INT, id_energie INT, id_boite INT, id_couleur INT, id_provenance INT)")
+    conn.commit()
+    conn.close()
+
+    stockage = ouvrir_base(f'sqlite:///{chemin}')
+    try:
+        stockage.creer_schema()
+        assert stockage.upsert_vehicules([preparer_vehicule(fiche(0))]) == (1, 0, 0)
+        assert stockage.lire_entrainement()['prix_ttc_eur'].tolist() == [10000]
+    finally:
+        stockage.fermer()
+
+
+def test_configuration_partielle_sans_erreur(stockage, capsys):
+    requetes.preparer(stockage)
+    stockage.upsert_vehicules([preparer_vehicule(fiche(i)) for i in range(3)])
+    requetes.rafraichir_agregats(stockage)
+
+    for config in ({'marque': 'peugeot', 'modele': '208'}, {'marque': 'peugeot', 'modele': '208', 'age_ans': '', 'kilometrage': 45000}):
+        assert requetes.statistiques(stockage, config) is None
+        assert requetes.comparables(stockage, config).empty
+        assert requetes.afficher_comparables(stockage, config).empty
+    assert "sont nécessaires" in capsys.readouterr().out
+
+    config = {'marque': 'Peugeot', 'modele': '208', 'age_ans': 6, 'kilometrage': 40000}
+    assert len(requetes.comparables(stockage, config)) == 3
+
+
+def test_predict_depuis_le_stockage_en_lecture_seule(tmp_path, stockage, capsys):
+    from car_price_predictor.models.prediction import afficher_depuis_stockage
+
+    stockage.upsert_vehicules([preparer_vehicule(fiche(i)) for i in range(3)])
+    config = {'marque': 'peugeot', 'modele': '208', 'age_ans': 6.5, 'kilometrage': 45000}
+    afficher_depuis_stockage(f"sqlite:///{tmp_path / 'annonces.db'}", config, 2)
+
+    assert "--- 2 annonce(s) comparable(s) ---" in capsys.readouterr().out
+    # Ni table d'agrégats ni index créés par la lecture
+    assert not stockage.table_existe('StatsPrix')
+    index = stockage.conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'").fetchall()
+    assert index == []
+
+    absente = tmp_path / 'absente.db'
+    afficher_depuis_stockage(f"sqlite:///{absente}", config, 2)
+    assert not absente.exists()